@@ -0,0 +1,113 @@
+"""
+    Benchmark: allocations per routed message, with and without the
+    message pool (see "Message Pool" in xmit_message.py).
+
+    Starts controller.main() with a "keypad" service (see svc_alloc.py)
+    which sends MSG_CNT messages with send_msg()
+    - local:     to a sink service which releases each message, as the
+                 log service does
+    - forwarded: to an "svc_i2c_stub" for I2C address 65 (0x41), which wraps
+                 each message for the "i2c_svc" sink, as a key press sent
+                 to a Responder would be
+
+    For pool sizes 0 (off) and POOL reports per message:
+    - xmit_new: XmitMsg objects created by XmitMsg.alloc()
+    - bytes:    bytes allocated, MicroPython only (gc.mem_alloc())
+
+    Usually run on CPython by run_bench.py. To run on a Pico, copy this
+    file and svc_alloc.py along with the controller files.
+
+"""
+
+import gc
+import uasyncio
+
+import controller
+import svc_alloc
+import xmit_message
+
+POOL    = 16
+MSG_CNT = 2_000
+WAIT_MS = 10_000
+
+# None on CPython, where bytes allocated can not be counted
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+# bytes allocated per n since mem_alloc() was m, None if not counted
+def per(m, n):
+    if m is None:
+        return None
+    return (mem_alloc() - m) // n
+
+def bench_parms(path, pool):
+    send_to = "sink" if path == "local" else "0x41_sink"
+
+    services = [{"name":"controller", "module":"service_controller",
+                 "startup_focus":"log"},
+                {"name":"log", "module":"service_print", "print_log":0},
+                {"name":"keypad", "module":"svc_alloc",
+                 "send_to":send_to, "n_send":MSG_CNT},
+                {"name":"sink", "module":"svc_alloc"},
+                {"name":"0x41_sink", "module":"svc_i2c_stub",
+                 "forward_i2c_addr":65},
+                {"name":"i2c_svc", "module":"svc_alloc"}]
+
+    return {"ctrl_svc":"controller",
+            "log_xmit":False,
+            "xmit_pool":pool,
+            "defaults":{"q_in_size":50, "q_out_size":50, "i2c_bus_1":None},
+            "services":services}
+
+async def run_mode(path, pool):
+    svc_alloc.reset()
+    main = uasyncio.create_task(controller.main(bench_parms(path, pool)))
+
+    # let services start and the router wait for messages
+    await uasyncio.sleep_ms(100)
+
+    new_cnt = xmit_message.pool_stats()[0]
+    gc.collect()
+    m = mem_alloc()
+
+    svc_alloc.start.set()
+
+    wait = WAIT_MS
+    while svc_alloc.received < MSG_CNT and wait > 0:
+        await uasyncio.sleep_ms(10)
+        wait -= 10
+
+    m = per(m, MSG_CNT)
+    new_cnt = xmit_message.pool_stats()[0] - new_cnt
+
+    main.cancel()
+
+    # stop the services, they are not tracked by controller.main()
+    # (CPython only, MicroPython has no all_tasks())
+    if hasattr(uasyncio, "all_tasks"):
+        for t in uasyncio.all_tasks():
+            if t is not uasyncio.current_task():
+                t.cancel()
+
+    xmit_message.set_pool_size(0)
+
+    received = svc_alloc.received
+    return {"xmit_new":round(new_cnt / MSG_CNT, 2),
+            "bytes":m,
+            "lost":MSG_CNT - received}
+
+async def main():
+    results = {}
+    for path in ("local", "forwarded"):
+        for pool in (0, POOL):
+            name = "{} pool={}".format(path, pool)
+            results[name] = r = await run_mode(path, pool)
+            print("{:18} xmit_new {:5} per msg  bytes {:5} per msg  lost {}".format(
+                name, r["xmit_new"], "-" if r["bytes"] is None else r["bytes"], r["lost"]))
+
+    return results
+
+if __name__ == "__main__":
+    uasyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+    Benchmark: ns per byte for the I2C block checksums, the old
+    calc_icmpv6_chksum.py versus CRC-16/CCITT in crc16.py.
+
+    For 16, 64 and 128 byte blocks and a 200 byte message:
+    - icmpv6: calc_icmpv6_chksum() of a slice of the buffer, as the
+              lock-step protocol called it for each block
+    - crc16:  crc16() over the buffer in place, viper on MicroPython
+    - crc16 py: the same table lookups in plain Python, which is what
+              crc16 runs on CPython
+
+    Also checks that CRC-16 catches two 16 bit words swapped in a
+    block, which the ICMPv6 sum (of 16 bit words) does not.
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import utime
+
+from calc_icmpv6_chksum import calc_icmpv6_chksum
+from crc16 import crc16, _crc16_py
+
+BYTES  = 40_000
+SIZES  = (16, 64, 128, 200)
+
+def icmpv6(buff, n):
+    return calc_icmpv6_chksum(buff[0:n])
+
+def crc(buff, n):
+    return crc16(buff, 0, n)
+
+def crc_py(buff, n):
+    return _crc16_py(buff, 0, n, 0xFFFF)
+
+def run(func, buff, n):
+    repeat = BYTES // n
+    t = utime.ticks_us()
+    for i in range(repeat):
+        func(buff, n)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    return round(t * 1000 / (repeat * n), 1)
+
+async def main():
+    buff = bytearray(200)
+    for i in range(len(buff)):
+        buff[i] = (i * 7 + 3) & 0xFF
+    mv = memoryview(buff)
+
+    assert crc16(b"123456789") == 0x29B1
+    assert crc16(mv, 100, 200, crc16(mv, 0, 100)) == crc16(buff)
+
+    swapped = bytearray(buff[0:16])
+    swapped[0:2], swapped[2:4] = buff[2:4], buff[0:2]
+    assert calc_icmpv6_chksum(swapped) == calc_icmpv6_chksum(buff[0:16])
+    assert crc16(swapped) != crc16(buff, 0, 16)
+
+    results = {}
+    for n in SIZES:
+        for name, func in (("icmpv6", icmpv6), ("crc16", crc), ("crc16 py", crc_py)):
+            key = "{} {}".format(name, n)
+            results[key] = r = {"ns_byte":run(func, mv, n)}
+            print("{:14} {:7} ns/byte".format(key, r["ns_byte"]))
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
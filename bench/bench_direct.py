@@ -0,0 +1,96 @@
+"""
+    Benchmark: direct delivery versus routed delivery.
+
+    Sends messages from a "keypad" service to an "lcd" service
+    - routed: sender output queue -> router -> lcd input queue
+    - direct: sender straight into the lcd input queue (see router.py)
+
+    Reports:
+    - key to lcd latency: one message at a time, time from
+      put_to_output_q() until the lcd task has the message
+    - msgs/sec: a burst of messages, time until all are received
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import uasyncio
+import utime
+
+from service import Service
+from router import Router
+from xmit_message import XmitMsg
+import service_controller
+
+KEY_CNT   = 200
+BURST_CNT = 2000
+
+def svc_parms(name, **parms):
+    parms["name"] = name
+    parms["defaults"] = {"q_in_size":50, "q_out_size":50}
+    return parms
+
+def percentile(values, pct):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[int((len(values) - 1) * pct / 100)]
+
+async def lcd_task(lcd, received):
+    q = lcd.get_input_queue()
+    while True:
+        xmit = await q.get()
+        received.append(utime.ticks_diff(utime.ticks_us(), xmit.get_msg()))
+
+async def run_mode(direct):
+    ctrl   = service_controller.ModuleService(svc_parms("controller"))
+    keypad = Service(svc_parms("keypad"))
+    lcd    = Service(svc_parms("lcd"))
+
+    svc_lookup = {"controller":ctrl, "keypad":keypad, "lcd":lcd}
+
+    router = Router(svc_lookup, ctrl.route_xmit)
+    ctrl.set_router(router, None)
+    if direct:
+        router.start_direct_delivery()
+
+    received = []
+    tasks = [uasyncio.create_task(router.run()),
+             uasyncio.create_task(lcd_task(lcd, received))]
+
+    # key press latency, system otherwise idle
+    for i in range(KEY_CNT):
+        await keypad.put_to_output_q(XmitMsg("keypad", "lcd", utime.ticks_us()))
+        while len(received) <= i:
+            await uasyncio.sleep_ms(0)
+
+    latency = received[:]
+    received.clear()
+
+    # burst throughput
+    start = utime.ticks_us()
+    for i in range(BURST_CNT):
+        await keypad.put_to_output_q(XmitMsg("keypad", "lcd", utime.ticks_us()))
+    while len(received) < BURST_CNT:
+        await uasyncio.sleep_ms(0)
+    elapsed = utime.ticks_diff(utime.ticks_us(), start)
+
+    for t in tasks:
+        t.cancel()
+
+    return {"p50_us":percentile(latency, 50),
+            "p99_us":percentile(latency, 99),
+            "msgs_sec":int(BURST_CNT * 1_000_000 / elapsed)}
+
+async def main():
+    results = {}
+    for mode in ("routed", "direct"):
+        results[mode] = r = await run_mode(mode == "direct")
+        print("{:7} key->lcd p50 {:6}us p99 {:6}us  burst {:7} msgs/sec".format(
+            mode, r["p50_us"], r["p99_us"], r["msgs_sec"]))
+
+    return results
+
+if __name__ == "__main__":
+    uasyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+    Benchmark: forwarding a message to a Responder, the old nested
+    wrapping versus the XmitFwd envelope (see svc_i2c_stub.py).
+
+    Controller side, from the stub to the bytes given to I2C:
+    - old: xmit.wrapXmit() to a JSON string in a new XmitMsg, nested in
+           [i2c_addr, json], and for the binary wire format decoded and
+           encoded again by the I2C service
+    - new: XmitFwd(fr, xmit, i2c_addr), encoded once by the I2C service
+
+    Responder side, from the bytes received to an XmitMsg:
+    - old: XmitMsg(msg=str).unwrapMsg()
+    - new: Codec.decode(bytes)
+
+    Each for the JSON and binary wire formats (see xmit_codec.py).
+    Reports us per message and, on MicroPython, bytes allocated per
+    message (gc.mem_alloc()).
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import gc
+import utime
+
+from xmit_message import XmitMsg, XmitFwd
+from xmit_lcd import XmitLcd
+from xmit_codec import Codec
+
+REPEAT = 2_000
+ADDR   = 65
+
+NAMES = ["controller", "menu", "lcd", "i2c_svc", "log", "ir_remote",
+         "0x41_log", "0x41_keypad", "0x41_neopixel_v2", "0x41_temp_humid"]
+
+# None on CPython, where bytes allocated can not be counted
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+# bytes allocated per n since mem_alloc() was m, None if not counted
+def per(m, n):
+    if m is None:
+        return None
+    return (mem_alloc() - m) // n
+
+def new_xmit():
+    xmit = XmitLcd(fr="clock", to="0x41_neopixel_v2")
+    return xmit.set_cursor(2, 1).set_msg("12:34:56")
+
+def to_bytes(msg):
+    if isinstance(msg, str):
+        return msg.encode("utf8")
+    return msg
+
+def send_old(codec, xmit):
+    env = xmit.wrapXmit(fr="0x41_neopixel_v2", to="i2c_svc")
+    env.msg = [ADDR, env.msg]
+    msg = env.msg[1]
+    if codec.is_binary():
+        msg = codec.encode(codec.decode(msg))
+    return to_bytes(msg)
+
+def send_new(codec, xmit):
+    env = XmitFwd("0x41_neopixel_v2", "i2c_svc", xmit, ADDR)
+    return to_bytes(codec.encode(env.msg))
+
+def rcv_old(codec, data):
+    return XmitMsg(msg=data.decode("utf8")).unwrapMsg()
+
+def rcv_new(codec, data):
+    return codec.decode(data)
+
+def run(func, codec, arg):
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        func(codec, arg)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = per(m, REPEAT)
+    gc.enable()
+    return {"us":round(t / REPEAT, 1), "bytes":m}
+
+async def main():
+    json_codec = Codec()
+    bin_codec  = Codec(NAMES)
+    xmit = new_xmit()
+
+    results = {}
+    for fmt, codec in (("json", json_codec), ("bin", bin_codec)):
+        data = send_new(codec, xmit)
+        for path, func, arg in (("send old", send_old, xmit),
+                                ("send new", send_new, xmit),
+                                ("rcv old",  rcv_old,  data),
+                                ("rcv new",  rcv_new,  data)):
+            if fmt == "bin" and func is rcv_old:
+                continue   # the old receive path only read JSON
+            key = "{} {}".format(path, fmt)
+            results[key] = r = run(func, codec, arg)
+            print("{:14} {:6}us  {:5} bytes per msg".format(key, r["us"], "-" if r["bytes"] is None else r["bytes"]))
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
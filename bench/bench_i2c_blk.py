@@ -0,0 +1,79 @@
+"""
+    Benchmark: I2C message throughput with 16, 32, 64 and 128 byte blocks.
+
+    The real I2cController and I2CResponder on a simulated 100kHz bus,
+    see i2c_sim.py. The Responder offers the block size in its length
+    ack (see i2c_controller.py), and the Controller allows up to 128.
+
+    For each block size, MSG_CNT messages of MSG_LEN bytes, about the
+    size of an LCD update in JSON:
+    - send: Controller to Responder, I2cController.send_msg()
+    - rcv:  Responder to Controller, I2cController.rcv_msg()
+    Reports bytes/sec and msgs/sec of simulated time, and the bus
+    transfers per message.
+
+    Runs on CPython with run_bench.py. The simulated time does not
+    depend on the host.
+
+"""
+
+from i2c_controller import I2cController
+from i2c_sim import SimBus, SimI2c
+
+ADDR    = 0x41
+MSG_LEN = 200
+MSG_CNT = 20
+
+BLK_SIZES = (16, 32, 64, 128)
+
+def message():
+    msg = bytearray(MSG_LEN)
+    for i in range(MSG_LEN):
+        msg[i] = 32 + i % 90
+    return bytes(msg)
+
+def measure(bus, func):
+    t = bus.now_us
+    xfers = bus.xfers
+    for i in range(MSG_CNT):
+        func()
+    secs = (bus.now_us - t) / 1_000_000
+    return {"bytes_sec":int(MSG_CNT * MSG_LEN / secs),
+            "msgs_sec":round(MSG_CNT / secs, 1),
+            "xfers_msg":(bus.xfers - xfers) // MSG_CNT}
+
+async def main():
+    msg = message()
+    results = {}
+
+    for blk in BLK_SIZES:
+        bus = SimBus(freq=100_000)
+        resp = bus.add_responder(ADDR, blk_size=blk)
+        resp.raw = True
+        ctl = I2cController(i2c=SimI2c(bus), max_blk=128)
+
+        # first poll, the Controller learns the block size
+        bus.run(ctl.rcv_msg(ADDR))
+        assert ctl.get_blk_size(ADDR) == blk
+
+        def send():
+            assert bus.run(ctl.send_msg(ADDR, msg))
+
+        def rcv():
+            resp.q_in.put_nowait(msg)
+            assert bus.run(ctl.rcv_msg(ADDR, True)) == msg
+
+        for path, func in (("send", send), ("rcv", rcv)):
+            key = "{} blk={}".format(path, blk)
+            results[key] = r = measure(bus, func)
+            print("{:14} {:6} bytes/sec  {:6} msgs/sec  {:3} transfers/msg".format(
+                key, r["bytes_sec"], r["msgs_sec"], r["xfers_msg"]))
+
+        assert resp.received == [msg] * MSG_CNT
+        assert resp.overflow == 0
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
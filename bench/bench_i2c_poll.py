@@ -0,0 +1,163 @@
+"""
+    Benchmark: reply latency and idle bus use of the I2C Controller
+    polling 4 Responders, see i2c_poll.py.
+
+    The real I2cController and I2CResponders on a simulated 100kHz bus,
+    see i2c_sim.py, with the loop of service_i2c_controller.py sending
+    requests as they are queued, reading the Responders the
+    PollSchedule says are due, and sleeping on the bus clock in between.
+    - poll:     every Responder is read every 100ms, as before each
+                Responder had its own interval
+    - adaptive: each Responder is read 10ms after a message to or from
+                it, backing off to every 100ms, with a budget of 20ms
+                of each second for reads which find nothing outside
+                those bursts, after which idle Responders are not read
+                until it is earned back
+    - ready:    each Responder has a data ready line, checked every
+                10ms, and is otherwise read every 1000ms
+
+    Reports, over SECS seconds of simulated time:
+    - idle:     no messages, the percent of the time the bus is in use
+                and Responders read per second
+    - traffic:  each Responder queues a MSG_LEN byte message at random,
+                on average every GAP_MS, the ms from the message being
+                queued to the Controller having it, p50 and max, and
+                the percent of the time the bus is in use
+    - bursts:   as traffic, but BURST messages BURST_MS apart, on
+                average every BURST * GAP_MS
+    - requests: the Controller sends a request to a Responder at
+                random, on average every GAP_MS / 4, and the Responder
+                queues a reply REPLY_MS after it has it, the ms from the
+                request being queued to the Controller having the reply
+
+    Runs on CPython with run_bench.py. The simulated time does not
+    depend on the host.
+
+"""
+
+from i2c_controller import I2cController
+from i2c_poll import PollSchedule
+from i2c_sim import SimBus, SimI2c
+
+ADDRS    = (0x41, 0x42, 0x43, 0x44)
+SECS     = 10
+MSG_LEN  = 40
+GAP_MS   = 500
+REPLY_MS = 5
+BURST    = 3
+BURST_MS = 30
+
+MODES = {"poll":    {"min_ms":100, "max_ms":100, "budget_ms":0},
+         "adaptive":{"min_ms":10,  "max_ms":100, "budget_ms":20},
+         "ready":   {"ready_ms":10, "slow_ms":1000}}
+
+def message():
+    msg = bytearray(MSG_LEN)
+    for i in range(MSG_LEN):
+        msg[i] = 32 + i % 90
+    return bytes(msg)
+
+# (us, addr) for the messages of each Responder, in bursts of burst
+# messages on average every burst * gap_ms, in order of time
+def events(gap_ms, seed, burst=1):
+    evs = []
+    for addr in ADDRS:
+        t = 0
+        while True:
+            seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+            t += (seed >> 8) % (2 * gap_ms * burst) * 1000
+            if t >= SECS * 1_000_000:
+                break
+            for i in range(burst):
+                evs.append((t + i * BURST_MS * 1000, addr))
+    evs.sort()
+    return evs
+
+def run(mode, queued_evs, request_evs):
+    lines = mode == "ready"
+    bus = SimBus(freq=100_000)
+    resps = {}
+    for addr in ADDRS:
+        resps[addr] = bus.add_responder(addr, blk_size=64, stream=True, ready=lines)
+    ctl = I2cController(i2c=SimI2c(bus))
+
+    sched = PollSchedule(**MODES[mode])
+    for addr in ADDRS:
+        sched.add(addr, resps[addr].ready if lines else None)
+
+    # first pass, the Controller learns the block size of each Responder
+    for addr in ADDRS:
+        bus.run(ctl.rcv_msg(addr))
+
+    msg = message()
+    start = bus.now_us
+    end = start + SECS * 1_000_000
+    busy = bus.busy_us
+    reads = sched.reads
+
+    # (us, addr, us queued) of messages the Responders queue
+    pending = [(start + t, addr, start + t) for t, addr in queued_evs]
+    sent = {addr:[] for addr in ADDRS}   # us each queued message was queued
+    latency = []
+    req = 0
+    due = []
+
+    while bus.now_us < end:
+        # send requests queued on the Controller, the Responder
+        # replies REPLY_MS after it has the request
+        while req < len(request_evs) and start + request_evs[req][0] <= bus.now_us:
+            t, addr = request_evs[req]
+            assert bus.run(ctl.send_msg(addr, msg))
+            sched.sent(addr, int(bus.now_us // 1000))
+            pending.append((bus.now_us + REPLY_MS * 1000, addr, start + t))
+            pending.sort()
+            req += 1
+
+        # messages the Responders queued while the Controller slept
+        while len(pending) > 0 and pending[0][0] <= bus.now_us:
+            t, addr, t0 = pending.pop(0)
+            resps[addr].q_in.put_nowait(msg)
+            resps[addr].set_ready()
+            sent[addr].append(t0)
+
+        sched.due(int(bus.now_us // 1000), due)
+        for addr in due:
+            t = bus.busy_us
+            got = len(bus.run(ctl.rcv_msg(addr, True))) > 0
+            sched.read(addr, got, bus.busy_us - t)
+            while got:
+                latency.append(bus.now_us - sent[addr].pop(0))
+                got = len(bus.run(ctl.rcv_msg(addr, True))) > 0
+
+        # sleep until a Responder is due, or a request is queued
+        wait = max(1, sched.wait_ms(int(bus.now_us // 1000))) * 1000
+        if req < len(request_evs):
+            wait = max(0, min(wait, start + request_evs[req][0] - bus.now_us))
+        bus.now_us += wait
+
+    secs = (bus.now_us - start) / 1_000_000
+    r = {"bus_pct":round((bus.busy_us - busy) * 100 / (bus.now_us - start), 2),
+         "reads_sec":round((sched.reads - reads) / secs, 1)}
+    if len(latency) > 0:
+        latency.sort()
+        r["p50_ms"] = round(latency[len(latency) // 2] / 1000, 1)
+        r["max_ms"] = round(latency[-1] / 1000, 1)
+    assert ctl.failed_cnt == 0
+    return r
+
+async def main():
+    results = {}
+    for name, queued_evs, request_evs in (("idle", [], []),
+                                         ("traffic", events(GAP_MS, 12345), []),
+                                         ("bursts", events(GAP_MS, 12345, BURST), []),
+                                         ("requests", [], events(GAP_MS, 54321))):
+        for mode in MODES:
+            key = "{} {}".format(name, mode)
+            results[key] = r = run(mode, queued_evs, request_evs)
+            print("{:18} {:6}% bus  {:6} reads/sec  p50 {:>6}ms  max {:>6}ms".format(
+                key, r["bus_pct"], r["reads_sec"], r.get("p50_ms", "-"), r.get("max_ms", "-")))
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+    Benchmark: bytes allocated (gc.mem_alloc()) and us per message
+    received by I2cController.rcv_msg(), once the Controller is warmed up.
+
+    The bytes a Responder sends for one message are recorded on the
+    simulated bus (i2c_sim.py), then played back to the Controller
+    for each receive, without allocating, see ReplayI2c.
+    uasyncio.sleep_ms() in i2c_controller.py does not sleep, so us is
+    the time spent in Python.
+
+    MSG_LEN byte messages received:
+    - icmpv6: in lock-step with calc_icmpv6_chksum.py, older Controllers
+    - crc:    in lock-step with CRC-16 block checksums
+    - stream: streamed, see i2c_controller.py
+    with 16 and 64 byte blocks, as bytes (raw) and with 64 byte blocks
+    as a str. The message returned is counted, MSG_LEN bytes and the
+    object.
+
+    Bytes are only counted on MicroPython; on CPython they are None,
+    nothing was measured.
+
+    To run, copy this file and i2c_sim.py to a Pico along with the
+    controller files, or run on CPython with run_bench.py.
+
+"""
+
+import gc
+import utime
+import uasyncio
+
+import i2c_controller
+from i2c_controller import I2cController
+from i2c_sim import SimBus, RecordI2c, ReplayI2c
+
+REPEAT  = 200
+ADDR    = 0x41
+MSG_LEN = 200
+
+# None on CPython, where bytes allocated can not be counted
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+# bytes allocated per n since mem_alloc() was m, None if not counted
+def per(m, n):
+    if m is None:
+        return None
+    return (mem_alloc() - m) // n
+
+class _NoSleep:
+
+    """ Stands in for uasyncio in i2c_controller.py """
+
+    def sleep_ms(self, ms):
+        return uasyncio.sleep_ms(0)
+
+def message():
+    msg = bytearray(MSG_LEN)
+    for i in range(MSG_LEN):
+        msg[i] = 32 + i % 90
+    return bytes(msg)
+
+async def run(mode, blk, raw, msg):
+    # record the Responder sending msg
+    bus = SimBus()
+    resp = bus.add_responder(ADDR, blk_size=blk, stream=mode == "stream")
+    i2c = RecordI2c(bus)
+    ctl = I2cController(i2c=i2c, max_blk=128, crc=mode != "icmpv6")
+    bus.run(ctl.rcv_msg(ADDR))   # first poll, the Controller learns the block size
+    i2c.reads = []
+    resp.q_in.put_nowait(msg)
+    expect = msg if raw else msg.decode("utf8")
+    assert bus.run(ctl.rcv_msg(ADDR, raw)) == expect
+
+    ctl.i2c = replay = ReplayI2c(i2c.reads)
+
+    # warm up, the memoryviews of the frame are made on first use
+    assert await ctl.rcv_msg(ADDR, raw) == expect
+
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        replay.rewind()
+        await ctl.rcv_msg(ADDR, raw)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = per(m, REPEAT)
+    gc.enable()
+
+    assert ctl.failed_cnt == 0
+    return {"us":round(t / REPEAT, 1), "bytes":m}
+
+async def main():
+    msg = message()
+    results = {}
+
+    ctl_uasyncio = i2c_controller.uasyncio
+    i2c_controller.uasyncio = _NoSleep()   # bus.run() uses the bus clock
+    try:
+        for mode in ("icmpv6", "crc", "stream"):
+            for blk, raw in ((16, True), (64, True), (64, False)):
+                key = "{} blk={}{}".format(mode, blk, "" if raw else " str")
+                results[key] = r = await run(mode, blk, raw, msg)
+                print("{:20} {:7}us  {:5} bytes per receive".format(key, r["us"], "-" if r["bytes"] is None else r["bytes"]))
+    finally:
+        i2c_controller.uasyncio = ctl_uasyncio
+
+    return results
+
+if __name__ == "__main__":
+    uasyncio.run(main())
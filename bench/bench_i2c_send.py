@@ -0,0 +1,154 @@
+"""
+    Benchmark: bytes allocated (gc.mem_alloc()) and us per message sent
+    by I2cController.send_msg(), once the Controller is warmed up.
+
+    The Controller sends to a stand in for the bus and Responder which
+    answers as a Responder would, echoing the length, returning the
+    checksum of each block and an empty status for a streamed message,
+    without allocating. uasyncio.sleep_ms() in i2c_controller.py does
+    not sleep, so us is the time spent in Python.
+
+    MSG_LEN byte messages, as bytes, sent:
+    - icmpv6: in lock-step with calc_icmpv6_chksum.py, older Responders
+    - crc:    in lock-step with CRC-16 block checksums
+    - stream: streamed, see i2c_controller.py
+    with 16 and 64 byte blocks, and as a str with 64 byte blocks, which
+    is encoded to UTF-8 on each send.
+
+    Bytes are only counted on MicroPython; on CPython they are None,
+    nothing was measured.
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import gc
+import sys
+import utime
+import uasyncio
+
+import i2c_controller
+from i2c_controller import I2cController
+
+REPEAT  = 200
+ADDR    = 0x41
+MSG_LEN = 200   # the last block must be more than 2 bytes, see LoopI2c
+
+# second byte of the length ack, see i2c_controller.py
+CAPS = {"icmpv6":0x00, "crc":0x20, "stream":0x30}
+
+# None on CPython, where bytes allocated can not be counted
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+# bytes allocated per n since mem_alloc() was m, None if not counted
+def per(m, n):
+    if m is None:
+        return None
+    return (mem_alloc() - m) // n
+
+class _NoSleep:
+
+    """ Stands in for uasyncio in i2c_controller.py """
+
+    def sleep_ms(self, ms):
+        return uasyncio.sleep_ms(0)
+
+class LoopI2c:
+
+    """
+        Answers the Controller as a Responder would. A read after a
+        block of more than 2 bytes is its checksum, kept from the
+        first send of the message, a read after 2 bytes which follow
+        a streamed block is an empty status, any other read is the
+        echo of the 2 bytes written.
+    """
+
+    def __init__(self):
+        self.last = None
+        self.last_len = 0
+        self.prev_len = 0
+        self.sums = []
+        self.blk = 0
+
+    def writeto(self, addr, buf):
+        if len(buf) == 2 and self.last_len == 2:
+            self.blk = 0   # a message length, after an ack or CRC
+        self.prev_len = self.last_len
+        self.last = buf
+        self.last_len = len(buf)
+
+    def readfrom_into(self, addr, buf):
+        if self.last_len > 2:
+            sums = self.sums[self.blk]
+            buf[0] = sums[0]
+            buf[1] = sums[1]
+            self.blk += 1
+        elif self.prev_len > 2:
+            buf[0] = 0
+            buf[1] = 0xFF
+        else:
+            buf[0] = self.last[0]
+            buf[1] = self.last[1]
+
+def message():
+    msg = bytearray(MSG_LEN)
+    for i in range(MSG_LEN):
+        msg[i] = 32 + i % 90
+    return bytes(msg)
+
+async def run(mode, blk, msg):
+    i2c = LoopI2c()
+    ctl = I2cController(i2c=i2c, max_blk=128)
+    ctl.set_caps(ADDR, blk // 16 | CAPS[mode])
+
+    # the stand in needs the checksums of the blocks
+    def chksums(ctl, i2c):
+        i2c.sums = []
+        if mode == "icmpv6" or mode == "crc":
+            ctl.blk_crc = mode == "crc"
+            buff = msg.encode("utf8") if isinstance(msg, str) else msg
+            for offs in range(0, len(buff), blk):
+                cs = ctl.chksum(buff, offs, min(offs + blk, len(buff)))
+                i2c.sums.append(cs.to_bytes(2, sys.byteorder))
+    chksums(ctl, i2c)
+
+    # warm up, the memoryviews of the frame are made on first use
+    assert await ctl.send_msg(ADDR, msg)
+
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        await ctl.send_msg(ADDR, msg)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = per(m, REPEAT)
+    gc.enable()
+
+    assert ctl.failed_cnt == 0 and ctl.resend_cnt == 0
+    return {"us":round(t / REPEAT, 1), "bytes":m}
+
+async def main():
+    msg = message()
+    results = {}
+
+    ctl_uasyncio = i2c_controller.uasyncio
+    i2c_controller.uasyncio = _NoSleep()
+    try:
+        for mode in ("icmpv6", "crc", "stream"):
+            for blk, text in ((16, False), (64, False), (64, True)):
+                key = "{} blk={}{}".format(mode, blk, " str" if text else "")
+                m = msg.decode("utf8") if text else msg
+                results[key] = r = await run(mode, blk, m)
+                print("{:20} {:7}us  {:5} bytes per send".format(key, r["us"], "-" if r["bytes"] is None else r["bytes"]))
+    finally:
+        i2c_controller.uasyncio = ctl_uasyncio
+
+    return results
+
+if __name__ == "__main__":
+    uasyncio.run(main())
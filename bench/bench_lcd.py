@@ -0,0 +1,157 @@
+"""
+    Benchmark: LCD writes for a backlog of XmitLcd messages, each message
+    displayed as it is versus all of them merged by lcd_merge.py, as the
+    lcd service (service_lcd_v02.py) does with "merge_max".
+
+    Backlogs of 10 messages:
+    - clock:  time updates, cursor and text, as service_clock.py
+    - gyro:   three values on three rows, as svc_gyro_v01.py
+    - screen: clear and four lines, then nine updates of one line
+    - hg:     key echoes with the hourglass shown and blanked
+    - one:    a single clock update, which the lcd service displays
+              as it is rather than merging
+
+    A stand in for the LCD driver (lib/lcd_api.py) counts the commands
+    and characters written over I2C, and keeps the screen so the two
+    ways can be checked to end with the same text and cursor.
+    Reports writes, an estimate of the ms they take on a 400kHz I2C bus
+    (WRITE_US each, four 2 byte transfers, see pico_i2c_lcd.py) and the
+    us per backlog spent in Python.
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import utime
+
+from xmit_lcd import XmitLcd, CMD_CLEAR_SCREEN, CMD_DSP_HG, CMD_BLK_HG
+from lcd_merge import LcdMerge
+
+REPEAT  = 200
+COLS    = 20
+ROWS    = 4
+BACKLOG = 10
+
+WRITE_US = 100
+
+class CountLcd:
+
+    """
+        Screen and cursor as lib/lcd_api.py, counting I2C writes.
+        Commands are processed as service_lcd_v02.process_command().
+        The hourglass is drawn in the bottom right cell straight away,
+        and not blanked after its time.
+    """
+
+    def __init__(self):
+        self.rows = [[" "] * COLS for _ in range(ROWS)]
+        self.x = 0
+        self.y = 0
+        self.writes = 0
+
+    def command(self, cmd):
+        if cmd == CMD_CLEAR_SCREEN:
+            self.rows = [[" "] * COLS for _ in range(ROWS)]
+            self.x = 0
+            self.y = 0
+            self.writes += 6   # clear, home, backlight, display, blink, cursor
+        elif isinstance(cmd, dict) and "cursor" in cmd:
+            self.x, self.y = cmd["cursor"]
+            self.writes += 1
+        elif isinstance(cmd, dict) and CMD_DSP_HG in cmd or cmd == CMD_BLK_HG:
+            self.rows[ROWS - 1][COLS - 1] = "H" if cmd != CMD_BLK_HG else " "
+            self.x = COLS
+            self.y = ROWS - 1
+            self.writes += 2   # cursor and character
+        elif isinstance(cmd, dict) and "msg" in cmd:
+            for ch in cmd["msg"]:
+                if ch == "\n":
+                    self.x = 0
+                    self.y += 1
+                    continue
+                if self.x < COLS and self.y < ROWS:
+                    self.rows[self.y][self.x] = ch
+                    self.writes += 1
+                self.x += 1
+        else:
+            self.writes += 1
+
+    def screen(self):
+        return ["".join(row) for row in self.rows] + [(self.x, self.y)]
+
+def backlog(name):
+    msgs = []
+    for i in range(BACKLOG if name != "one" else 1):
+        xmit = XmitLcd(fr=name)
+        if name == "clock" or name == "one":
+            xmit.set_cursor(2, 1).set_msg("12:34:{:02}".format(i))
+        elif name == "gyro":
+            for row in range(3):
+                xmit.set_cursor(4, row).set_msg("{:6.1f}".format(i * 1.5 - row))
+        elif name == "screen":
+            if i == 0:
+                xmit.clear_screen()
+                for row in range(ROWS):
+                    xmit.set_cursor(0, row).set_msg("line {} of the screen".format(row))
+            else:
+                xmit.set_cursor(0, i % ROWS).set_msg("update {:<14}".format(i))
+        else:
+            xmit.set_cursor(0, 3).set_msg("key {}".format(i)).dsp_hg()
+            if i % 2:
+                xmit.blk_hg()
+        msgs.append(xmit.get_msg())
+    return msgs
+
+def each(msgs, merge):
+    lcd = CountLcd()
+    for cmds in msgs:
+        for cmd in cmds:
+            lcd.command(cmd)
+    return lcd
+
+# as service_lcd_v02.merge_msgs()
+def merged(msgs, merge):
+    lcd = CountLcd()
+    if len(msgs) == 1:
+        for cmd in msgs[0]:
+            lcd.command(cmd)
+        merge.passed(msgs[0])
+        return lcd
+    for cmds in msgs:
+        merge.add(cmds)
+    for cmd in merge.commands():
+        lcd.command(cmd)
+    return lcd
+
+def run(func, msgs):
+    merge = LcdMerge(COLS, ROWS)   # the lcd service keeps one
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        lcd = func(msgs, merge)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    return lcd, {"writes":lcd.writes,
+                 "bus_ms":round(lcd.writes * WRITE_US / 1000, 1),
+                 "us":round(t / REPEAT, 1)}
+
+async def main():
+    results = {}
+    for name in ("clock", "gyro", "screen", "hg", "one"):
+        msgs = backlog(name)
+        lcd_each, r_each = run(each, msgs)
+        lcd_merged, r_merged = run(merged, msgs)
+
+        # both ways must leave the same screen
+        assert lcd_each.screen() == lcd_merged.screen(), name
+
+        for path, r in (("each", r_each), ("merged", r_merged)):
+            key = "{} {}".format(name, path)
+            results[key] = r
+            print("{:14} {:5} writes  {:5}ms bus  {:7}us per backlog".format(
+                key, r["writes"], r["bus_ms"], r["us"]))
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
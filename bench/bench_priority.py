@@ -0,0 +1,127 @@
+"""
+    Benchmark: key to display latency under a message flood.
+
+    A "gyro" service floods the router with log lines and LCD updates,
+    keeping the log and lcd input queues full. The lcd takes 1ms to
+    render each message, like a real I2C LCD write.
+
+    While the flood runs, an "ir_remote" service sends a key feedback
+    (hourglass) XmitLcd to the lcd every 20ms. Reports the time from
+    put_to_output_q() until the lcd renders it
+    - fifo:     priority lanes not used, set_priority_svc([])
+    - priority: messages from "ir_remote" are high priority
+
+    The lcd uses the default "q_full" policy (see router.py), so in fifo
+    mode some key messages may be dropped. These are reported as lost.
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import uasyncio
+import utime
+
+from service import Service
+from router import Router
+from xmit_message import XmitMsg, set_priority_svc
+import xmit_lcd
+import service_controller
+
+KEY_CNT = 50
+WAIT_MS = 2000   # time to wait for the last key messages
+
+def svc_parms(name, **parms):
+    parms["name"] = name
+    parms["defaults"] = {"q_in_size":50, "q_out_size":50}
+    return parms
+
+def percentile(values, pct):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[int((len(values) - 1) * pct / 100)]
+
+# None, every key lost, as "-"
+def show_us(us):
+    return "-" if us is None else us
+
+async def flood_task(gyro):
+    i = 0
+    while True:
+        i += 1
+        await gyro.log_msg("gyro reading {}".format(i))
+        xmit = xmit_lcd.XmitLcd(fr=gyro.name)
+        xmit.set_cursor(2,1).set_msg("{: >4}".format(i % 1000))
+        await gyro.put_to_output_q(xmit)
+
+async def log_task(log):
+    q = log.get_input_queue()
+    while True:
+        await q.get()
+
+async def lcd_task(lcd, ir_id, received):
+    q = lcd.get_input_queue()
+    while True:
+        xmit = await q.get()
+        # render time
+        await uasyncio.sleep_ms(1)
+        if xmit.fr_id == ir_id:
+            received[id(xmit)] = utime.ticks_us()
+
+async def run_mode(priority):
+    set_priority_svc(["ir_remote"] if priority else [])
+
+    ctrl = service_controller.ModuleService(svc_parms("controller"))
+    ir   = Service(svc_parms("ir_remote"))
+    gyro = Service(svc_parms("gyro"))
+    lcd  = Service(svc_parms("lcd"))
+    log  = Service(svc_parms("log"))
+
+    svc_lookup = {"controller":ctrl, "ir_remote":ir, "gyro":gyro, "lcd":lcd, "log":log}
+
+    router = Router(svc_lookup, ctrl.route_xmit)
+    ctrl.set_router(router, None)
+
+    sent = {}
+    received = {}
+    tasks = [uasyncio.create_task(router.run()),
+             uasyncio.create_task(log_task(log)),
+             uasyncio.create_task(lcd_task(lcd, ir.svc_id, received)),
+             uasyncio.create_task(flood_task(gyro))]
+
+    # let the flood fill the queues
+    await uasyncio.sleep_ms(100)
+
+    for i in range(KEY_CNT):
+        xmit = xmit_lcd.XmitLcd(fr=ir.name)
+        xmit.dsp_hg()
+        sent[id(xmit)] = (xmit, utime.ticks_us())
+        await ir.put_to_output_q(xmit)
+        await uasyncio.sleep_ms(20)
+
+    wait = WAIT_MS
+    while len(received) < KEY_CNT and wait > 0:
+        await uasyncio.sleep_ms(10)
+        wait -= 10
+
+    for t in tasks:
+        t.cancel()
+
+    latency = [utime.ticks_diff(r, sent[k][1]) for k, r in received.items()]
+
+    return {"p50_us":percentile(latency, 50),
+            "p99_us":percentile(latency, 99),
+            "lost":KEY_CNT - len(received)}
+
+async def main():
+    results = {}
+    for mode in ("fifo", "priority"):
+        results[mode] = r = await run_mode(mode == "priority")
+        print("{:8} key->lcd p50 {:>7}us p99 {:>7}us  lost {}".format(
+            mode, show_us(r["p50_us"]), show_us(r["p99_us"]), r["lost"]))
+
+    return results
+
+if __name__ == "__main__":
+    uasyncio.run(main())
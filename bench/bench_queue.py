@@ -0,0 +1,122 @@
+"""
+    Benchmark: ring buffer Queue (lib/queue.py) versus the list based
+    Queue it replaced (queue_list.py).
+
+    For queue sizes 5, 50 and 1000:
+    - steady: the queue is kept one short of full, then OPS times
+      put_nowait() one item and get_nowait() one item. This is a busy
+      service input queue, where the list version moves every item
+      on each get.
+    - fill: put_nowait() until full then get_nowait() until empty,
+      repeated for OPS items.
+
+    Reports ns per put + get for each version. On MicroPython also
+    reports bytes allocated during the run (gc.mem_alloc()).
+
+    - batch: bursts of BURST items, moved one at a time with put_nowait()
+      and get_nowait() versus put_many_nowait() and get_many_nowait().
+      Reports ns per item and on_put() + on_get() callbacks (wakeups)
+      per burst, ring buffer Queue only.
+
+    To run, copy this file and queue_list.py to a Pico along with
+    lib/queue.py, or run on CPython with run_bench.py.
+
+"""
+
+import gc
+import utime
+
+import queue
+import queue_list
+
+SIZES = (5, 50, 1000)
+OPS   = 20_000
+BURST = 50
+
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return 0
+
+def steady(q, size):
+    for i in range(size - 1):
+        q.put_nowait(i)
+
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for i in range(OPS):
+        q.put_nowait(i)
+        q.get_nowait()
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = mem_alloc() - m
+    gc.enable()
+    return t, m
+
+def fill(q, size):
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for _ in range(OPS // size):
+        for i in range(size):
+            q.put_nowait(i)
+        for i in range(size):
+            q.get_nowait()
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = mem_alloc() - m
+    gc.enable()
+    return t, m
+
+def batch(many):
+    q = queue.Queue(BURST)
+    wakeups = [0]
+    def wake(hi=False):
+        wakeups[0] += 1
+    q.on_put(wake)
+    q.on_get(wake)
+
+    items = list(range(BURST))
+    out = []
+    bursts = OPS // BURST
+
+    gc.collect()
+    t = utime.ticks_us()
+    for _ in range(bursts):
+        if many:
+            q.put_many_nowait(items)
+            q.get_many_nowait(out, BURST)
+            out.clear()
+        else:
+            for i in items:
+                q.put_nowait(i)
+            while not q.empty():
+                q.get_nowait()
+    t = utime.ticks_diff(utime.ticks_us(), t)
+
+    return {"ns":t * 1000 // (bursts * BURST),
+            "wakeups":wakeups[0] // bursts}
+
+async def main():
+    results = {}
+    for test in (steady, fill):
+        for size in SIZES:
+            r = {}
+            for name, module in (("ring", queue), ("list", queue_list)):
+                t, m = test(module.Queue(size), size)
+                ops = OPS if test is steady else (OPS // size) * size
+                r[name + "_ns"] = t * 1000 // ops
+                if hasattr(gc, "mem_alloc"):
+                    r[name + "_alloc"] = m
+            results["{} size={}".format(test.__name__, size)] = r
+
+    results["batch one by one"] = batch(False)
+    results["batch get/put_many"] = batch(True)
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    for key, r in uasyncio.run(main()).items():
+        print(key, r)
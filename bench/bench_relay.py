@@ -0,0 +1,101 @@
+"""
+    Benchmark: a message received from one Responder and forwarded to
+    another, such as a log line from one node to the log on another,
+    with the binary wire format on both links (see xmit_codec.py).
+
+    From the bytes received on one link to the bytes sent on the other:
+    - eager: the payload is decoded when received and encoded again
+             when sent, as before raw payloads
+    - lazy:  the payload bytes received are sent as they are
+
+    And for a message to a local service, where the payload is read:
+    - read:  decode and get_msg(), the cost is the same either way
+
+    For a string (log line) and an LCD update. Reports us per message
+    and, on MicroPython, bytes allocated per message (gc.mem_alloc()).
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import gc
+import utime
+
+from xmit_message import XmitMsg, XmitFwd
+from xmit_lcd import XmitLcd
+from xmit_codec import Codec
+
+REPEAT = 2_000
+ADDR   = 66
+
+NAMES_A = ["controller", "menu", "lcd", "i2c_svc", "log",
+           "0x41_log", "0x41_keypad"]
+NAMES_B = ["controller", "menu", "lcd", "i2c_svc", "log",
+           "0x42_log", "0x42_lcd"]
+
+# None on CPython, where bytes allocated can not be counted
+def mem_alloc():
+    if hasattr(gc, "mem_alloc"):
+        return gc.mem_alloc()
+    return None
+
+# bytes allocated per n since mem_alloc() was m, None if not counted
+def per(m, n):
+    if m is None:
+        return None
+    return (mem_alloc() - m) // n
+
+def relay_eager(rcv, snd, data):
+    xmit = rcv.decode(data)
+    xmit.get_msg()
+    env = XmitFwd("0x42_log", "i2c_svc", xmit, ADDR)
+    return snd.encode(env.msg)
+
+def relay_lazy(rcv, snd, data):
+    xmit = rcv.decode(data)
+    env = XmitFwd("0x42_log", "i2c_svc", xmit, ADDR)
+    return snd.encode(env.msg)
+
+def read(rcv, snd, data):
+    return rcv.decode(data).get_msg()
+
+def run(func, rcv, snd, data):
+    gc.collect()
+    gc.disable()
+    m = mem_alloc()
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        func(rcv, snd, data)
+    t = utime.ticks_diff(utime.ticks_us(), t)
+    m = per(m, REPEAT)
+    gc.enable()
+    return {"us":round(t / REPEAT, 1), "bytes":m}
+
+async def main():
+    rcv = Codec(NAMES_A)
+    snd = Codec(NAMES_B)
+
+    log = XmitMsg("0x41_temp", "0x42_log",
+                  "temp 21.5C humidity 48% at 12:34:56 on node 0x41")
+    lcd = XmitLcd(fr="0x41_clock", to="0x42_lcd").clear_screen()
+    lcd.set_cursor(0, 1).set_msg("12:34:56").set_cursor(0, 2).set_msg("21.5C 48%")
+
+    results = {}
+    for name, xmit in (("log", log), ("lcd", lcd)):
+        data = bytes(rcv.encode(xmit))
+
+        # both paths must send the same bytes
+        assert relay_eager(rcv, snd, data) == relay_lazy(rcv, snd, data)
+
+        for path, func in (("eager", relay_eager), ("lazy", relay_lazy),
+                           ("read", read)):
+            key = "{} {}".format(path, name)
+            results[key] = r = run(func, rcv, snd, data)
+            print("{:10} {:6}us  {:5} bytes per msg".format(key, r["us"], "-" if r["bytes"] is None else r["bytes"]))
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
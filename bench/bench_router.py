@@ -0,0 +1,100 @@
+"""
+    Benchmark: router throughput and latency versus number of services.
+
+    Starts controller.main() with N synthetic services (see svc_bench.py)
+    plus the controller and log services, as core_0_services.json would.
+    Each service sends MSG_CNT / N messages to the next service, the last
+    to the first, so every output and input queue is in use.
+
+    For each N reports:
+    - msgs_sec: messages delivered per second, first send to last receive
+    - p50_us, p99_us: time from put_to_output_q() until the receiving
+      service has the message
+    - lost: messages not delivered, see "q_full" in router.py
+
+    Usually run on CPython by run_bench.py. To run on a Pico, copy this
+    file and svc_bench.py along with the controller files, and use
+    smaller sizes.
+
+"""
+
+import uasyncio
+import utime
+
+import controller
+import svc_bench
+
+SIZES   = (10, 25, 50, 100, 200)
+MSG_CNT = 20_000  # messages sent by all services
+WAIT_MS = 10_000  # give up waiting for lost messages
+
+def percentile(values, pct):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[int((len(values) - 1) * pct / 100)]
+
+def bench_parms(n, direct):
+    names = ["bench_{}".format(i) for i in range(n)]
+
+    services = [{"name":"controller", "module":"service_controller",
+                 "startup_focus":"log"},
+                {"name":"log", "module":"service_print", "print_log":0}]
+
+    for i in range(n):
+        services.append({"name":names[i], "module":"svc_bench",
+                         "send_to":names[(i + 1) % n], "n_send":MSG_CNT // n})
+
+    return {"ctrl_svc":"controller",
+            "log_xmit":False,
+            "direct_delivery":direct,
+            "defaults":{"q_in_size":50, "q_out_size":50, "i2c_bus_1":None},
+            "services":services}
+
+async def run_size(n, direct=False):
+    svc_bench.reset()
+    main = uasyncio.create_task(controller.main(bench_parms(n, direct)))
+
+    # let services start and the router wait for messages
+    await uasyncio.sleep_ms(100)
+
+    expected = n * (MSG_CNT // n)
+    latency = svc_bench.latency
+
+    start = utime.ticks_us()
+    svc_bench.start.set()
+
+    wait = WAIT_MS
+    while len(latency) < expected and wait > 0:
+        await uasyncio.sleep_ms(10)
+        wait -= 10
+
+    elapsed = utime.ticks_diff(svc_bench.last_us, start)
+
+    main.cancel()
+
+    # stop the services, they are not tracked by controller.main()
+    # (CPython only, MicroPython has no all_tasks())
+    if hasattr(uasyncio, "all_tasks"):
+        for t in uasyncio.all_tasks():
+            if t is not uasyncio.current_task():
+                t.cancel()
+        await uasyncio.sleep_ms(0)
+
+    return {"msgs_sec":int(len(latency) * 1_000_000 / elapsed),
+            "p50_us":percentile(latency, 50),
+            "p99_us":percentile(latency, 99),
+            "lost":expected - len(latency)}
+
+async def main(sizes=SIZES):
+    results = {}
+    for direct in (False, True):
+        for n in sizes:
+            key = "{} n={}".format("direct" if direct else "routed", n)
+            results[key] = await run_size(n, direct)
+
+    return results
+
+if __name__ == "__main__":
+    for key, r in uasyncio.run(main()).items():
+        print(key, r)
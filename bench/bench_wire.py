@@ -0,0 +1,82 @@
+"""
+    Benchmark: bytes sent over I2C per message, JSON versus the binary
+    wire format (see xmit_codec.py).
+
+    Typical messages between the Controller and a Responder:
+    - lcd_time:  clock style XmitLcd update, cursor and text
+    - lcd_clear: XmitLcd which clears the screen and writes two lines
+    - key:       IR key sent to a remote service with focus
+    - log:       log line from a Responder service to the log
+
+    For each reports bytes, and us to encode and to decode, for each format.
+    Decode includes get_msg(), as a binary payload is only decoded then.
+    The names table is the service names in the two JSON files.
+
+    To run, copy this file to a Pico along with the controller files,
+    or run on CPython with run_bench.py.
+
+"""
+
+import utime
+
+from xmit_message import XmitMsg
+from xmit_lcd import XmitLcd
+from xmit_codec import Codec
+
+REPEAT = 2_000
+
+CTL_NAMES  = ["controller", "menu", "lcd", "i2c_svc", "log", "ir_remote", "test_i2c"]
+RESP_NAMES = ["0x41_log", "0x41_keypad", "i2c_svc", "0x41_ctrl",
+              "0x41_neopixel_v2", "0x41_temp_humid", "buzzer", "pnp_svc"]
+
+def messages():
+    lcd_time = XmitLcd(fr="0x41_temp_humid")
+    lcd_time.set_cursor(2, 1).set_msg("12:34:56")
+
+    lcd_clear = XmitLcd(fr="0x41_temp_humid").clear_screen()
+    lcd_clear.set_msg("⏶ Temp 21.5°C").set_cursor(0, 1).set_msg("⏷ Humid 45%")
+
+    return {"lcd_time":lcd_time,
+            "lcd_clear":lcd_clear,
+            "key":XmitMsg("ir_remote", "0x41_neopixel_v2", "⏵"),
+            "log":XmitMsg("0x41_temp_humid", "log", "read sensor: 21.5 45")}
+
+def time_us(func, arg):
+    t = utime.ticks_us()
+    for i in range(REPEAT):
+        func(arg)
+    return round(utime.ticks_diff(utime.ticks_us(), t) / REPEAT, 1)
+
+def decode_msg(codec, wire):
+    return codec.decode(wire).get_msg()
+
+def measure(codec, xmit):
+    data = codec.encode(xmit)
+    if isinstance(data, str):
+        size = len(data.encode("utf8"))
+        wire = data.encode("utf8")
+    else:
+        size = len(data)
+        wire = bytes(data)
+
+    return {"bytes":size,
+            "encode_us":time_us(codec.encode, xmit),
+            "decode_us":time_us(lambda w: decode_msg(codec, w), wire)}
+
+async def main():
+    json_codec = Codec()
+    bin_codec  = Codec(CTL_NAMES + RESP_NAMES)
+
+    results = {}
+    for name, xmit in messages().items():
+        for fmt, codec in (("json", json_codec), ("bin", bin_codec)):
+            key = "{} {}".format(name, fmt)
+            results[key] = r = measure(codec, xmit)
+            print("{:14} {:4} bytes  encode {:6}us  decode {:6}us".format(
+                key, r["bytes"], r["encode_us"], r["decode_us"]))
+
+    return results
+
+if __name__ == "__main__":
+    import uasyncio
+    uasyncio.run(main())
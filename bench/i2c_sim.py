@@ -0,0 +1,305 @@
+"""
+    I2C bus simulator, for benchmarks of the I2C message protocol.
+
+    Runs the real I2cController (i2c_controller.py) against one or more
+    real I2CResponders (i2c_responder.py), on a simulated bus with a
+    simulated clock, so results do not depend on the host:
+
+        bus = SimBus(freq=100_000)
+        resp = bus.add_responder(0x41, blk_size=64)
+        ctl = I2cController(i2c=SimI2c(bus))
+
+        bus.run(ctl.send_msg(0x41, msg))     # returns the result
+        bus.now_us                           # simulated time so far
+
+    RecordI2c keeps the bytes the Controller reads, for ReplayI2c to
+    play back to it later without a bus or Responder.
+
+    Only the register level of the Responder is simulated: its Rx FIFO,
+    read requests and the byte written for a read. The Responder runs
+    the loop of I2CResponder.poll_snd_rcv(), without the idle sleeps,
+    one step at a time, whenever the Controller is waiting for it. It
+    is assumed to empty its Rx FIFO between Controller transfers.
+
+    Time is counted for:
+    - each transfer on the bus, start, address, data and stop bits
+    - resp_byte_us for each byte the Controller reads, and each byte
+      written past the 16 byte Rx FIFO, while the Responder holds SCL
+    - uasyncio.sleep_ms() in i2c_controller.py
+    Python run time on the Controller and Responder is not counted.
+
+    With error_every=n, one bit is flipped in every n-th transfer of
+    more than 4 bytes, the blocks of a message rather than its length,
+    checksums and acks, which neither end can recover from being wrong.
+    The transfers flipped are counted in errors.
+
+    add_responder(addr, ready=True) gives the Responder a SimPin as its
+    data ready line, which the Controller can read as resp.ready.
+    The Responder sets it as it takes messages from q_in, call
+    resp.set_ready() after putting one there.
+
+"""
+
+import i2c_controller
+import i2c_responder
+from i2c_responder import I2CResponder, _SEND_AVAILABLE
+
+FIFO_DEPTH = 16
+
+# Steps a Responder may take to answer a read before the bus gives up
+_MAX_STEPS = 100_000
+
+class _SimAsyncio:
+
+    """ Stands in for uasyncio in i2c_controller.py, sleeps use the bus clock """
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    async def sleep_ms(self, ms):
+        self.bus.now_us += ms * 1000
+        self.bus.sleep_us += ms * 1000
+
+class _SimMem:
+
+    """ Stands in for mem32 in i2c_responder.py, reads the Rx FIFO """
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def __getitem__(self, addr):
+        return self.bus.current.rx.pop(0)
+
+class SimPin:
+
+    """ Stands in for machine.Pin, a data ready line """
+
+    def __init__(self):
+        self.v = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.v
+        self.v = v
+
+class SimResponder(I2CResponder):
+
+    """ I2CResponder with the Pico registers replaced by the simulator """
+
+    def __init__(self, bus, addr, ready=False, **kwargs):
+        self.bus = bus
+        self.rx = []          # bytes written by the Controller, not yet read
+        self.rd_req = False   # Controller waiting for a byte
+        self.tx = 0           # byte for the Controller
+        self.hold = False
+        self.overflow = 0
+        super().__init__(responder_address=addr, trace=False, **kwargs)
+        self.received = []    # messages from the Controller
+        if ready:
+            self.ready = SimPin()
+        self.task = self.serve()
+
+    def write_reg(self, register_offset, data, method=0):
+        pass
+
+    def hold_bus_when_full(self):
+        self.hold = True
+
+    def read_is_pending(self):
+        return self.rd_req
+
+    def write_data_is_available(self):
+        return len(self.rx) > 0
+
+    def put_read_data(self, data):
+        self.tx = data & 0xFF
+        self.rd_req = False
+
+    # as poll_snd_rcv()
+    async def serve(self):
+        while True:
+            rw = await self.await_send_rcv_avail()
+            if rw == _SEND_AVAILABLE:
+                if self.q_in.empty():
+                    await self.send_msg("")
+                else:
+                    msg = self.q_in.get_nowait()
+                    self.set_ready()
+                    await self.send_msg(msg)
+            else:
+                msg = await self.rcv_msg()
+                if len(msg) > 0:
+                    self.received.append(msg)
+
+    def step(self):
+        self.bus.current = self
+        self.task.send(None)
+
+class SimBus:
+
+    def __init__(self, freq=100_000, resp_byte_us=20, error_every=0):
+        self.freq = freq
+        self.resp_byte_us = resp_byte_us
+        self.error_every = error_every
+        self.responders = {}
+        self.current = None
+
+        self.now_us   = 0
+        self.sleep_us = 0   # part of now_us spent in sleep_ms()
+        self.busy_us  = 0   # part of now_us the bus is in use
+        self.xfers    = 0   # transfers, writeto() or readfrom_into()
+        self.bytes    = 0   # data bytes transferred
+        self.errors   = 0   # transfers with a bit flipped
+        self.data_xfers = 0 # transfers of more than 4 bytes
+
+    def add_responder(self, addr, **kwargs):
+        resp = SimResponder(self, addr, **kwargs)
+        self.responders[addr] = resp
+        return resp
+
+    # start, address, n data bytes, each with an ack bit, and stop
+    def xfer_us(self, n):
+        return (2 + 9 * (n + 1)) * 1_000_000 / self.freq
+
+    # Index of the byte to flip in a transfer of n bytes, or -1
+    def error_at(self, n):
+        if self.error_every == 0 or n <= 4:
+            return -1
+        self.data_xfers += 1
+        if self.data_xfers % self.error_every:
+            return -1
+        self.errors += 1
+        return self.data_xfers % n
+
+    def responder(self, addr):
+        resp = self.responders.get(addr)
+        if resp is None:
+            raise OSError(5)   # EIO, as MicroPython when nothing acks
+        return resp
+
+    def writeto(self, addr, buf):
+        resp = self.responder(addr)
+        n = len(buf)
+        self.xfers += 1
+        self.bytes += n
+        self.now_us += self.xfer_us(n)
+        self.busy_us += self.xfer_us(n)
+        error_at = self.error_at(n)
+
+        for i in range(n):
+            b = buf[i]
+            if i == error_at:
+                b ^= 0x10
+            if len(resp.rx) >= FIFO_DEPTH:
+                if not resp.hold:
+                    resp.overflow += 1
+                    continue
+                # SCL held low until the Responder reads the FIFO
+                self.now_us += self.resp_byte_us
+                self.busy_us += self.resp_byte_us
+                steps = 0
+                while len(resp.rx) >= FIFO_DEPTH:
+                    resp.step()
+                    steps += 1
+                    if steps > _MAX_STEPS:
+                        raise OSError(116)   # ETIMEDOUT
+            resp.rx.append(b)
+
+        # the Responder reads the FIFO before the Controller's next transfer
+        steps = 0
+        while len(resp.rx) > 0:
+            resp.step()
+            steps += 1
+            if steps > _MAX_STEPS:
+                raise OSError(116)   # ETIMEDOUT
+        return n
+
+    def readfrom_into(self, addr, buf):
+        resp = self.responder(addr)
+        n = len(buf)
+        self.xfers += 1
+        self.bytes += n
+        self.now_us += self.xfer_us(n) + n * self.resp_byte_us
+        self.busy_us += self.xfer_us(n) + n * self.resp_byte_us
+        error_at = self.error_at(n)
+
+        for i in range(n):
+            resp.rd_req = True
+            steps = 0
+            while resp.rd_req:
+                resp.step()
+                steps += 1
+                if steps > _MAX_STEPS:
+                    raise OSError(116)   # ETIMEDOUT
+            buf[i] = resp.tx ^ 0x10 if i == error_at else resp.tx
+
+    # Run a coroutine of the Controller, such as send_msg(), to the end
+    # and return its result.
+    def run(self, coro):
+        ctl_uasyncio = i2c_controller.uasyncio
+        resp_mem32 = i2c_responder.mem32
+        i2c_controller.uasyncio = _SimAsyncio(self)
+        i2c_responder.mem32 = _SimMem(self)
+        try:
+            while True:
+                coro.send(None)
+        except StopIteration as e:
+            return e.value
+        finally:
+            i2c_controller.uasyncio = ctl_uasyncio
+            i2c_responder.mem32 = resp_mem32
+
+class SimI2c:
+
+    """ Controller side of the bus, as machine.I2C """
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def scan(self):
+        return list(self.bus.responders.keys())
+
+    def writeto(self, addr, buf):
+        return self.bus.writeto(addr, buf)
+
+    def readfrom_into(self, addr, buf):
+        self.bus.readfrom_into(addr, buf)
+
+class RecordI2c(SimI2c):
+
+    """ SimI2c which keeps a copy of the bytes of each read in reads """
+
+    def __init__(self, bus):
+        super().__init__(bus)
+        self.reads = []
+
+    def readfrom_into(self, addr, buf):
+        self.bus.readfrom_into(addr, buf)
+        self.reads.append(bytes(buf))
+
+class ReplayI2c:
+
+    """
+        Controller side of a bus which answers reads with the bytes
+        recorded by RecordI2c, in order, from the start after rewind().
+        Writes are ignored. Does not allocate.
+    """
+
+    def __init__(self, reads):
+        self.reads = reads
+        self.i = 0
+
+    def rewind(self):
+        self.i = 0
+
+    def scan(self):
+        return []
+
+    def writeto(self, addr, buf):
+        return len(buf)
+
+    def readfrom_into(self, addr, buf):
+        rec = self.reads[self.i]
+        self.i += 1
+        for j in range(len(buf)):
+            buf[j] = rec[j]
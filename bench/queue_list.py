@@ -0,0 +1,127 @@
+# queue_list.py: lib/queue.py before it used a ring buffer.
+# Kept so bench_queue.py can compare the two.
+
+# queue.py: adapted from uasyncio V2
+
+# Copyright (c) 2018-2020 Peter Hinch
+# Released under the MIT License (MIT) - see LICENSE file
+
+# Code is based on Paul Sokolovsky's work.
+# This is a temporary solution until uasyncio V3 gets an efficient official version
+
+import uasyncio as asyncio
+
+
+# Exception raised by get_nowait().
+class QueueEmpty(Exception):
+    pass
+
+
+# Exception raised by put_nowait().
+class QueueFull(Exception):
+    pass
+
+class Queue:
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self._queue = []
+        self._queue_hi = []  # High priority items, returned before any in _queue
+        self._evput = asyncio.Event()  # Triggered by put, tested by get
+        self._evget = asyncio.Event()  # Triggered by get, tested by put
+        self._on_put = None  # Optional callback, see on_put()
+        self._on_get = None  # Optional callback, see on_get()
+
+    def _get(self):
+        self._evget.set()  # Schedule all tasks waiting on get
+        self._evget.clear()
+        if len(self._queue_hi) > 0:
+            val = self._queue_hi.pop(0)
+        else:
+            val = self._queue.pop(0)
+        if self._on_get is not None:
+            self._on_get()
+        return val
+
+    async def get(self):  #  Usage: item = await queue.get()
+        while self.empty():  # May be multiple tasks waiting on get()
+            # Queue is empty, suspend task until a put occurs
+            # 1st of N tasks gets, the rest loop again
+            await self._evput.wait()
+        return self._get()
+
+    def get_nowait(self):  # Remove and return an item from the queue.
+        # Return an item if one is immediately available, else raise QueueEmpty.
+        if self.empty():
+            raise QueueEmpty()
+        return self._get()
+
+    def _put(self, val, hi):
+        self._evput.set()  # Schedule tasks waiting on put
+        self._evput.clear()
+        if hi:
+            self._queue_hi.append(val)
+        else:
+            self._queue.append(val)
+        if self._on_put is not None:
+            self._on_put(hi)
+
+    # hi=True puts the item in the high priority lane.
+    # get() returns all high priority items before any others.
+    async def put(self, val, hi=False):  # Usage: await queue.put(item)
+        while self.full():
+            # Queue full
+            await self._evget.wait()
+            # Task(s) waiting to get from queue, schedule first Task
+        self._put(val, hi)
+
+    def put_nowait(self, val, hi=False):  # Put an item into the queue without blocking.
+        if self.full():
+            raise QueueFull()
+        self._put(val, hi)
+
+    # Call func(hi) after every put, where hi is the priority of the item.
+    # Lets a consumer of several queues, such as the message router,
+    # wait on one Event instead of polling.
+    # func() must not block or put to this queue.
+    def on_put(self, func):
+        self._on_put = func
+
+    # Call func() after every get.
+    # func() may put_nowait() to this queue, but must not block.
+    def on_get(self, func):
+        self._on_get = func
+
+    # Remove the oldest item to make room in a full queue.
+    # Low priority items are removed before any high priority item.
+    def drop_oldest(self):
+        if len(self._queue) > 0:
+            return self._queue.pop(0)
+        return self._queue_hi.pop(0)
+
+    # Replace the first item in the hi (or low) priority lane which has the
+    # same key(item) as val. Return the item replaced, or None if there
+    # was no such item.
+    def replace(self, val, key, hi=False):
+        q = self._queue_hi if hi else self._queue
+        k = key(val)
+        for i in range(len(q)):
+            old = q[i]
+            if key(old) == k:
+                q[i] = val
+                return old
+        return None
+
+    def qsize(self):  # Number of items in the queue.
+        return len(self._queue) + len(self._queue_hi)
+
+    def hi_qsize(self):  # Number of high priority items in the queue.
+        return len(self._queue_hi)
+
+    def empty(self):  # Return True if the queue is empty, False otherwise.
+        return self.qsize() == 0
+
+    def full(self):  # Return True if there are maxsize items in the queue.
+        # Note: if the Queue was initialized with maxsize=0 (the default) or
+        # any negative number, then full() is never True.
+        return self.maxsize > 0 and self.qsize() >= self.maxsize
\ No newline at end of file
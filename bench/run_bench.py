@@ -0,0 +1,147 @@
+"""
+    Run the benchmarks on CPython and save or compare the results.
+
+    The real mbos modules are used. bench/shim provides the MicroPython
+    modules they import (uasyncio, utime, machine, micropython, ujson).
+
+        python bench/run_bench.py                       run all benchmarks
+        python bench/run_bench.py bench_router          run one benchmark
+        python bench/run_bench.py --save results/new.json
+        python bench/run_bench.py --compare results/baseline.json
+
+    Each benchmark is run --repeat times and the best value of each
+    result is kept, which takes out most of the noise from other work
+    on the host.
+
+    --compare prints the change from a saved run and exits with status 1
+    if any result is worse by more than --tolerance percent
+    (msgs_sec lower, any latency or "lost" higher).
+
+    See README.md in this directory.
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR  = os.path.dirname(BENCH_DIR)
+
+sys.path[:0] = [os.path.join(BENCH_DIR, "shim"), BENCH_DIR,
+                ROOT_DIR, os.path.join(ROOT_DIR, "lib")]
+
+import uasyncio
+
+BENCHMARKS = ["bench_router", "bench_direct", "bench_priority", "bench_queue",
+              "bench_alloc", "bench_wire", "bench_fwd", "bench_relay",
+              "bench_lcd", "bench_i2c_blk", "bench_i2c_stream",
+              "bench_chksum", "bench_i2c_send", "bench_i2c_rcv",
+              "bench_i2c_poll"]
+
+# results where bigger is better, all others are smaller is better
+HIGHER_IS_BETTER = ("msgs_sec", "msgs_per_sec", "bytes_sec")
+
+# None (no value) is never better
+def better(k, a, b):
+    if a is None:
+        return False
+    if b is None:
+        return True
+    if k in HIGHER_IS_BETTER:
+        return a > b
+    return a < b
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        print("running {} ...".format(name), flush=True)
+        module = __import__(name)
+
+        for _ in range(repeat):
+            # controller.main() and services print while starting up
+            with contextlib.redirect_stdout(io.StringIO()):
+                r = uasyncio.run(module.main())
+
+            for key, values in r.items():
+                key = "{}: {}".format(name, key)
+                best = results.setdefault(key, dict(values))
+                for k, v in values.items():
+                    if better(k, v, best[k]):
+                        best[k] = v
+
+    return results
+
+def show(results):
+    for key, values in results.items():
+        print("{:32} {}".format(key, "  ".join(
+            "{} {}".format(k, v) for k, v in values.items())))
+
+# Print the percent change of each result from old.
+# Return the number of results which are worse than tolerance percent.
+def compare(results, old, tolerance):
+    worse = 0
+    for key, values in results.items():
+        if key not in old:
+            continue
+
+        for k, v in values.items():
+            was = old[key].get(k)
+            if was is None:
+                continue
+
+            # no result now, such as every message lost, is worse
+            if v is None:
+                worse += 1
+                print("{:32} {:10} {:>10} -> {:>10}          WORSE".format(
+                    key, k, was, "-"))
+                continue
+
+            if was == 0:
+                continue
+
+            change = (v - was) * 100 / was
+            if abs(change) > tolerance and better(k, was, v):
+                worse += 1
+                print("{:32} {:10} {:>10} -> {:>10} {:+7.1f}% WORSE".format(
+                    key, k, was, v, change))
+
+    return worse
+
+def main():
+    parser = argparse.ArgumentParser(description="mbos benchmarks")
+    parser.add_argument("bench", nargs="*", default=BENCHMARKS)
+    parser.add_argument("--save", help="save results as json")
+    parser.add_argument("--compare", help="compare with saved json results")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each benchmark, best result is kept")
+    parser.add_argument("--tolerance", type=float, default=30.0,
+                        help="percent change allowed by --compare")
+    args = parser.parse_args()
+
+    results = run(args.bench, args.repeat)
+    show(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python":platform.python_version(),
+                       "machine":platform.machine(),
+                       "date":time.strftime("%Y-%m-%d"),
+                       "results":results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["results"]
+
+        worse = compare(results, old, args.tolerance)
+        print("{} results worse than {}%".format(worse, args.tolerance))
+        if worse > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
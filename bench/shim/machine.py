@@ -0,0 +1,85 @@
+"""
+    machine shim for running benchmarks on CPython.
+
+    Just enough of Pin, I2C, Timer and mem32 for controller.py to start.
+    There is no hardware, so I2C.scan() finds no devices. A Timer calls
+    back on the running asyncio loop.
+"""
+
+import asyncio
+
+class Pin:
+    IN  = 0
+    OUT = 1
+    PULL_UP   = 1
+    PULL_DOWN = 2
+    IRQ_RISING  = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, *args, **kwargs):
+        self._v = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._v
+        self._v = v
+
+    def on(self):
+        self._v = 1
+
+    def off(self):
+        self._v = 0
+
+    def irq(self, *args, **kwargs):
+        pass
+
+class I2C:
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def scan(self):
+        return []
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self._handle = None
+        if len(kwargs) > 0:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=None):
+        self.deinit()
+        if freq is not None:
+            period = 1000 / freq
+        self._mode = mode
+        self._period = period
+        self._callback = callback
+        self._start()
+
+    def _start(self):
+        self._handle = asyncio.get_running_loop().call_later(self._period / 1000, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        if self._mode == Timer.PERIODIC:
+            self._start()
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+class _Mem:
+
+    def __getitem__(self, addr):
+        return 0
+
+    def __setitem__(self, addr, v):
+        pass
+
+mem32 = _Mem()
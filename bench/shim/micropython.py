@@ -0,0 +1,15 @@
+"""
+    micropython shim for running benchmarks on CPython.
+"""
+
+def const(x):
+    return x
+
+def native(f):
+    return f
+
+def viper(f):
+    return f
+
+def schedule(func, arg):
+    func(arg)
@@ -0,0 +1,31 @@
+"""
+    uasyncio shim for running benchmarks on CPython.
+
+    Maps the MicroPython uasyncio names used by mbos onto asyncio.
+"""
+
+from asyncio import *
+import asyncio as _asyncio
+
+async def sleep_ms(ms):
+    await _asyncio.sleep(ms / 1000)
+
+async def wait_for_ms(aw, ms):
+    return await _asyncio.wait_for(aw, ms / 1000)
+
+# On MicroPython set() may be called from an interrupt handler.
+# wait() clears the flag, only one task may wait.
+class ThreadSafeFlag:
+
+    def __init__(self):
+        self._ev = _asyncio.Event()
+
+    def set(self):
+        self._ev.set()
+
+    def clear(self):
+        self._ev.clear()
+
+    async def wait(self):
+        await self._ev.wait()
+        self._ev.clear()
@@ -0,0 +1,5 @@
+"""
+    ujson shim for running benchmarks on CPython.
+"""
+
+from json import *
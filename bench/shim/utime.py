@@ -0,0 +1,28 @@
+"""
+    utime shim for running benchmarks on CPython.
+
+    Ticks do not wrap, so ticks_diff() is a simple subtraction.
+"""
+
+import time as _time
+
+def ticks_ms():
+    return int(_time.perf_counter() * 1_000)
+
+def ticks_us():
+    return int(_time.perf_counter() * 1_000_000)
+
+def ticks_diff(a, b):
+    return a - b
+
+def ticks_add(a, b):
+    return a + b
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+def sleep_us(us):
+    _time.sleep(us / 1_000_000)
+
+def localtime(*args):
+    return _time.localtime(*args)[:8]
@@ -0,0 +1,50 @@
+"""
+    Synthetic service for bench_alloc.py.
+
+    With a "send_to" parm, waits for the benchmark to set "start" then
+    sends "n_send" messages with send_msg(), as most services do.
+
+    Otherwise it is a sink: every message received is counted and
+    released to the message pool, as the log and I2C services do.
+    An XmitFwd envelope and the message in it are both released.
+
+"""
+
+from service import Service
+from xmit_message import release, XmitFwd
+import uasyncio
+
+# set up by bench_alloc.py before each run
+start    = None   # uasyncio.Event
+received = 0
+
+def reset():
+    global start, received
+    start = uasyncio.Event()
+    received = 0
+
+# All services classes are named ModuleService
+class ModuleService(Service):
+
+    async def run(self):
+        to = self.get_parm("send_to", None)
+        if to is not None:
+            await self.send(to)
+            return
+
+        global received
+        q_in = self.get_input_queue()
+        while True:
+            xmit = await q_in.get()
+            received += 1
+            if isinstance(xmit, XmitFwd):
+                release(xmit.msg)
+            release(xmit)
+
+    async def send(self, to):
+        n = self.get_parm("n_send", 0)
+
+        await start.wait()
+
+        for i in range(n):
+            await self.send_msg(to, "key")
@@ -0,0 +1,48 @@
+"""
+    Synthetic service for bench_router.py.
+
+    Waits for the benchmark to set "start", then sends "n_send" messages
+    to the "send_to" service. Each message is the utime.ticks_us() at
+    which it was put on the output queue. Every message received is
+    turned into a latency and appended to "latency".
+
+"""
+
+from service import Service
+from xmit_message import XmitMsg
+import uasyncio
+import utime
+
+# set up by bench_router.py before each run
+start   = None   # uasyncio.Event
+latency = []     # enqueue to deliver, us
+last_us = 0      # ticks_us() of the last message received
+
+def reset():
+    global start, last_us
+    start = uasyncio.Event()
+    latency.clear()
+    last_us = 0
+
+# All services classes are named ModuleService
+class ModuleService(Service):
+
+    async def run(self):
+        uasyncio.create_task(self.send())
+
+        q_in = self.get_input_queue()
+        global last_us
+
+        while True:
+            xmit = await q_in.get()
+            last_us = utime.ticks_us()
+            latency.append(utime.ticks_diff(last_us, xmit.get_msg()))
+
+    async def send(self):
+        to = self.get_parm("send_to", None)
+        n = self.get_parm("n_send", 0)
+
+        await start.wait()
+
+        for i in range(n):
+            await self.put_to_output_q(XmitMsg(self.name, to, utime.ticks_us()))
@@ -1,7 +1,6 @@
 """
-    Start services asynchronously then check for service output messages.
-    Route output messages to the appropriate input queue.
-    Wait 0 milliseconds each loop to allow other coroutines opportunity to execute.
+    Start services asynchronously then route service output messages
+    to the appropriate input queue. See router.py.
     
     For now starts all of the services in the parms file.
     
@@ -14,7 +13,9 @@
 """
 
 import uasyncio
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, svc_id, set_priority_svc, set_pool_size
+from router import Router
+from trace_ring import TraceRing
 from machine import Pin, I2C
 
 from i2c_responder import I2CResponder
@@ -38,7 +39,11 @@ def get_i2c(parms):
     if resp_addr != None:
         # we're an I2C Responder
         i2cr = I2CResponder(bus, sda_gpio=sda, scl_gpio=scl,
-                            responder_address=resp_addr)
+                            responder_address=resp_addr,
+                            idle_ms=get_parm(parms,"i2c_idle_ms",2),
+                            blk_size=get_parm(parms,"i2c_blk_size",16),
+                            stream=get_parm(parms,"i2c_stream",False),
+                            ready_gpio=get_parm(parms,"i2c_ready_pin",None))
         
         uasyncio.create_task(i2cr.poll_snd_rcv())
         
@@ -72,6 +77,12 @@ async def main(parms):
     # where the servcie can be looked up by name
     print("ctrl: creating lookup list of Services")
     svc_lookup = {}
+    defaults["svc_lookup"] = svc_lookup  # for services which report on others, such as "q_stats"
+    
+    # give local services the lowest ids
+    # so the router route table is small
+    for svc_parms in parms["services"]:
+        svc_id(svc_parms['name'])
 
     for svc_parms in parms["services"]:
         print("... "+svc_parms['name']) # show name of service being started
@@ -91,28 +102,39 @@ async def main(parms):
     q_log = svc_lookup[log_svc].get_input_queue()
     await q_log.put(XmitMsg("ctrl","log","checking queues"))
     
-    # json parm: should we log to and from for all messages?
-    log_xmit = ("log_xmit" in parms) and (parms["log_xmit"] == True)
+    # json parm: should we trace to and from for all messages?
+    # see trace_ring.py
+    trace = None
+    if get_parm(parms,"log_xmit",False):
+        trace = TraceRing(get_parm(parms,"trace_size",64),
+                          get_parm(parms,"trace_sample",1))
+        
+        trace_svc = get_parm(parms,"trace_svc",None)
+        if trace_svc != None:
+            trace.set_filter([svc_id(name) for name in trace_svc])
+    
+    # json parm: services whose messages are high priority
+    # default is the IR remote, or keypad which pretends to be the IR remote
+    set_priority_svc(get_parm(parms,"priority_svc",
+                              [get_parm(defaults,"ir_remote","ir_remote")]))
+    
+    # json parm: number of free messages to keep for reuse, 0 for none
+    # see xmit_message.py
+    set_pool_size(get_parm(parms,"xmit_pool",0))
     
-    # controller service who does polling of output queues
+    # controller service who routes messages between services
     controller_name = parms["ctrl_svc"]
     controller_svc = svc_lookup[controller_name]
     
-    pass_cnt = 5
+    # router waits for messages on any output queue
+    # and passes them to controller_svc.route_xmit()
+    router = Router(svc_lookup, controller_svc.route_xmit,
+                    controller_svc.get_parm("route_batch",8))
+    controller_svc.set_router(router, trace)
     
-    while True:
-        
-        # msg_passed true if a message is passed from one service to another
-        msg_passed = await controller_svc.poll_output_queues(svc_lookup, log_xmit)      
-        
-        if msg_passed:
-            pass_cnt -= 1
-            if pass_cnt <= 0:
-                pass_cnt = 5
-                # await q_log.put(XmitMsg("controller","log","doing gc.collect()"))
-                # gc.collect()
-            
-        # allow co-routines to execute
-        await uasyncio.sleep_ms(0)
-        
-
+    # json parm: should services send directly to local services,
+    # bypassing their output queue and the router?
+    if get_parm(parms,"direct_delivery",False):
+        router.start_direct_delivery()
+    
+    await router.run()
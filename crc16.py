@@ -0,0 +1,65 @@
+"""
+    CRC-16/CCITT-FALSE: polynomial 0x1021, initial value 0xFFFF,
+    not reflected, no final xor. crc16(b"123456789") == 0x29B1.
+
+    Table driven, one table lookup per byte. Reads buff (bytes,
+    bytearray or memoryview) from start to end in place, without
+    slicing. Pass the result of one call as crc to continue over the
+    next part of a message.
+
+        crc = crc16(buff)
+        crc = crc16(buff, 0, 64)
+        crc = crc16(buff, 64, 128, crc)
+
+    On MicroPython the loop is compiled by the viper code emitter,
+    which reads buff and the table through raw pointers. Elsewhere,
+    such as CPython for the benchmarks, the same loop runs in Python.
+
+    Used for the I2C block checksums when both ends agree to it, in
+    place of calc_icmpv6_chksum.py, see i2c_controller.py.
+
+"""
+
+import sys
+from array import array
+import micropython
+
+def _make_table():
+    table = array("H", [0] * 256)
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ 0x1021
+            else:
+                crc = crc << 1
+        table[i] = crc & 0xFFFF
+    return table
+
+_TABLE = _make_table()
+
+def _crc16_py(buff, start, end, crc):
+    table = _TABLE
+    for i in range(start, end):
+        crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ buff[i]]
+    return crc
+
+_crc16 = _crc16_py
+
+if sys.implementation.name == "micropython":
+
+    @micropython.viper
+    def _crc16_viper(buff, start: int, end: int, crc: int) -> int:
+        p = ptr8(buff)
+        table = ptr16(_TABLE)
+        while start < end:
+            crc = ((crc << 8) & 0xFF00) ^ table[(crc >> 8) ^ p[start]]
+            start += 1
+        return crc
+
+    _crc16 = _crc16_viper
+
+def crc16(buff, start=0, end=None, crc=0xFFFF):
+    if end is None:
+        end = len(buff)
+    return _crc16(buff, start, end, crc)
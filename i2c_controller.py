@@ -5,6 +5,8 @@ import uasyncio
 import gc
 
 import calc_icmpv6_chksum
+from crc16 import crc16
+import micropython
 from micropython import const
 
 
@@ -16,6 +18,72 @@ _BLK_MSG_CHKSUM_OKAY           = const(127 + 4)
 _BLK_MSG_CHKSUM_ERR_RESENDING  = const(127 + 5)
 _BLK_MSG_CHKSUM_ERR_CANCEL     = const(127 + 6)
 
+# Block sizes are multiples of 16 bytes, up to _BLK_MAX_UNITS * 16
+_BLK_UNIT      = const(16)
+_BLK_MAX_UNITS = const(8)
+
+# Second byte of the length ack: block size in units,
+# streaming and CRC-16 block checksums offered
+_CAP_BLK_UNITS = const(0x0F)
+_CAP_STREAM    = const(0x10)
+_CAP_CRC       = const(0x20)
+
+# The top 4 bits of a length, or of the echo of a length, are the mode:
+# 0 lock-step, 1 to 8 streamed in blocks of that many units,
+# or _MODE_CRC lock-step with CRC-16 block checksums
+_LEN_MASK       = const(0x0FFF)
+_LEN_MODE_SHIFT = const(12)
+_MODE_CRC       = const(15)
+
+# The status of a streamed message counts bad blocks in one byte
+_STREAM_MAX_BLKS = const(255)
+
+_LITTLE = sys.byteorder == "little"
+
+# Put i in buff[0:2] as i.to_bytes(2,sys.byteorder), without allocating
+def _put_u16(buff, i):
+    if _LITTLE:
+        buff[0] = i & 0xFF
+        buff[1] = i >> 8
+    else:
+        buff[0] = i >> 8
+        buff[1] = i & 0xFF
+
+# Copy src[offs:offs+n] to the start of dst, or with _put, the start
+# of src to dst[offs:offs+n], without allocating.
+# On MicroPython, with the viper code emitter. See crc16.py.
+def _copy_py(dst, src, offs, n):
+    dst[0:n] = src[offs:offs+n]
+
+def _put_py(dst, offs, src, n):
+    dst[offs:offs+n] = src[0:n]
+
+_copy = _copy_py
+_put  = _put_py
+
+if sys.implementation.name == "micropython":
+
+    @micropython.viper
+    def _copy_viper(dst, src, offs: int, n: int):
+        d = ptr8(dst)
+        s = ptr8(src)
+        i = 0
+        while i < n:
+            d[i] = s[offs + i]
+            i += 1
+
+    @micropython.viper
+    def _put_viper(dst, offs: int, src, n: int):
+        d = ptr8(dst)
+        s = ptr8(src)
+        i = 0
+        while i < n:
+            d[offs + i] = s[i]
+            i += 1
+
+    _copy = _copy_viper
+    _put  = _put_viper
+
 
 class I2cController:
     
@@ -27,12 +95,73 @@ class I2cController:
         On both sends and receives expects the first two bytes
         to be an integer defining the length of the remaining data.
         
-        That data is then sent in blocks of up to 16 bytes.
+        That data is then sent in blocks of up to 16 bytes, or a larger
+        block size agreed with the Responder:
+        
+        A Responder which takes larger blocks sends its block size, in
+        units of 16 bytes, as the second byte of the length ack it sends
+        after every message length, [ACK_OK, 1 to 8]. Older Responders
+        send [ACK_OK, ACK_OK]. The Controller then uses the smaller of
+        that and max_blk for every block sent to or received from that
+        Responder. The Responder takes whatever block size is sent.
+        The Controller polls each Responder, so it learns the block size
+        with the first poll.
+        
+        Checksums: the checksum after each block is calc_icmpv6_chksum.py,
+        or CRC-16/CCITT (crc16.py), which also catches bytes swapped
+        within a block, if the Responder offers it by adding _CAP_CRC
+        (0x20) to the block size in its length ack.
+        
+        Streaming: instead of waiting for a checksum and sending an ack
+        after each block, a message can be streamed: every block is sent
+        at once, then a CRC-16 of the whole message, and only the blocks
+        the receiver reports as bad are sent again.
+        
+        - A Responder which streams adds _CAP_STREAM (0x10) to the block
+          size in its length ack. Older Responders are sent every message
+          in lock-step, as above.
+        - The Controller picks the mode of a message by setting the top
+          4 bits of the length it sends, or of its echo of the length it
+          receives: 1 to 8 to stream in blocks of that many units, or
+          _MODE_CRC (15) for lock-step with CRC-16 block checksums. Only
+          messages of 1 to 4095 bytes have a mode, and a message streams
+          if it has at most 255 blocks. If the echo is refused, the
+          Controller echoes the plain length and uses neither with that
+          Responder until its next length ack. A Responder which does not
+          take the mode of a length sent to it echoes the plain length,
+          and the Controller sends that message in lock-step, with the
+          same fallback.
+        - Each block is sent as [seq] + block + [check], where seq is the
+          block number from 0 and check the low byte of the CRC-16 of
+          the block, followed by the 2 byte CRC-16 of the message.
+        - The receiver replies with a status, [n, n ^ 0xFF] followed by
+          the seq of the n bad blocks: short, out of sequence or failing
+          their check. If only the message CRC fails, every block is bad.
+        - The sender sends the bad blocks again, in that order, then the
+          message CRC again, until n is 0 or after 8 tries.
+        - A receiver which can not take the message, as it is too long
+          for its buffer, still reads every block and the message CRC,
+          then replies [0xFF, 0xFF], which fails its check and cancels
+          the send.
+        
+        Sends and receives do not allocate for each block: each block
+        is copied into a buffer kept by the Controller and written, or
+        read, through a memoryview of it, made once for each length, and
+        checksums are taken in place. Streamed blocks and status are
+        sent the same way, and the Controller yields between blocks.
+        A str message is encoded to UTF-8 once, send bytes or a bytearray
+        to avoid that. A message received is decoded once, from self.buff,
+        where its blocks are put. A message longer than self.buff, 4096
+        bytes, is received in lock-step, as its echo never has a mode,
+        and dropped.
         
         Parms:
             - i2c_device_id = I2C device ID, 0 or 1
             - sda_pin=
             - scl_pin=
+            - max_blk = largest block size, 16 to 128 bytes
+            - stream  = stream messages to and from Responders which offer it
+            - crc     = use CRC-16 block checksums with Responders which offer it
             
 
     """
@@ -41,7 +170,8 @@ class I2cController:
         
     # add ability to pass in an existing i2c controller
     # If specified, will use that instead of creating a new one
-    def __init__(self, i2c_channel=0, scl_pin=1, sda_pin=0, i2c_freq=100_000, i2c=None):
+    def __init__(self, i2c_channel=0, scl_pin=1, sda_pin=0, i2c_freq=100_000, i2c=None,
+                 max_blk=128, stream=True, crc=True):
         
         if i2c == None:
             self.i2c = I2C(
@@ -56,6 +186,25 @@ class I2cController:
         self.buff_2  = bytearray(2)
         self.buff_16 = bytearray(16)
         self.buff    = bytearray(4096)
+        self.buff_view = memoryview(self.buff)
+        
+        self.max_blk  = min(max(max_blk, _BLK_UNIT), _BLK_UNIT * _BLK_MAX_UNITS)
+        self.blk_size = {}   # I2C address to block size, see above
+        
+        self.stream     = stream
+        self.crc        = crc
+        self.caps       = {}   # I2C address to _CAP_STREAM and _CAP_CRC offered
+        self.rcv_mode   = 0    # mode of the message being received, see above
+        self.blk_crc    = False  # lock-step checksums are CRC-16
+        self.status     = bytearray(_STREAM_MAX_BLKS + 2)
+        self.stat_views = {0:[None] * (len(self.status) + 1),
+                           2:[None] * (len(self.status) - 1)}
+        
+        # block being sent or received, [seq] + block + [check] if streamed,
+        # memoryviews of its first n bytes and of the block in a frame
+        self.frame      = bytearray(_BLK_UNIT * _BLK_MAX_UNITS + 2)
+        self.views      = [None] * (len(self.frame) + 1)
+        self.frame_blk  = memoryview(self.frame)[1:]
         
         self.send_cnt   = 0
         self.rcv_cnt    = 0
@@ -80,18 +229,27 @@ class I2cController:
         
         self.send_cnt = self.send_cnt + 1 
         
-        buff = bytearray(msg.encode("utf8"))
+        # str is sent as UTF-8, bytes as is
+        if isinstance(msg, str):
+            buff = msg.encode("utf8")
+        else:
+            buff = msg
         
-        # send and confirm message length
-        await self.snd_msg_length(addr,len(buff))
+        # send and confirm message length, with its mode
+        msg_len = len(buff)
+        mode = await self.snd_msg_length(addr,msg_len,self.msg_mode(addr, msg_len))
         if self.buff_2[0] == _BLK_MSG_LENGTH_ACK_ERR_CANCEL:
             return False
         
-        # send message in 16 byte blocks
+        if mode != 0 and mode != _MODE_CRC:
+            return await self.send_stream(addr,buff,mode * _BLK_UNIT)
+        self.blk_crc = mode == _MODE_CRC
+        
+        # send message in blocks of the agreed size
         # with checksum after each block
-        msg_len        = len(buff)
         offs           = 0
         bytes_remain   = msg_len
+        blk_size       = self.get_blk_size(addr)
         
         # wait to give sender time to before first block sent
         await uasyncio.sleep_ms(1)
@@ -100,11 +258,11 @@ class I2cController:
             
             await uasyncio.sleep_ms(1)
 
-            bytes_send = 16
-            if bytes_remain < 16:
+            bytes_send = blk_size
+            if bytes_remain < blk_size:
                 bytes_send = bytes_remain
                 
-            await self.send_block(addr,buff,offs,bytes_send)
+            self.send_block(addr,buff,offs,bytes_send)
             
             if self.buff_2[0] != _BLK_MSG_CHKSUM_OKAY:
                 bytes_remain = 0
@@ -119,19 +277,21 @@ class I2cController:
         return False
         
         
-    # Send message length and receive ack from Responder.
-    # Will retry send 8 times, leaving final result in self.buff_2[0]
-    async def snd_msg_length(self,addr,length):
+    # Send message length, with mode in its top bits, and receive
+    # ack from Responder. Will retry send 8 times, leaving final result
+    # in self.buff_2[0]. Return the mode, 0 if the Responder refused it.
+    async def snd_msg_length(self,addr,msg_len,mode=0):
         
         # until send of length is okay
         # or give up resending
         self.buff_2[0] = _BLK_MSG_LENGTH_ACK_ERR_RESEND
         retry_cnt = 8
+        length = msg_len | mode << _LEN_MODE_SHIFT
         
         while self.buff_2[0] == _BLK_MSG_LENGTH_ACK_ERR_RESEND:
         
             # send 2 byte length
-            self.buff_2[0:2] = length.to_bytes(2,sys.byteorder)
+            _put_u16(self.buff_2,length)
             self.i2c.writeto(addr,self.buff_2)
             
             # receive echo of length from responder
@@ -140,9 +300,13 @@ class I2cController:
             self.i2c.readfrom_into(addr,self.buff_2)
             i = int.from_bytes(self.buff_2,sys.byteorder)
         
-            # length okay?
+            # length okay? or mode refused, the plain length
             if i == length:
                 self.buff_2[0] = _BLK_MSG_LENGTH_ACK_OK
+            elif mode != 0 and i == msg_len:
+                self.buff_2[0] = _BLK_MSG_LENGTH_ACK_OK
+                self.caps[addr] = 0
+                mode = 0
             else:
                 retry_cnt = retry_cnt - 1
                 if retry_cnt > 0:
@@ -155,6 +319,8 @@ class I2cController:
             # send ack
             self.buff_2[1] = self.buff_2[0]
             self.i2c.writeto(addr,self.buff_2)
+            
+        return mode
         
 
     # Send a given number of bytes from buff
@@ -162,7 +328,8 @@ class I2cController:
     # Responder should respond with a checksum after every block.
     # If checksum wrong, retransmit the block.
     # After 8 retransmits, cancel the send.
-    async def send_block(self,addr,buff,offs,send_cnt):
+    # Nothing to wait for, so not a coroutine.
+    def send_block(self,addr,buff,offs,send_cnt):
         
         # until send of block is okay
         # or give up resending
@@ -170,20 +337,18 @@ class I2cController:
         retry_cnt = 8
         i2c = self.i2c
         
+        # send_cnt is at most the block size
+        _copy(self.frame,buff,offs,send_cnt)
+        block = self.frame_view(send_cnt)
+        cs = self.chksum(self.frame,0,send_cnt)
+        
         while self.buff_2[0] == _BLK_MSG_CHKSUM_ERR_RESENDING:
         
-            # send up to 16 bytes
-            blk_size = 16
-            if send_cnt < 16:
-                blk_size = send_cnt
-                
-            i2c.writeto(addr,buff[offs:offs+blk_size])
+            i2c.writeto(addr,block)
             
             # receive 2 byte checksum from Responder
             i2c.readfrom_into(addr,self.buff_2)
             i = int.from_bytes(self.buff_2,sys.byteorder)
-            
-            cs = calc_icmpv6_chksum.calc_icmpv6_chksum(buff[offs:offs+blk_size]) 
         
             # checksum okay?
             if i == cs:
@@ -202,11 +367,101 @@ class I2cController:
             self.buff_2[1] = self.buff_2[0]
             i2c.writeto(addr,self.buff_2)
             
+    # Stream buff to the Responder in blocks of blk_size bytes,
+    # each [seq] + block + [check], without waiting between them,
+    # then the message CRC, and send again the blocks the Responder
+    # reports as bad. After 8 tries, cancel the send.
+    async def send_stream(self,addr,buff,blk_size):
+        
+        i2c     = self.i2c
+        frame   = self.frame
+        status  = self.status
+        msg_len = len(buff)
+        crc     = crc16(buff)
+        
+        # the first time every block, then the blocks in status[2:]
+        blk_cnt = (msg_len + blk_size - 1) // blk_size
+        resend  = False
+        
+        for retry in range(8):
+            
+            for i in range(blk_cnt):
+                seq = status[2+i] if resend else i
+                offs = seq * blk_size
+                cnt = min(blk_size, msg_len - offs)
+                
+                frame[0] = seq
+                _copy(self.frame_blk,buff,offs,cnt)
+                frame[cnt+1] = crc16(frame,1,cnt+1) & 0xFF
+                i2c.writeto(addr,self.frame_view(cnt+2))
+                await uasyncio.sleep_ms(0)
+                
+            _put_u16(self.buff_2,crc)
+            i2c.writeto(addr,self.buff_2)
+            
+            # receive status, number of bad blocks and their seq
+            i2c.readfrom_into(addr,self.buff_2)
+            blk_cnt = self.buff_2[0]
+            if self.buff_2[1] != blk_cnt ^ 0xFF:
+                break
+            
+            if blk_cnt == 0:
+                return True
+            
+            self.resend_cnt = self.resend_cnt + blk_cnt
+            i2c.readfrom_into(addr,self.status_view(2, blk_cnt))
+            resend = True
+            
+        self.failed_cnt = self.failed_cnt + 1
+        return False
+        
+    # Mode to send a message of msg_len bytes to or from addr,
+    # the top 4 bits of its length, see above
+    def msg_mode(self, addr, msg_len):
+        if msg_len == 0 or msg_len > _LEN_MASK:
+            return 0
+        
+        caps = self.caps.get(addr, 0)
+        blk_size = self.get_blk_size(addr)
+        if (self.stream and caps & _CAP_STREAM
+            and msg_len <= blk_size * _STREAM_MAX_BLKS):
+            return blk_size // _BLK_UNIT
+        
+        if self.crc and caps & _CAP_CRC:
+            return _MODE_CRC
+        
+        return 0
+    
+    # memoryview of the first n bytes of frame, made once for each n
+    def frame_view(self, n):
+        view = self.views[n]
+        if view is None:
+            view = memoryview(self.frame)[0:n]
+            self.views[n] = view
+        return view
+    
+    # memoryview of status[start:start+n], start 0 or 2, made once for each n
+    def status_view(self, start, n):
+        views = self.stat_views[start]
+        view = views[n]
+        if view is None:
+            view = memoryview(self.status)[start:start+n]
+            views[n] = view
+        return view
+    
+    # Checksum of buff[start:end] for a lock-step block
+    def chksum(self, buff, start, end):
+        if self.blk_crc:
+            return crc16(buff,start,end)
+        return calc_icmpv6_chksum.calc_icmpv6_chksum(buff[start:end])
+            
 
     """ ************************************************
         Receive a variable length message
     ************************************************ """ 
-    async def rcv_msg(self, addr):
+    # Return the message as a str, or as bytes if raw is True.
+    # A zero length message means there was nothing to receive.
+    async def rcv_msg(self, addr, raw=False):
         
         # gc.collect()
         
@@ -217,11 +472,24 @@ class I2cController:
         
         self.rcv_cnt = self.rcv_cnt + 1
         
-        blk_len = 16
+        # too long for self.buff? drop it, see drain()
+        if msg_len > len(self.buff):
+            await self.drain(addr,msg_len)
+            return ""
+        
+        mode = self.rcv_mode
+        if mode != 0 and mode != _MODE_CRC:
+            if not await self.rcv_stream(addr,msg_len,mode * _BLK_UNIT):
+                return ""
+            
+            return self.message(msg_len,raw)
+        
+        self.blk_crc = mode == _MODE_CRC
+        blk_len = self.get_blk_size(addr)
         offs    = 0
         rem_cnt = msg_len
         
-        # read block with up to 16 bytes until the message is completely received
+        # read blocks of up to blk_len bytes until the message is completely received
         while (rem_cnt > 0):
 
             cnt  = blk_len
@@ -229,20 +497,41 @@ class I2cController:
             if rem_cnt < blk_len:
                 cnt = rem_cnt
                 
-            buff = await self.rcv_block(addr,cnt)
+            self.rcv_block(addr,offs,cnt)
             
             if self.buff_2[0] == _BLK_MSG_CHKSUM_ERR_CANCEL:
                 self.failed_cnt = self.failed_cnt + 1
                 return ""
             
-            self.buff[offs:offs+cnt] = buff
             offs = offs + cnt
             rem_cnt = rem_cnt - cnt
 
             # Increase to give sender time to send?
             # await uasyncio.sleep_ms(0) # play nice with coroutines
             
-        return self.buff[0:msg_len].decode('utf8')
+        return self.message(msg_len,raw)
+        
+    # Receive a message of msg_len bytes, too long for self.buff,
+    # in lock-step through the frame buffer, and drop it, so the
+    # Responder goes on to its next message.
+    async def drain(self,addr,msg_len):
+        self.blk_crc = False
+        blk_len = self.get_blk_size(addr)
+        for offs in range(0, msg_len, blk_len):
+            self.rcv_frame(addr,min(blk_len, msg_len - offs))
+            if self.buff_2[0] == _BLK_MSG_CHKSUM_ERR_CANCEL:
+                break
+            await uasyncio.sleep_ms(0)
+        
+        self.failed_cnt = self.failed_cnt + 1
+        
+    # The message of msg_len bytes in self.buff,
+    # as bytes if raw is True, else as a str
+    def message(self, msg_len, raw):
+        if raw:
+            return bytes(self.buff_view[0:msg_len])
+        
+        return str(self.buff_view[0:msg_len],'utf8')
 
     # receive a 2 byte length
     async def rcv_msg_length(self,addr):
@@ -257,17 +546,28 @@ class I2cController:
             self.i2c.readfrom_into(addr,self.buff_2)
             msg_len = int.from_bytes(self.buff_2,sys.byteorder)
             
-            # echo message length
+            # echo message length, with its mode,
+            # none if it is too long for self.buff
+            self.rcv_mode = 0
+            if msg_len <= len(self.buff):
+                self.rcv_mode = self.msg_mode(addr,msg_len)
+            if self.rcv_mode != 0:
+                _put_u16(self.buff_2,msg_len | self.rcv_mode << _LEN_MODE_SHIFT)
             self.i2c.writeto(addr,self.buff_2)
             
             # read ack
             self.i2c.readfrom_into(addr,self.buff_2)
             
             if self.buff_2[0] == _BLK_MSG_LENGTH_ACK_OK:
+                self.set_caps(addr, self.buff_2[1])
                 return msg_len
          
             self.resend_cnt = self.resend_cnt + 1
             
+            # mode refused, echo the length as it is
+            if self.rcv_mode != 0:
+                self.caps[addr] = 0
+            
             # wait to give sender time to catch up before trying to read again?
             # await uasyncio.sleep_ms(1)
             
@@ -278,24 +578,46 @@ class I2cController:
         
         return 0
         
-    # Receive a block into buff.
-    # Length of buff must be number of bytes to receive.
+    # Block size for the Responder at addr
+    def get_blk_size(self, addr):
+        return self.blk_size.get(addr, _BLK_UNIT)
+        
+    # Set the block size for the Responder at addr, and if it
+    # streams or takes CRC-16 checksums, from the second byte
+    # of its length ack, see above.
+    def set_caps(self, addr, caps):
+        if caps > _CAP_BLK_UNITS | _CAP_STREAM | _CAP_CRC:
+            caps = 1    # older Responder, 16 byte blocks
+        units = caps & _CAP_BLK_UNITS
+        if units < 1 or units > _BLK_MAX_UNITS:
+            units = 1
+        self.blk_size[addr] = min(units * _BLK_UNIT, self.max_blk)
+        self.caps[addr] = caps & (_CAP_STREAM | _CAP_CRC)
+        
+    # Receive a block of blk_len bytes into self.buff at offs,
+    # through the frame buffer.
     # Send checksum after each block and
     # wait for responder to acknowledge.
     # Final ack is in buff_2.
-    async def rcv_block(self,addr,blk_len):
+    # Nothing to wait for, so not a coroutine.
+    def rcv_block(self,addr,offs,blk_len):
+        self.rcv_frame(addr,blk_len)
+        _put(self.buff,offs,self.frame,blk_len)
+        
+    # Receive a block of blk_len bytes into the frame buffer,
+    # as rcv_block() does.
+    def rcv_frame(self,addr,blk_len):
         
-        buff = bytearray(blk_len)
+        block = self.frame_view(blk_len)
         self.buff_2[0] = _BLK_MSG_CHKSUM_ERR_RESENDING
         
         while self.buff_2[0] == _BLK_MSG_CHKSUM_ERR_RESENDING:
             
-            # receive 16 byte block
-            self.i2c.readfrom_into(addr,buff)
+            # receive the block
+            self.i2c.readfrom_into(addr,block)
         
             # send back checksum
-            cs = calc_icmpv6_chksum.calc_icmpv6_chksum(buff)
-            self.buff_2[0:2] = cs.to_bytes(2,sys.byteorder)
+            _put_u16(self.buff_2,self.chksum(self.frame,0,blk_len))
             self.i2c.writeto(addr,self.buff_2)
             
             # receive ack
@@ -306,7 +628,63 @@ class I2cController:
 
         if self.buff_2[0] == _BLK_MSG_CHKSUM_OKAY:
             self.resend_cnt = self.resend_cnt - 1
+    
+    # Receive a streamed message of msg_len bytes into self.buff,
+    # in blocks of blk_size bytes, each [seq] + block + [check],
+    # then the message CRC, and ask again for the blocks which are bad.
+    # Return True if the message was received.
+    async def rcv_stream(self,addr,msg_len,blk_size):
+        
+        i2c    = self.i2c
+        buff   = self.buff
+        frame  = self.frame
+        status = self.status
+        
+        # the first time every block, then the bad blocks in status[2:]
+        all_cnt = (msg_len + blk_size - 1) // blk_size
+        blk_cnt = all_cnt
+        resend  = False
+        
+        for retry in range(8):
             
-        return buff
+            bad_cnt = 0
+            for i in range(blk_cnt):
+                seq = status[2+i] if resend else i
+                offs = seq * blk_size
+                cnt = min(blk_size, msg_len - offs)
+                
+                i2c.readfrom_into(addr,self.frame_view(cnt+2))
+                _put(buff,offs,self.frame_blk,cnt)
+                if (frame[0] != seq
+                    or frame[cnt+1] != crc16(buff,offs,offs+cnt) & 0xFF):
+                    # bad blocks so far are before i, kept in place
+                    status[2+bad_cnt] = seq
+                    bad_cnt = bad_cnt + 1
+                await uasyncio.sleep_ms(0)
+                    
+            i2c.readfrom_into(addr,self.buff_2)
+            crc = int.from_bytes(self.buff_2,sys.byteorder)
+            if bad_cnt == 0 and crc != crc16(buff,0,msg_len):
+                bad_cnt = all_cnt
+                for i in range(all_cnt):
+                    status[2+i] = i
+            
+            # send status, number of bad blocks and their seq
+            if bad_cnt == 0:
+                self.buff_2[0] = 0
+                self.buff_2[1] = 0xFF
+                i2c.writeto(addr,self.buff_2)
+                return True
+            
+            status[0] = bad_cnt
+            status[1] = bad_cnt ^ 0xFF
+            i2c.writeto(addr,self.status_view(0, 2+bad_cnt))
+            
+            self.resend_cnt = self.resend_cnt + bad_cnt
+            blk_cnt = bad_cnt
+            resend = True
+            
+        self.failed_cnt = self.failed_cnt + 1
+        return False
     
 
@@ -0,0 +1,31 @@
+"""
+    Test that the I2C Controller drops a message longer than its buffer,
+    on the simulated bus, see bench/i2c_sim.py.
+
+    Run on CPython with bench and bench/shim on the path.
+"""
+
+from i2c_controller import I2cController
+from i2c_sim import SimBus, SimI2c
+
+big = bytes(32 + i % 90 for i in range(5000))
+small = big[:100]
+
+for stream in (False, True):
+    for blk_size in (16, 64):
+        bus = SimBus()
+        resp = bus.add_responder(0x41, blk_size=blk_size, stream=stream)
+        ctl = I2cController(i2c=SimI2c(bus))
+        bus.run(ctl.rcv_msg(0x41))
+        guard = bytes(ctl.buff)
+
+        # too long: dropped, and the Responder goes on to the next message
+        resp.q_in.put_nowait(big)
+        resp.q_in.put_nowait(small)
+        assert len(bus.run(ctl.rcv_msg(0x41, True))) == 0
+        assert ctl.failed_cnt == 1
+        assert len(ctl.buff) == 4096 and bytes(ctl.buff) == guard
+        assert bus.run(ctl.rcv_msg(0x41, True)) == small
+        print("stream {} blk {}: ok".format(stream, blk_size))
+
+print("all ok")
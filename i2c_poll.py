@@ -0,0 +1,169 @@
+"""
+    I2C Poll Schedule
+
+    Decides which Responders the I2C Controller service reads from on
+    each pass of its loop, see service_i2c_controller.py. Each read
+    costs a length handshake on the bus even when the Responder has
+    nothing to send.
+
+    A Responder with a data ready line, a GPIO it holds high while it
+    has a message for the Controller (see I2CResponder ready_gpio),
+    is read as soon as the line is high. Otherwise it is only read
+    every slow_ms, in case the line is not connected or the Responder
+    does not drive it.
+
+    A Responder without a line is polled, each at its own interval:
+    - min_ms after it sent a message, or a message was sent to it,
+      when it may have a reply
+    - doubled after each read with nothing to send, up to max_ms
+    Reads with nothing to send, other than in a burst, may use at most
+    budget_ms of each second, on average, and up to budget_ms at once.
+    A Responder is in a burst when a message was sent to it or it sent
+    one, until it has backed off to max_ms. Once the budget is used up,
+    Responders without a line which are not in a burst are not read
+    until enough time has passed to earn it back. So when idle, each
+    is read about every
+    n * read_ms * 1000 / budget_ms, which may be longer than max_ms.
+    budget_ms = 0 for no limit, and min_ms = max_ms to poll at a fixed
+    interval.
+
+        sched = PollSchedule(min_ms=10, max_ms=100, ready_ms=10,
+                             slow_ms=1000, budget_ms=20)
+        sched.add(0x41)
+        sched.add(0x42, Pin(15, Pin.IN, Pin.PULL_DOWN))
+
+        due = []
+        while True:
+            ... send any messages, sched.sent(addr, utime.ticks_ms()) for each ...
+            sched.due(utime.ticks_ms(), due)
+            for addr in due:
+                ... read from addr, taking us ...
+                sched.read(addr, got_msg, us)
+            await uasyncio.sleep_ms(sched.wait_ms(utime.ticks_ms()))
+
+    With any data ready lines, wait_ms() is at most ready_ms, as the
+    lines are polled, which only costs a pin read.
+
+"""
+
+import utime
+
+# values per Responder
+_ADDR = 0
+_PIN  = 1
+_NEXT = 2   # utime.ticks_ms() when it is next due, None for now
+_IVL  = 3   # ms between reads, without a line
+_PEND = 4   # True in a burst, since a message was sent to or from it
+
+class PollSchedule:
+
+    def __init__(self, min_ms=10, max_ms=100, ready_ms=10, slow_ms=1000, budget_ms=20):
+        self.min_ms   = min_ms
+        self.max_ms   = max(min_ms, max_ms)
+        self.ready_ms = ready_ms
+        self.slow_ms  = slow_ms
+        self.resps = []
+        self.by_addr = {}
+        self.pins  = 0
+
+        # us left for reads with nothing to send, budget_us per second
+        self.budget_us = budget_ms * 1000
+        self.left_us = self.budget_us
+        self.now = None    # of the last due()
+
+        self.reads   = 0   # Responders read
+        self.signals = 0   # of those, read because the line was high
+        self.empty   = 0   # of those, with nothing to send
+        self.over    = 0   # passes where the budget was used up
+
+    # Add the Responder at addr, with the Pin of its data ready line,
+    # or None. It is due straight away.
+    def add(self, addr, pin=None):
+        r = [addr, pin, None, self.min_ms, False]
+        self.resps.append(r)
+        self.by_addr[addr] = r
+        if pin is not None:
+            self.pins += 1
+
+    # A message was sent to addr at now, read it soon if it has
+    # no line to say a reply is ready
+    def sent(self, addr, now):
+        r = self.by_addr.get(addr)
+        if r is not None and r[_PIN] is None:
+            r[_IVL] = self.min_ms
+            r[_PEND] = True
+            # not before the Responder can have a reply, and not later than
+            # it was already due
+            if r[_NEXT] is None or not 0 < utime.ticks_diff(r[_NEXT], now) <= self.min_ms:
+                r[_NEXT] = utime.ticks_add(now, self.min_ms)
+
+    # Put the addresses to read now in out, return how many
+    def due(self, now, out):
+        out.clear()
+        if self.now is not None:
+            self.left_us = min(self.budget_us, self.left_us
+                               + utime.ticks_diff(now, self.now) * self.budget_us // 1000)
+        self.now = now
+        over = self.budget_us > 0 and self.left_us <= 0
+        if over:
+            self.over += 1
+
+        for r in self.resps:
+            pin = r[_PIN]
+            if pin is not None and pin.value():
+                self.signals += 1
+            elif r[_NEXT] is not None and utime.ticks_diff(now, r[_NEXT]) < 0:
+                continue
+            elif over and pin is None and not r[_PEND]:
+                # until the budget is earned back
+                continue
+            r[_NEXT] = utime.ticks_add(now, r[_IVL] if pin is None else self.slow_ms)
+            out.append(r[_ADDR])
+
+        self.reads += len(out)
+        return len(out)
+
+    # addr, due on the last due(), was read in us,
+    # got is True if it sent a message
+    def read(self, addr, got, us):
+        r = self.by_addr[addr]
+        if not got:
+            self.empty += 1
+            # reads in a burst are not limited, so do not use the budget
+            if not r[_PEND]:
+                self.left_us = max(self.left_us - us, -self.budget_us)
+        if r[_PIN] is not None:
+            return
+
+        # a burst, until it has backed off
+        if got:
+            r[_IVL] = self.min_ms
+            r[_PEND] = True
+        else:
+            r[_IVL] = min(r[_IVL] * 2, self.max_ms)
+            if r[_IVL] == self.max_ms:
+                r[_PEND] = False
+        r[_NEXT] = utime.ticks_add(self.now, r[_IVL])
+
+    # ms until the next pass
+    def wait_ms(self, now):
+        wait = self.ready_ms if self.pins > 0 else self.max_ms
+
+        # ms until the budget is earned back
+        over = self.budget_us > 0 and self.left_us <= 0
+        earn = 0
+        if over:
+            earn = 1 - self.left_us * 1000 // self.budget_us
+            if self.now is not None:
+                earn -= utime.ticks_diff(now, self.now)
+
+        for r in self.resps:
+            if r[_PIN] is None:
+                if r[_NEXT] is None:
+                    return 0
+                due = utime.ticks_diff(r[_NEXT], now)
+                if over and not r[_PEND]:
+                    # not before the budget is earned back
+                    due = max(due, earn)
+                wait = min(wait, max(0, due))
+        return wait
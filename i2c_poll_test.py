@@ -0,0 +1,50 @@
+"""
+    Test that reads with nothing to send stay within budget_ms of each
+    second, see i2c_poll.py.
+
+    Idle Responders without data ready lines are read, each read taking
+    READ_US, on a simulated clock which follows wait_ms() as
+    service_i2c_controller.py does.
+
+    Run on the Pico, or on CPython with bench/shim on the path for the MicroPython modules.
+"""
+
+from i2c_poll import PollSchedule
+
+READ_US = 1020   # an empty read, length handshake, on a 100kHz bus
+SECS    = 10
+
+def run(n, budget_ms, min_ms=10, max_ms=100):
+    sched = PollSchedule(min_ms=min_ms, max_ms=max_ms, budget_ms=budget_ms)
+    for addr in range(n):
+        sched.add(0x41 + addr)
+
+    now_us = 0
+    empty_us = 0
+    due = []
+    while now_us < SECS * 1_000_000:
+        sched.due(now_us // 1000, due)
+        for addr in due:
+            sched.read(addr, False, READ_US)
+            now_us += READ_US
+            empty_us += READ_US
+        now_us += max(1, sched.wait_ms(now_us // 1000)) * 1000
+
+    return empty_us / 1000 / SECS, sched.reads / SECS
+
+for n in (1, 4, 8):
+    for budget_ms in (10, 20, 50):
+        ms_sec, reads_sec = run(n, budget_ms)
+        print("{} Responders, budget {}ms: {:.1f}ms/sec empty reads, {:.1f} reads/sec".format(
+            n, budget_ms, ms_sec, reads_sec))
+        # budget_ms of each second, plus the budget_ms allowed at once
+        # and the reads of one pass over it, spread over SECS
+        assert ms_sec <= budget_ms + (budget_ms + n * READ_US / 1000) / SECS, ms_sec
+
+# no budget, or one not used up, is every max_ms
+ms_sec, reads_sec = run(4, 0)
+assert 39 <= reads_sec <= 41, reads_sec
+ms_sec, reads_sec = run(1, 50)
+assert 9 <= reads_sec <= 11, reads_sec
+
+print("all ok")
@@ -1,11 +1,13 @@
-from machine import mem32
+from machine import mem32, Pin
 
 import sys
 import uasyncio
 from i2c_responder_base import I2CResponderBase
 
 import calc_icmpv6_chksum
+from crc16 import crc16
 import queue
+from idle_wait import IdleWait
 import utime
 
 import gc
@@ -24,6 +26,28 @@ _BLK_MSG_CHKSUM_OKAY           = const(127 + 4)
 _BLK_MSG_CHKSUM_ERR_RESENDING  = const(127 + 5)
 _BLK_MSG_CHKSUM_ERR_CANCEL     = const(127 + 6)
 
+# Block sizes are multiples of 16 bytes, up to _BLK_MAX_UNITS * 16
+_BLK_UNIT      = const(16)
+_BLK_MAX_UNITS = const(8)
+
+# Streaming and CRC-16 block checksums, see i2c_controller.py
+_CAP_STREAM     = const(0x10)
+_CAP_CRC        = const(0x20)
+_LEN_MASK       = const(0x0FFF)
+_LEN_MODE_SHIFT = const(12)
+_MODE_CRC       = const(15)
+
+_LITTLE = sys.byteorder == "little"
+
+# Put i in buff[0:2] as i.to_bytes(2,sys.byteorder), without allocating
+def _put_u16(buff, i):
+    if _LITTLE:
+        buff[0] = i & 0xFF
+        buff[1] = i >> 8
+    else:
+        buff[0] = i >> 8
+        buff[1] = i & 0xFF
+
 class I2CResponder(I2CResponderBase):
     """
         Implementation of a (polled) Raspberry Pico I2C Responder.
@@ -34,13 +58,18 @@ class I2CResponder(I2CResponderBase):
         This new version I2CResponder implments a protocol which both Controller and Responder must adhere to
         in order to send longer messages.
         
+        Offers CRC-16 block checksums, and with stream=True to stream
+        messages, sending or receiving every block before the checksum,
+        see i2c_controller.py.
+        
         Created: March 30, 2022  By: D. Garrett
         
     """
     VERSION = "3.0.1"
 
     def __init__(self, i2c_device_id=0, sda_gpio=0, scl_gpio=1, responder_address=0x41,
-                 q_in_size=30, q_out_size=30, trace=True):
+                 q_in_size=30, q_out_size=30, trace=True, idle_ms=2, blk_size=16,
+                 stream=False, ready_gpio=None):
         """Initialize.
 
         Args:
@@ -48,21 +77,54 @@ class I2CResponder(I2CResponderBase):
             sda_gpio (int, optional): The gpio number of the pin to use for SDA.
             scl_gpio (int, optional): The gpio number of the pin to use for SCL.
             responder_address (int, required): The I2C address to assign to this Responder.
+            idle_ms (int, optional): ms to sleep while the Controller is not sending or receiving.
+            blk_size (int, optional): Largest block, 16 to 128 bytes, the Controller may use.
+                Sent to the Controller in every length ack, see i2c_controller.py.
+            stream (bool, optional): Offer to stream messages, see i2c_controller.py.
+            ready_gpio (int, optional): The gpio number of a data ready line, held high
+                while q_in has a message for the Controller, see i2c_poll.py.
         """
 
         super().__init__(i2c_device_id=i2c_device_id, sda_gpio=sda_gpio,
                          scl_gpio=scl_gpio, responder_address=responder_address)
         
-        self.buff = bytearray(1024)
+        self.buff = bytearray(4096)
+        self.buff_view = memoryview(self.buff)
         self.buff_2 = bytearray(2)
         self.q_in = queue.Queue(q_in_size)
         self.q_out = queue.Queue(q_out_size)
         
+        # put received messages on q_out as bytes instead of str
+        self.raw = False
+        
+        # block size in units of 16 bytes
+        self.blk_units = min(max(blk_size // _BLK_UNIT, 1), _BLK_MAX_UNITS)
+        if self.blk_units > 1 or stream:
+            self.hold_bus_when_full()
+        
+        # streaming and checksums, second byte of the length ack and
+        # seq of bad blocks, at most 255
+        self.stream = stream
+        self.caps = self.blk_units | _CAP_CRC
+        if stream:
+            self.caps = self.caps | _CAP_STREAM
+        self.bad = bytearray(256)
+        self.blk_crc = False   # lock-step checksums are CRC-16
+        
+        # data ready line to the Controller
+        self.ready = None
+        if ready_gpio is not None:
+            self.ready = Pin(ready_gpio, Pin.OUT, value=0)
+        
         self.send_cnt   = 0
         self.rcv_cnt    = 0
         self.resend_cnt = 0
         self.failed_cnt = 0
         
+        # Controller polls every 100ms or so, no need to check for it
+        # on every pass through the scheduler
+        self.idle = IdleWait("i2c_poll", idle_ms)
+        
         if trace:
             self.trace = self.print_trace
         else:
@@ -89,24 +151,30 @@ class I2CResponder(I2CResponderBase):
     async def poll_snd_rcv(self):
         
         last_poll = utime.ticks_ms()
+        idle = self.idle
         
         while True:
+            useful = False
+            self.set_ready()
             
             # gc.collect() # causes errors in send length (of empty string?)
             
             # check first to see if I2C Controller is polling for input
             if self.read_is_pending():
+                useful = True
                 last_poll = utime.ticks_ms()
                 if self.q_in.empty():
                     await self.send_msg("")
                 else:
                     # print("+",end="")
                     msg = (await self.q_in.get())
+                    self.set_ready()
                     await self.send_msg(msg)
 
                     
             # check to see if I2C Controller is waiting to send us a message
             if self.write_data_is_available():
+                useful = True
                 msg = (await self.rcv_msg())
                 
                 # Make sure we don't wait for a queue put.
@@ -118,17 +186,26 @@ class I2CResponder(I2CResponderBase):
                     # print("-",end="")
                     await self.q_out.put(msg)
 
+            idle.count(useful)
+            
             # Service I2C Controller waits 333ms between polling of Responders.
             # Make sure we have plenty of time to run gc
             # before Controller polls again
             if (not self.read_is_pending()
                 and not self.write_data_is_available()):
+                
+                # Not sure this is doing what I want?
+                # To ensure gc.collect() has plenty of time to run before
+                # Controller polls again.
                 if (utime.ticks_ms() - last_poll) < 50:
                     last_poll = last_poll - 100
                     # self.trace("g")
                     gc.collect()
                 
-            await uasyncio.sleep_ms(0) 
+                # nothing to do until the Controller polls again
+                await idle.sleep()
+            else:
+                await uasyncio.sleep_ms(0) 
                     
                 
     """ ************************************************
@@ -144,6 +221,17 @@ class I2CResponder(I2CResponderBase):
         
         self.rcv_cnt = self.rcv_cnt + 1
         
+        # mode in the top bits of the length
+        mode = self.msg_mode(msg_len, msg_len & _LEN_MASK)
+        if mode != 0:
+            msg_len = msg_len & _LEN_MASK
+        if mode != 0 and mode != _MODE_CRC:
+            if not await self.rcv_stream(msg_len, mode * _BLK_UNIT):
+                return ""
+            
+            return self.message(msg_len)
+        self.blk_crc = mode == _MODE_CRC
+        
         if msg_len > len(self.buff):
             msg_len = len(self.buff)
         
@@ -168,8 +256,8 @@ class I2CResponder(I2CResponderBase):
                     self.trace("r03")
                 
                 # send back checksum
-                cs = calc_icmpv6_chksum.calc_icmpv6_chksum(self.buff[offs:offs+n_bytes])
-                self.buff_2[0:2] = bytearray(cs.to_bytes(2,sys.byteorder))
+                cs = self.chksum(self.buff,offs,offs+n_bytes)
+                _put_u16(self.buff_2,cs)
                 if (await self.snd_bytes(self.buff_2,0,2)) != 2:
                     self.trace("s02")
             
@@ -204,7 +292,15 @@ class I2CResponder(I2CResponderBase):
             bytes_remain = bytes_remain - n_bytes
                
         # return received string 
-        return self.buff[0:msg_len].decode('utf8')
+        return self.message(msg_len)
+        
+    # The message of msg_len bytes in self.buff, decoded once,
+    # as bytes if self.raw is True, else as a str
+    def message(self, msg_len):
+        if self.raw:
+            return bytes(self.buff_view[0:msg_len])
+        
+        return str(self.buff_view[0:msg_len],'utf8')
             
 
     # receive a 2 byte length
@@ -219,8 +315,14 @@ class I2CResponder(I2CResponderBase):
                 self.buff_2[0] = 0x00
                 self.buff_2[1] = 0x00
             
-            i = int.from_bytes(bytes(self.buff_2),sys.byteorder)              
-                
+            i = int.from_bytes(self.buff_2,sys.byteorder)
+            
+            # a mode we do not take? echo the plain length,
+            # see i2c_controller.py
+            if i > _LEN_MASK and i & _LEN_MASK != 0 \
+               and self.msg_mode(i, i & _LEN_MASK) == 0:
+                i = i & _LEN_MASK
+                _put_u16(self.buff_2,i)
             
             # echo length of message
             # first - flush any data Controller has sent us
@@ -262,16 +364,24 @@ class I2CResponder(I2CResponderBase):
         
         # send length of message
         # UTF8 may have multibyte characters
-        buff = bytearray(msg.encode('utf8'))
+        # bytes are sent as is
+        if isinstance(msg, str):
+            buff = msg.encode('utf8')
+        else:
+            buff = msg
         
         if len(buff) > 0:
             self.send_cnt = self.send_cnt + 1 
         
-        await self.snd_msg_length(len(buff))
+        mode = await self.snd_msg_length(len(buff))
         if self.buff_2[0] == _BLK_MSG_LENGTH_ACK_ERR_CANCEL:
             return False
         
-        # send message in 16 byte blocks
+        if mode != 0 and mode != _MODE_CRC:
+            return await self.send_stream(buff,mode * _BLK_UNIT)
+        self.blk_crc = mode == _MODE_CRC
+        
+        # send message in blocks of the size the Controller reads,
         # with checksum after each block
         msg_len        = len(buff)
         offs           = 0
@@ -297,17 +407,19 @@ class I2CResponder(I2CResponderBase):
 
     # Send message length and receive ack from Controller.
     # Will retry send 8 times, leaving final result in self.buff_2[0]
+    # Return the mode of the message, from the Controller's echo.
     async def snd_msg_length(self,length):
         
         # until send of length is okay
         # or give up resending
         self.buff_2[0] = _BLK_MSG_LENGTH_ACK_ERR_RESEND
         retry_cnt = 8
+        mode = 0
         
         while self.buff_2[0] == _BLK_MSG_LENGTH_ACK_ERR_RESEND:
         
             # send 2 byte length
-            self.buff_2[0:2] = length.to_bytes(2,sys.byteorder)
+            _put_u16(self.buff_2,length)
             n = await self.snd_bytes(self.buff_2,0,2)
             if n != 2:
                 # didn't send 2 bytes before Controller requested a receive
@@ -321,9 +433,15 @@ class I2CResponder(I2CResponderBase):
                 self.buff_2[0] = 0x00
                 self.buff_2[1] = 0x00
             
-            i = int.from_bytes(bytes(self.buff_2),sys.byteorder)              
+            i = int.from_bytes(self.buff_2,sys.byteorder)
         
-            # length okay?
+            # length okay? or length with a mode?
+            mode = 0
+            if i != length and i & _LEN_MASK == length:
+                mode = self.msg_mode(i, length)
+                if mode != 0:
+                    i = length
+            
             if i == length:
                 self.buff_2[0] = _BLK_MSG_LENGTH_ACK_OK
             else:
@@ -338,11 +456,33 @@ class I2CResponder(I2CResponderBase):
                         self.failed_cnt = self.failed_cnt + 1
                     self.buff_2[0] = _BLK_MSG_LENGTH_ACK_ERR_CANCEL
             
-            # send ack
+            # send ack, with our block size and streaming if okay
             self.buff_2[1] = self.buff_2[0]
+            if self.buff_2[0] == _BLK_MSG_LENGTH_ACK_OK:
+                self.buff_2[1] = self.caps
             n = await self.snd_bytes(self.buff_2,0,2)
             if n == 0:
                 self.trace("sl13")
+                
+        return mode
+        
+    # Mode of a message of msg_len bytes, from the top bits
+    # of length, see i2c_controller.py, or 0 if not one we offer
+    def msg_mode(self, length, msg_len):
+        mode = length >> _LEN_MODE_SHIFT
+        if msg_len == 0:
+            return 0
+        if mode == _MODE_CRC:
+            return mode
+        if self.stream and mode <= _BLK_MAX_UNITS:
+            return mode
+        return 0
+        
+    # Checksum of buff[start:end] for a lock-step block
+    def chksum(self, buff, start, end):
+        if self.blk_crc:
+            return crc16(buff,start,end)
+        return calc_icmpv6_chksum.calc_icmpv6_chksum(buff[start:end])
 
     # Send a given number of bytes from buff
     # starting at offs.
@@ -357,8 +497,6 @@ class I2CResponder(I2CResponderBase):
         retry_cnt = 8
         n = 0
         
-        buff2 = bytearray(16)
-        
         while self.buff_2[0] == _BLK_MSG_CHKSUM_ERR_RESENDING:
         
             # send as many bytes as the controller will accept
@@ -380,7 +518,7 @@ class I2CResponder(I2CResponderBase):
                 
             i = int.from_bytes(self.buff_2,sys.byteorder)
             
-            cs = calc_icmpv6_chksum.calc_icmpv6_chksum(buff[offs:offs+n]) 
+            cs = self.chksum(buff,offs,offs+n)
         
             # checksum okay?
             if i == cs:
@@ -403,6 +541,134 @@ class I2CResponder(I2CResponderBase):
             
         return n
 
+    # Stream buff to the Controller in blocks of blk_size bytes,
+    # each [seq] + block + [check], then the message CRC,
+    # and send again the blocks the Controller reports as bad.
+    # After 8 tries, cancel the send.
+    async def send_stream(self,buff,blk_size):
+        
+        buff_2  = self.buff_2
+        bad     = self.bad
+        msg_len = len(buff)
+        crc     = crc16(buff)
+        
+        # the first time every block, then the blocks in bad
+        blk_cnt = (msg_len + blk_size - 1) // blk_size
+        resend  = False
+        
+        for retry in range(8):
+            
+            for i in range(blk_cnt):
+                seq = bad[i] if resend else i
+                offs = seq * blk_size
+                cnt = min(blk_size, msg_len - offs)
+                
+                buff_2[0] = seq
+                buff_2[1] = crc16(buff,offs,offs+cnt) & 0xFF
+                await self.snd_bytes(buff_2,0,1)
+                await self.snd_bytes(buff,offs,cnt)
+                await self.snd_bytes(buff_2,1,1)
+                
+            _put_u16(buff_2,crc)
+            if await self.snd_bytes(buff_2,0,2) != 2:
+                self.trace("ss01")
+            
+            # receive status, number of bad blocks and their seq
+            if (await self.rcv_bytes(buff_2,0,2) != 2
+                or buff_2[1] != buff_2[0] ^ 0xFF):
+                self.trace("ss02")
+                break
+            
+            blk_cnt = buff_2[0]
+            if blk_cnt == 0:
+                return True
+            
+            self.resend_cnt = self.resend_cnt + blk_cnt
+            self.trace("ss03")
+            if await self.rcv_bytes(bad,0,blk_cnt) != blk_cnt:
+                self.trace("ss04")
+                break
+            resend = True
+            
+        self.failed_cnt = self.failed_cnt + 1
+        return False
+        
+    # Receive a streamed message of msg_len bytes into self.buff,
+    # in blocks of blk_size bytes, each [seq] + block + [check],
+    # then the message CRC, and ask again for the blocks which are bad.
+    # Return True if the message was received.
+    async def rcv_stream(self,msg_len,blk_size):
+        
+        buff   = self.buff
+        buff_2 = self.buff_2
+        bad    = self.bad
+        
+        # too long for buff? read every block and the message CRC,
+        # then cancel the send with a status which fails its check
+        if msg_len > len(buff):
+            self.trace("rs10")
+            for offs in range(0, msg_len, blk_size):
+                await self.rcv_bytes(buff,0,min(blk_size, msg_len - offs) + 2)
+            await self.rcv_bytes(buff_2,0,2)
+            buff_2[0] = 0xFF
+            buff_2[1] = 0xFF
+            await self.snd_bytes(buff_2,0,2)
+            self.failed_cnt = self.failed_cnt + 1
+            return False
+        
+        # the first time every block, then the blocks in bad
+        all_cnt = (msg_len + blk_size - 1) // blk_size
+        blk_cnt = all_cnt
+        resend  = False
+        
+        for retry in range(8):
+            
+            bad_cnt = 0
+            for i in range(blk_cnt):
+                seq = bad[i] if resend else i
+                offs = seq * blk_size
+                cnt = min(blk_size, msg_len - offs)
+                
+                ok = (await self.rcv_bytes(buff_2,0,1) == 1
+                      and buff_2[0] == seq)
+                if await self.rcv_bytes(buff,offs,cnt) != cnt:
+                    ok = False
+                if (await self.rcv_bytes(buff_2,0,1) != 1
+                    or buff_2[0] != crc16(buff,offs,offs+cnt) & 0xFF):
+                    ok = False
+                
+                if not ok:
+                    # bad blocks so far are before i, kept in place
+                    bad[bad_cnt] = seq
+                    bad_cnt = bad_cnt + 1
+            
+            if await self.rcv_bytes(buff_2,0,2) != 2:
+                self.trace("rs11")
+                buff_2[0] = 0x00
+                buff_2[1] = 0x00
+            crc = int.from_bytes(buff_2,sys.byteorder)
+            if bad_cnt == 0 and crc != crc16(buff,0,msg_len):
+                bad_cnt = all_cnt
+                for i in range(all_cnt):
+                    bad[i] = i
+                    
+            # send status, number of bad blocks and their seq
+            buff_2[0] = bad_cnt
+            buff_2[1] = bad_cnt ^ 0xFF
+            await self.snd_bytes(buff_2,0,2)
+            await self.snd_bytes(bad,0,bad_cnt)
+            
+            if bad_cnt == 0:
+                return True
+            
+            self.resend_cnt = self.resend_cnt + bad_cnt
+            self.trace("rs12")
+            blk_cnt = bad_cnt
+            resend = True
+            
+        self.failed_cnt = self.failed_cnt + 1
+        return False
+
     """ ************************************************
         Common routines used by both send and receive
     ************************************************ """ 
@@ -415,17 +681,23 @@ class I2CResponder(I2CResponderBase):
     # before requested number of bytes was read
     # or a SEND_AVAILABLE request was received.
     #
+    # Waits as await_send_rcv_avail() does, without a coroutine per byte.
+    #
     async def rcv_bytes(self,buff,offs,n_bytes):
-        for i in range(n_bytes):
-            rw = await self.await_send_rcv_avail()
-            if rw != _RECEIVE_AVAILABLE:
-                return i
+        data_cmd = self.data_cmd_addr
+        buff_len = len(buff)
+        i = 0
+        while i < n_bytes:
+            while not self.write_data_is_available():
+                if self.read_is_pending():
+                    return i
+                await uasyncio.sleep_ms(0)
             
             # discard anything beyond end of buffer
-            if offs > len(buff):
-                b = (mem32[self.i2c_base | self.IC_DATA_CMD] & 0xFF)
-            buff[offs] = (mem32[self.i2c_base | self.IC_DATA_CMD] & 0xFF)
-            offs = offs + 1
+            b = mem32[data_cmd] & 0xFF
+            if offs + i < buff_len:
+                buff[offs + i] = b
+            i = i + 1
         
         return n_bytes
                     
@@ -437,16 +709,28 @@ class I2CResponder(I2CResponderBase):
     # before requested number of bytes was sent
     # or a _RECEIVE_AVAILABLE request was received.
     #
+    # Waits as await_send_rcv_avail() does, without a coroutine per byte.
+    #
     async def snd_bytes(self,buff,offs,n_bytes):            
-        for i in range(n_bytes):
-            rw = await self.await_send_rcv_avail()
-            if rw != _SEND_AVAILABLE:
-                return i
-            self.put_read_data(buff[offs])
-            offs = offs + 1
+        i = 0
+        while i < n_bytes:
+            while True:
+                if self.write_data_is_available():
+                    return i
+                if self.read_is_pending():
+                    break
+                await uasyncio.sleep_ms(0)
+            self.put_read_data(buff[offs+i])
+            i = i + 1
             
         return n_bytes
                     
+    # Drive the data ready line, high while q_in has a message
+    # for the Controller
+    def set_ready(self):
+        if self.ready is not None:
+            self.ready.value(0 if self.q_in.empty() else 1)
+        
     # loop until we get a write avail or read requested.
     # Return either _RECEIVE_AVAILABLE, if Controller is ready to send data
     # or _SEND_AVAILABLE if Controller is ready receive data
@@ -63,6 +63,7 @@ class I2CResponderBase:
     IC_CON__CONTROLLER_MODE = 0x01
     IC_CON__IC_10BITADDR_RESPONDER = 0x08
     IC_CON__IC_RESPONDER_DISABLE = 0x40
+    IC_CON__RX_FIFO_FULL_HLD_CTRL = 0x200
     GPIOxCTRL__FUNCSEL = 0x1F
     GPIOxCTRL__FUNCSEL__I2C = 3
     
@@ -93,6 +94,13 @@ class I2CResponderBase:
         self.responder_address = responder_address
         self.i2c_device_id = i2c_device_id
         self.i2c_base = self.I2C0_BASE if i2c_device_id == 0 else self.I2C1_BASE
+        # Addresses of the registers used for every byte. They are too
+        # large for a small int, so would be allocated on every use.
+        self.raw_intr_stat_addr = self.i2c_base | self.IC_RAW_INTR_STAT
+        self.clr_tx_abrt_addr = self.i2c_base | self.REG_ACCESS_METHOD_CLR | self.IC_CLR_TX_ABRT
+        self.clr_rd_req_addr = self.i2c_base | self.IC_CLR_RD_REQ
+        self.data_cmd_addr = self.i2c_base | self.IC_DATA_CMD
+        self.status_addr = self.i2c_base | self.IC_STATUS
         # Disable I2C engine while initializing it
         self.clr_reg(self.IC_ENABLE, self.IC_ENABLE__ENABLE)
         # Clear Responder address bits
@@ -135,6 +143,16 @@ class I2CResponderBase:
         # Enable i2c engine
         self.set_reg(self.IC_ENABLE, self.IC_ENABLE__ENABLE)
 
+    def hold_bus_when_full(self):
+        """Hold SCL low while the Rx FIFO is full, instead of dropping data.
+
+        Lets the Controller write more than the 16 byte Rx FIFO at once.
+        IC_CON may only be changed while the I2C engine is disabled.
+        """
+        self.clr_reg(self.IC_ENABLE, self.IC_ENABLE__ENABLE)
+        self.set_reg(self.IC_CON, self.IC_CON__RX_FIFO_FULL_HLD_CTRL)
+        self.set_reg(self.IC_ENABLE, self.IC_ENABLE__ENABLE)
+
     def read_is_pending(self):
         """Return True if the Controller has issued an I2C READ command.
 
@@ -142,7 +160,7 @@ class I2CResponderBase:
         I2C READ, which means that its I2C engine is currently blocking
         waiting for us to respond with the requested I2C READ data.
         """
-        status = mem32[self.i2c_base | self.IC_RAW_INTR_STAT] & self.IC_RAW_INTR_STAT__RD_REQ
+        status = mem32[self.raw_intr_stat_addr] & self.IC_RAW_INTR_STAT__RD_REQ
         return bool(status)
 
     def put_read_data(self, data):
@@ -155,9 +173,9 @@ class I2CResponderBase:
             data (int): A byte value to send.
         """
         # reset flag
-        self.clr_reg(self.IC_CLR_TX_ABRT, self.IC_CLR_TX_ABRT__CLR_TX_ABRT)
-        status = mem32[self.i2c_base | self.IC_CLR_RD_REQ]
-        mem32[self.i2c_base | self.IC_DATA_CMD] = data & 0xFF
+        mem32[self.clr_tx_abrt_addr] = self.IC_CLR_TX_ABRT__CLR_TX_ABRT
+        status = mem32[self.clr_rd_req_addr]
+        mem32[self.data_cmd_addr] = data & 0xFF
 
     def write_data_is_available(self):
         """Check whether incoming (I2C WRITE) data is available.
@@ -166,7 +184,7 @@ class I2CResponderBase:
             True if data is available, False otherwise.
         """
         # get IC_STATUS
-        status = mem32[self.i2c_base | self.IC_STATUS]
+        status = mem32[self.status_addr]
         # Check RFNE (Receive FIFO not empty)
         if status & self.IC_STATUS__RFNE:
             # There is data in the Zx FIFO
@@ -186,5 +204,5 @@ class I2CResponderBase:
         """
         data = []
         while len(data) < max_size and self.write_data_is_available():
-            data.append(mem32[self.i2c_base | self.IC_DATA_CMD] & 0xFF)         
+            data.append(mem32[self.data_cmd_addr] & 0xFF)         
         return data
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+    Idle Wait
+
+    Lets a loop which checks for work sleep until there is work to do,
+    instead of looping with uasyncio.sleep_ms(0) and keeping the core busy.
+
+    Anything which creates work for the loop calls set(). It can be used
+    directly as a queue callback:
+
+        idle = IdleWait("i2c_svc", max_idle_ms=100)
+        idle.watch_put(q_in)     # work when a message is put on q_in
+        idle.watch_get(q_full)   # work when there is room in q_full
+
+        while True:
+            await idle.wait()
+            ... do any work ...
+            idle.count(did_work)
+
+    wait() returns when set() is called or after max_idle_ms, whichever
+    is first, so work which does not call set() is still found.
+    max_idle_ms = 0 means wait for set() only. Both set a ThreadSafeFlag,
+    the timeout from a one-shot software Timer which each wait() starts
+    again, so waiting does not create a task or timeout. Only one loop
+    may wait on an IdleWait.
+
+    A loop which polls hardware, where nothing can call set(), uses
+    sleep() instead, which always sleeps max_idle_ms.
+
+    loops and useful count the iterations of the loop, and the
+    iterations which did some work. Every IdleWait is kept in a list
+    so the counts can be sent to the log with dump().
+
+"""
+
+import uasyncio
+from machine import Timer
+
+# every IdleWait created, for dump()
+_idle_waits = []
+
+class IdleWait:
+
+    def __init__(self, name, max_idle_ms=0):
+        self.name = name
+        self.max_idle_ms = max_idle_ms
+        self.flag = uasyncio.ThreadSafeFlag()
+        self.timer = None            # made by the first wait() with a timeout
+        self.timeout = self.set      # bound once, the Timer callback
+
+        self.loops  = 0
+        self.useful = 0
+
+        _idle_waits.append(self)
+
+    # There is work to do.
+    # Takes and ignores the hi argument passed by a queue on_put() callback.
+    # Also the Timer callback, which passes the Timer as hi.
+    def set(self, hi=False):
+        self.flag.set()
+
+    def watch_put(self, q):
+        q.on_put(self.set)
+
+    def watch_get(self, q):
+        q.on_get(self.set)
+
+    async def wait(self):
+        timer = self.timer
+        if self.max_idle_ms > 0:
+            if timer is None:
+                timer = self.timer = Timer(-1)
+            timer.init(period=self.max_idle_ms, mode=Timer.ONE_SHOT, callback=self.timeout)
+
+        await self.flag.wait()
+
+        # woken by set()? do not wake the next wait() early
+        if timer is not None:
+            timer.deinit()
+
+    async def sleep(self):
+        await uasyncio.sleep_ms(self.max_idle_ms)
+
+    # Count one iteration of the loop
+    def count(self, useful):
+        self.loops += 1
+        if useful:
+            self.useful += 1
+
+    # percent of loop iterations which did some work
+    def useful_pct(self):
+        if self.loops == 0:
+            return 0
+        return self.useful * 100 // self.loops
+
+# Send the counts for every IdleWait to the log service via svc.log_msg().
+async def dump(svc):
+    for w in _idle_waits:
+        await svc.log_msg("{}: {} loops, {} useful ({}%)".format(
+            w.name, w.loops, w.useful, w.useful_pct()))
@@ -2,7 +2,7 @@
     Service Superclass
     
 """
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, svc_id, CTL_ID
 import queue
 import uasyncio
 import utf8_char
@@ -49,11 +49,13 @@ class Service:
                                        # focus goes to send from service
     CTL_XFER_FOCUS_MSG = "xfer focus"  # transfer focus to send from service, without a push
     CTL_POP_FOCUS_MSG  = "pop focus"   # pop name on top of stack to make it the current focus
+    CTL_DUMP_TRACE_MSG = "dump trace"  # send the message trace ring and loop counts to the log service
     
     def __init__(self, svc_parms):
         self.svc_parms = svc_parms
         
         self.name = svc_parms['name']
+        self.svc_id = svc_id(self.name)
         self.input_queue = queue.Queue(self.get_parm('q_in_size',5))
         self.output_queue = queue.Queue(self.get_parm('q_out_size',5))
         
@@ -62,6 +64,10 @@ class Service:
         
         self.log_svc = self.get_parm("log_svc","log")
         
+        # route table of service id to router.Delivery,
+        # set by the router if direct delivery is enabled
+        self.direct_routes = None
+        
         # print(self.name + ": super().__init__(...)")
         
     def get_input_queue(self):
@@ -70,8 +76,21 @@ class Service:
     def get_output_queue(self):
         return self.output_queue
     
+    # If direct delivery is enabled, messages to local services
+    # skip the output queue and go straight to their input queue.
+    # See router.py.
     async def put_to_output_q(self, xmit):
-        await self.output_queue.put(xmit)
+        routes = self.direct_routes
+        if routes is not None:
+            # "focus" and "controller" must go through the controller
+            to_id = xmit.to_id
+            if CTL_ID < to_id < len(routes):
+                dlv = routes[to_id]
+                if dlv is not None:
+                    await dlv.put_wait(xmit, xmit.is_priority())
+                    return
+            
+        await self.output_queue.put(xmit, xmit.is_priority())
 
 
     # By default, polls input queue waiting for IR input.
@@ -87,9 +106,13 @@ class Service:
             
     ##  send message to another service
     async def send_msg(self, to, msg):
-        xmit = XmitMsg(self.name,to,str(msg))
+        xmit = XmitMsg.alloc(self.name,to,str(msg))
         await self.put_to_output_q(xmit)
         
+    # send message to every subscriber to topic, see router.py
+    async def publish(self, topic, msg):
+        await self.put_to_output_q(XmitMsg.alloc(self.name, topic, msg))
+
     # send message to the log service
     async def log_msg(self, msg):
         await self.send_msg(self.log_svc, msg)
@@ -106,6 +129,10 @@ class Service:
     async def pop_focus(self):
         await self.send_msg(self.CTL_SERVICE_NAME,self.CTL_POP_FOCUS_MSG)
         
+    # ask the controller to send the message trace to the log service
+    async def dump_trace(self):
+        await self.send_msg(self.CTL_SERVICE_NAME,self.CTL_DUMP_TRACE_MSG)
+        
     ##
     ## Common Recieve Messages for Gain and Lose Focus
     ##   returns True if the specific message was received
@@ -152,7 +179,7 @@ class Service:
     # retransmit a message to the controller
     async def rexmit(self, xmit):
         xmit.set_to(self.CTL_SERVICE_NAME)
-        await self.get_output_queue().put(xmit)
+        await self.put_to_output_q(xmit)
                 
     # Loop that does not return until the service has gained focus
     async def await_gain_focus(self):
@@ -191,6 +218,9 @@ class Service:
     # When gain/lose focus, the specified gain/lose focus functions are called.
     # By default this is the self.gain_focus() and self.lose_focus() methods
     # 
+    # IR keys and focus changes are high priority messages (see XmitMsg.is_priority())
+    # so are returned by the input queue ahead of any other queued messages.
+    #
     # Optional accept_keys allows specification of a list of acceptable input keys.
     # If specified, will only return values in that list.
     # Default of accept_keys=None will accept any key 
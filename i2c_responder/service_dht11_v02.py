@@ -4,6 +4,11 @@
     Check DHT11 input every 2 seconds and
     send temperature and humidity to the LCD Service.
     
+    If the "publish" parm is set, also publish every change in
+    temperature or humidity to that topic, whether or not
+    this service has focus. Message is a dictionary:
+        {"temp":71.3, "humidity":45}
+    
 """
 
 from service import Service
@@ -31,6 +36,14 @@ class ModuleService(Service):
         
         self.last_temp = None
         self.last_humid = None
+        
+        self.topic = self.get_parm("publish",None)
+        
+    async def run(self):
+        if self.topic != None:
+            uasyncio.create_task(self.publish_data())
+            
+        await super().run()
 
     async def gain_focus(self):
         await super().gain_focus()
@@ -74,26 +87,45 @@ class ModuleService(Service):
                 
             await uasyncio.sleep_ms(333)            
 
-    # update LCD temp/humidity values
-    async def update_lcd(self):
-        temp = 0
-        humidity = 0
-        update_ok = True
+    # asynchronous task to publish data to self.topic
+    async def publish_data(self):
+        last_temp = None
+        last_humid = None
         
+        while True:
+            reading = self.read_sensor()
+            
+            if reading != None:
+                temp, humidity = reading
+                if last_temp != temp or last_humid != humidity:
+                    await self.publish(self.topic, {"temp":temp, "humidity":humidity})
+                    last_temp = temp
+                    last_humid = humidity
+                    
+            await uasyncio.sleep_ms(2000)
+            
+    # return (temperature, humidity) or None if the DHT11 could not be read
+    def read_sensor(self):
         try: 
             temp = self.sensor.temperature * 1.8 + 32
             humidity = self.sensor.humidity
             # print("update okay")
         except Exception as e:
-            update_ok = False
-            # await self.log_msg(e)
             # print(e)
-            pass
+            return None
+        
+        # adjustments based on comparison to commercial product
+        temp = temp - 1.7
+        humidity = humidity + 10
+        
+        return (temp, humidity)
+        
+    # update LCD temp/humidity values
+    async def update_lcd(self):
+        reading = self.read_sensor()
         
-        if update_ok:
-            # adjustments based on comparison to commercial product
-            temp = temp - 1.7
-            humidity = humidity + 10
+        if reading != None:
+            temp, humidity = reading
             
             # don't send a message unless last temperature or humidity have changed
             if self.last_temp != temp or self.last_humid != humidity:
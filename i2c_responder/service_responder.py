@@ -6,7 +6,7 @@
     Also see svc_i2c_responder.py which deals with sending/receiving I2C messages.
     
     This module:
-    1. Polls all service output queues, passing output messages to the specified input queue.
+    1. Routes service output messages to the specified input queue (see router.py).
        If a service with an input message does not exist, assume it is a remote service
        and pass the message to the I2C service
        
@@ -14,7 +14,7 @@
 """
 
 from service import Service
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, release
 import queue
 import uasyncio
 
@@ -24,65 +24,62 @@ class ModuleService(Service):
     def __init__(self, svc_parms):
         super().__init__(svc_parms)
         self.i2c_svc = self.get_parm("i2c_svc","i2c_svc")
+        self.i2c_dlv = None
+        self.svc_lookup = None
+        self.router = None
+        self.routes = None
+        self.trace = None
         
-    #
-    # Check output queue for each service.
-    # If there is an output queue record, pass it to the appropriate input queue.
-    # svc_dict is a dictionary containing one entry for each service.
+    # Called by controller.py once all services are created.
+    # svc_lookup is a dictionary containing one entry for each service.
     # Key is the service name, as specified in the .json startup file.
     # Value is the service object.
+    # trace is a TraceRing, or None if messages are not traced.
+    def set_router(self, router, trace):
+        self.router = router
+        self.routes = router.routes
+        self.svc_lookup = router.svc_lookup
+        self.trace = trace
+        self.i2c_dlv = self.routes[self.svc_lookup[self.i2c_svc].svc_id]
+        
+        # i2c_svc is the link to the Controller for topic subscriptions
+        self.i2c_dlv.link = self.CTL_SERVICE_NAME
+        
     #
-    # IF the service is not found, assume it is a remote service and placed in the
-    # input queue for the i2c_svc service.
+    # Called by the router for each message in a service output queue.
+    # Pass the message to the input queue for the "to" service.
+    # Never blocks, see router.Delivery.
     #
-    # Any messages sent to "controller" (this service) are also placed in the i2c_svc input queue
-    # and then forwarded to the remote controller.
+    # IF the service is not in the route table, assume it is a remote service
+    # and place it in the input queue for the i2c_svc service.
     #
-    async def poll_output_queues(self, svc_lookup, log_xmit):
-        
-        xmit_passed = False
+    # Any messages sent to "controller" are also placed in the i2c_svc input queue
+    # and then forwarded to the remote controller. There is no local service
+    # named "controller" so it is never in the route table.
+    #
+    def route_xmit(self, xmit):
+        routes = self.routes
+        to_id = xmit.to_id
         
-        i2c_q_in = svc_lookup[self.i2c_svc ].get_input_queue()
+        dlv = None
+        if to_id < len(routes):
+            dlv = routes[to_id]
         
-        # check each service output queue to see if a message was sent
-        # if it was, pass it to the input queue for the "to" service
-        for svc in svc_lookup.values():
-            q_svc_output = svc.get_output_queue()
-            if not q_svc_output.empty():
-                xmit = await q_svc_output.get()
-                # print(xmit.dumps())
-                
-                # pass message to queue for specified service
-                to = xmit.get_to()
-                fr = xmit.get_from()
-                                    
-                # forward message to i2c service to forward to remote Controller
-                if (to == "controller") or not (to in svc_lookup):
-                    await i2c_q_in.put(xmit)
-                    
-                    if log_xmit:
-                        await self.log_msg(xmit.dumps())
-                else:
-                    q_svc_input = svc_lookup[to].get_input_queue()
-
-                    # avoid logging my sending a message to log
-                    if to != self.log_svc:
-                        xmit_passed = True
-                        
-                    await q_svc_input.put(xmit)
-                    
-                    # should we log all messages passed from one service to another?
-                    if log_xmit and xmit.to != self.log_svc:
-                        await self.log_msg(xmit.dumps())
-
-                # allow co-routines to execute
-                # - not needed if we only process max one message per output queue
-                # await uasyncio.sleep_ms(0)
-                
-            # allow co-routines to execute
-            await uasyncio.sleep_ms(0)
+        # forward message to i2c service to forward to remote Controller
+        if dlv is None:
+            dlv = self.i2c_dlv
+            
+        # before a full queue policy may drop and release it
+        if self.trace is not None:
+            self.trace.record(xmit)
+            
+        # never send a message from the Controller back to it,
+        # such as one to a topic with no local subscribers
+        if dlv is self.i2c_dlv and xmit.link is not None:
+            release(xmit)
+            return
             
-        return xmit_passed
+        dlv.put(xmit, xmit.is_priority())
     
     # This run passes any services and menu items that need to be added
     # to the main Controller and Menu services.
@@ -90,7 +87,7 @@ class ModuleService(Service):
     
     # After that run() method does not do anything.
     # Input queue messages sent to the controller are intercepted by the
-    # poll_output_queue() method and passed directly to the i2c_svc.
+    # route_xmit() method and passed directly to the i2c_svc.
     # Does check the input queue every few seconds just in case
 
     async def run(self):
@@ -8,14 +8,26 @@
     Also polls the I2C connection to see if there are any
     messages. Any messages are placed in the output queue.
     
+    Sleeps until there is a message to pass on, for at most
+    the "max_idle_ms" parm. See idle_wait.py.
+    
+    Messages are sent as JSON until the Controller offers the binary
+    format in xmit_codec.py. Resets are sent to the "controller_i2c_svc"
+    parm service (default "i2c_svc") on the Controller.
+    
 """
 
 from service import Service
 import queue
 import uasyncio
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, release
+from xmit_codec import Codec, is_hello, WIRE_BIN, WIRE_RESET
+from idle_wait import IdleWait
 import gc
 
+# most messages taken from an unbounded queue (maxsize 0) at once
+_BATCH = 16
+
 # not needed?
 # from i2c_responder import I2CResponder
 
@@ -38,24 +50,88 @@ class ModuleService(Service):
         i2c_q_in  = i2c_responder.q_in
         i2c_q_out = i2c_responder.q_out
         
+        # receive bytes, so binary messages can be decoded
+        i2c_responder.raw = True
+        self.codec = Codec()
+        self.reset_sent = False
+        
+        # wake when there is a message to pass on,
+        # or room for one in the i2c responder input queue
+        idle = IdleWait(self.name, self.get_parm("max_idle_ms",100))
+        idle.watch_put(q_in)
+        idle.watch_put(i2c_q_out)
+        idle.watch_get(i2c_q_in)
+        
+        # reused for batch gets and puts
+        batch = []
+        msgs  = []
+        out_max = i2c_q_out.maxsize if i2c_q_out.maxsize > 0 else _BATCH
+        
         while True:
+            await idle.wait()
+            useful = False
             
             # pass any input messages to i2c responder
-            # after converting to string
-            while not q_in.empty():
-                xmit = await q_in.get()
-                if not i2c_q_in.full():
-                    await i2c_q_in.put(xmit.dumps())
-                    
+            # after encoding them, see xmit_codec.py.
+            # Leave them in q_in while the i2c responder queue is full.
+            room = _BATCH
+            if i2c_q_in.maxsize > 0:
+                room = i2c_q_in.maxsize - i2c_q_in.qsize()
+            if q_in.get_many_nowait(batch, room) > 0:
+                for xmit in batch:
+                    msgs.append(self.codec.encode(xmit))
+                    release(xmit)
+                i2c_q_in.put_many_nowait(msgs)
+                batch.clear()
+                msgs.clear()
+                useful = True
 
             # pass any messages received by the i2c responder
             # to my output queue, after unwrapping the message
-            while not i2c_q_out.empty():
-                msg = await i2c_q_out.get()
-                if len(msg) > 0:
-                    xmit = XmitMsg(msg=msg)
-                    xmit.unwrapMsg()
-                    await q_out.put(xmit)
+            if i2c_q_out.get_many_nowait(msgs, out_max) > 0:
+                for msg in msgs:
+                    if len(msg) > 0:
+                        xmit = await self.unwrap(msg)
+                        if xmit is not None:
+                            batch.append(xmit)
+                await q_out.put_many(batch)
+                batch.clear()
+                msgs.clear()
+                useful = True
             
-            # gc.collect()
-            await uasyncio.sleep_ms(0)
+            idle.count(useful)
+            
+    # Decode a message received from the controller.
+    # Return None if it was a hello or could not be decoded.
+    async def unwrap(self, msg):
+        i2c_q_in = self.get_i2c().q_in
+        codec = self.codec
+        try:
+            xmit = codec.decode(msg)
+        except (ValueError, IndexError):
+            # binary, but we have restarted since the hello?
+            # ask once for a new hello
+            if not codec.is_binary() and not self.reset_sent:
+                self.reset_sent = True
+                reset = XmitMsg(self.name, self.get_parm("controller_i2c_svc","i2c_svc"),
+                                {"wire":WIRE_RESET})
+                await i2c_q_in.put(codec.encode(reset))
+            return None
+            
+        if not is_hello(xmit):
+            xmit.link = self.CTL_SERVICE_NAME   # never sent back, see router.Fanout
+            return xmit
+            
+        # hello from the controller, reply in JSON then switch to binary
+        offer = xmit.msg["wire"]
+        if WIRE_BIN in offer:
+            names = list(self.get_parm("svc_lookup", {}).keys())
+            reply = XmitMsg(self.name, xmit.get_from(), {"wire":WIRE_BIN, "names":names})
+            codec.set_names(None)
+            await i2c_q_in.put(codec.encode(reply))
+            codec.set_names(xmit.msg["names"] + names)
+            self.reset_sent = False
+            
+        release(xmit)
+        return None
+
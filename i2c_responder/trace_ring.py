@@ -0,0 +1,144 @@
+"""
+    Message Trace Ring
+
+    Records messages passed by the router in a fixed size ring,
+    replacing the old "log_xmit" logging which sent a second log message
+    with xmit.dumps() for every routed message.
+
+    Storage is a preallocated array. Recording a message does not allocate:
+    each entry is four unsigned ints
+    - timestamp, utime.ticks_us()
+    - from service id
+    - to service id
+    - payload length, len() of the message for str, list, dict etc. else 0,
+      or the number of bytes of a payload which has not been decoded
+
+    Only the most recent "size" messages are kept.
+
+    Parms, in the top level of the JSON file:
+        "log_xmit"     : true   - create the trace ring
+        "trace_size"   : 64     - number of entries in the ring
+        "trace_sample" : 1      - record every n'th message
+        "trace_svc"    : [...]  - only record messages to or from these services
+
+    Any service can ask the controller to dump the ring to the log service
+    with Service.dump_trace().
+
+"""
+
+from array import array
+import utime
+from xmit_message import svc_name
+
+# payload types which have a length
+_SIZED = (str, list, dict, bytes, bytearray)
+
+# values per entry
+_TS     = 0
+_FR     = 1
+_TO     = 2
+_LEN    = 3
+_ENTRY  = 4
+
+# services with an id >= _MAX_FILTER_ID are never matched by a filter
+_MAX_FILTER_ID = 256
+
+class TraceRing:
+
+    def __init__(self, size=64, sample=1):
+        self.size   = size
+        self.sample = sample
+
+        self.buff   = array('I', [0] * (size * _ENTRY))
+        self.head   = 0   # next entry to write
+        self.cnt    = 0   # number of entries recorded
+        self.seen   = 0   # number of messages passed to record()
+
+        self.skip   = sample
+        self.filter = None
+        self.paused = False   # while dump() sends the entries
+
+    # Only record messages to or from one of the service ids.
+    # Pass None to record all messages.
+    def set_filter(self, ids):
+        if ids is None:
+            self.filter = None
+            return
+
+        self.filter = bytearray(_MAX_FILTER_ID)
+        for i in ids:
+            if i < _MAX_FILTER_ID:
+                self.filter[i] = 1
+
+    def record(self, xmit):
+        self.seen += 1
+        if self.paused:
+            return
+
+        if self.sample > 1:
+            self.skip -= 1
+            if self.skip > 0:
+                return
+            self.skip = self.sample
+
+        fr_id = xmit.fr_id
+        to_id = xmit.to_id
+
+        flt = self.filter
+        if flt is not None:
+            if not ((fr_id < _MAX_FILTER_ID and flt[fr_id])
+                 or (to_id < _MAX_FILTER_ID and flt[to_id])):
+                return
+
+        msg = xmit.raw   # payload bytes, if not decoded
+        if msg is None:
+            msg = xmit.msg
+        n = 0
+        if isinstance(msg, _SIZED):
+            n = len(msg)
+
+        b = self.buff
+        i = self.head * _ENTRY
+        b[i + _TS]  = utime.ticks_us() & 0xFFFFFFFF   # fits "I" on CPython too
+        b[i + _FR]  = fr_id
+        b[i + _TO]  = to_id
+        b[i + _LEN] = n
+
+        self.head += 1
+        if self.head >= self.size:
+            self.head = 0
+
+        self.cnt += 1
+
+    # Send the entries, oldest first, to the log service via svc.log_msg().
+    # Timestamps are in microseconds relative to the oldest entry.
+    # Recording is paused until all are sent, so the log messages neither
+    # overwrite the entries still to be sent nor are recorded themselves.
+    async def dump(self, svc):
+        n = self.cnt
+        if n > self.size:
+            n = self.size
+
+        b = self.buff
+        idx = self.head - n
+        if idx < 0:
+            idx += self.size
+
+        ts0 = b[idx * _ENTRY + _TS]
+
+        self.paused = True
+        try:
+            await svc.log_msg("trace: {} of {} msgs, {} recorded".format(
+                n, self.seen, self.cnt))
+
+            for _ in range(n):
+                i = idx * _ENTRY
+                await svc.log_msg("{:>10} {} > {} {}".format(
+                    utime.ticks_diff(b[i + _TS], ts0),
+                    svc_name(b[i + _FR]), svc_name(b[i + _TO]), b[i + _LEN]))
+
+                idx += 1
+                if idx >= self.size:
+                    idx = 0
+        finally:
+            self.paused = False
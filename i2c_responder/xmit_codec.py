@@ -0,0 +1,343 @@
+"""
+    Wire Format for Messages sent over I2C
+
+    Two formats are used:
+
+    - JSON, the original format, xmit.dumps():
+          ["fr", "to", "<class 'XmitLcd'>", msg]
+
+    - Binary, about a quarter of the size for a typical LCD update:
+          byte     message type, TYPE_MSG, TYPE_LCD or TYPE_CTL
+          name     from service
+          name     to service
+          byte     payload kind, then the payload:
+                     PAY_STR   varint length, UTF-8 string
+                     PAY_JSON  varint length, UTF-8 JSON of any other msg
+                     PAY_LCD   varint count, then XmitLcd commands:
+                                 OP_CLEAR
+                                 OP_CURSOR x y      one byte each
+                                 OP_MSG             varint length, UTF-8 string
+                                 OP_HG n            hourglass for n seconds
+                                 OP_CMD i           LCD_CMDS[i]
+                               other commands, such as blink_backlight,
+                               make the whole payload PAY_JSON
+      A name is a varint: n > 0 is names[n-1], from the names agreed when
+      the format was negotiated. 0 means the name follows as a varint
+      length and UTF-8 string. Varints are 7 bits per byte, low bits first,
+      top bit set on all but the last byte.
+
+    decode() only decodes the type and names of a binary message. The
+    payload kind and payload bytes are kept in xmit.raw, and decoded by
+    decode_payload() when a service calls xmit.get_msg(). encode() copies
+    xmit.raw as it is, so a message received on one link and sent on
+    another, binary, link is never decoded and encoded again.
+
+    A JSON message always starts with "[" and a binary message never does,
+    so decode() reads either format. Senders use JSON until binary has been
+    negotiated. See service_i2c_controller.py and svc_i2c_responder.py:
+
+    1. The Controller sends each Responder i2c_svc, in JSON
+           {"wire": [WIRE_BIN], "names": [...Controller service names]}
+    2. The Responder replies, in JSON
+           {"wire": WIRE_BIN, "names": [...Responder service names]}
+       and from then on sends binary, with the Controller names followed
+       by the Responder names as the names table.
+    3. The Controller sends that Responder binary after it has the reply.
+
+    A Responder which gets a binary message it can not decode, because it
+    has restarted since the hello, replies {"wire": WIRE_RESET} and the
+    Controller goes back to JSON and sends a new hello.
+    A Responder which does not know about binary ignores the hello, so the
+    Controller keeps sending it JSON.
+
+"""
+
+import ujson
+from xmit_message import XmitMsg, XmitCtl, svc_name, set_payload_decoder
+from xmit_lcd import XmitLcd, CMD_CLEAR_SCREEN, CMD_DSP_HG, CMD_BLK_HG, \
+     CMD_CURSOR_ON, CMD_CURSOR_OFF, CMD_BLINK_CURSOR_ON, CMD_BLINK_CURSOR_OFF, \
+     CMD_BACKLIGHT_ON, CMD_BACKLIGHT_OFF, CMD_DISPLAY_ON, CMD_DISPLAY_OFF
+
+WIRE_JSON  = "json"
+WIRE_BIN   = "bin1"
+WIRE_RESET = "reset"
+
+TYPE_MSG = 1
+TYPE_LCD = 2
+TYPE_CTL = 3
+
+PAY_STR  = 0
+PAY_JSON = 1
+PAY_LCD  = 2
+
+OP_CLEAR  = 0
+OP_CURSOR = 1
+OP_MSG    = 2
+OP_HG     = 3
+OP_CMD    = 4
+
+# LCD commands without a value, sent as OP_CMD and an index
+LCD_CMDS = (CMD_BLK_HG, CMD_CURSOR_ON, CMD_CURSOR_OFF,
+            CMD_BLINK_CURSOR_ON, CMD_BLINK_CURSOR_OFF,
+            CMD_BACKLIGHT_ON, CMD_BACKLIGHT_OFF,
+            CMD_DISPLAY_ON, CMD_DISPLAY_OFF)
+
+_JSON_START = ord("[")
+
+# str(type(xmit)) written by XmitMsg.dumps(), to message class
+_JSON_TYPES = {str(XmitLcd):XmitLcd, str(XmitCtl):XmitCtl}
+
+_TYPES = {XmitMsg:TYPE_MSG, XmitLcd:TYPE_LCD, XmitCtl:TYPE_CTL}
+_CLASSES = (None, XmitMsg, XmitLcd, XmitCtl)
+
+# Is xmit a hello, reply or reset, see above.
+# These are always JSON, so never have a raw payload.
+def is_hello(xmit):
+    msg = xmit.msg
+    return xmit.raw is None and isinstance(msg, dict) and "wire" in msg
+
+# Return the msg for a raw payload kept by Codec.decode().
+# Called by XmitMsg.get_msg(), see set_payload_decoder() below.
+def decode_payload(raw):
+    return _payloads.get_payload(raw, 0)
+
+def _put_varint(buf, n):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def _put_str(buf, s):
+    b = s.encode("utf8")
+    _put_varint(buf, len(b))
+    buf.extend(b)
+
+# return the LCD commands in lst as bytes, or None if one has no opcode
+def _lcd_ops(lst):
+    ops = bytearray()
+    _put_varint(ops, len(lst))
+    for cmd in lst:
+        if isinstance(cmd, str):
+            if cmd == CMD_CLEAR_SCREEN:
+                ops.append(OP_CLEAR)
+            elif cmd in LCD_CMDS:
+                ops.append(OP_CMD)
+                ops.append(LCD_CMDS.index(cmd))
+            else:
+                return None
+
+        elif isinstance(cmd, dict) and len(cmd) == 1:
+            if "msg" in cmd and isinstance(cmd["msg"], str):
+                ops.append(OP_MSG)
+                _put_str(ops, cmd["msg"])
+            elif "cursor" in cmd:
+                x, y = cmd["cursor"]
+                if not (0 <= x < 256 and 0 <= y < 256):
+                    return None
+                ops.append(OP_CURSOR)
+                ops.append(x)
+                ops.append(y)
+            elif CMD_DSP_HG in cmd and isinstance(cmd[CMD_DSP_HG], int) \
+                 and 0 <= cmd[CMD_DSP_HG] < 256:
+                ops.append(OP_HG)
+                ops.append(cmd[CMD_DSP_HG])
+            else:
+                return None
+        else:
+            return None
+
+    return ops
+
+class Codec:
+
+    """
+        Encodes and decodes messages for one I2C link.
+
+        names is the names table agreed for the link,
+        or None to send JSON.
+    """
+
+    def __init__(self, names=None):
+        self.set_names(names)
+
+    def set_names(self, names):
+        self.names = names
+        self.ids = None
+        if names is not None:
+            self.ids = {}
+            for i in range(len(names)):
+                self.ids[names[i]] = i + 1
+
+    def is_binary(self):
+        return self.names is not None
+
+    # Return the message as bytes (binary) or str (JSON)
+    def encode(self, xmit):
+        if self.names is None:
+            return xmit.dumps()
+
+        buf = bytearray()
+        buf.append(_TYPES.get(type(xmit), TYPE_MSG))
+        self.put_name(buf, svc_name(xmit.fr_id))
+        self.put_name(buf, svc_name(xmit.to_id))
+
+        # received in binary and not decoded? send the payload as received
+        raw = xmit.raw
+        if raw is not None:
+            buf.extend(raw)
+            return buf
+
+        msg = xmit.msg
+        ops = None
+        if isinstance(msg, list):
+            ops = _lcd_ops(msg)
+
+        if isinstance(msg, str):
+            buf.append(PAY_STR)
+            _put_str(buf, msg)
+        elif ops is not None:
+            buf.append(PAY_LCD)
+            buf.extend(ops)
+        else:
+            buf.append(PAY_JSON)
+            _put_str(buf, ujson.dumps(msg))
+
+        return buf
+
+    def put_name(self, buf, name):
+        i = self.ids.get(name)
+        if i is None:
+            buf.append(0)
+            _put_str(buf, name)
+        else:
+            _put_varint(buf, i)
+
+    # Return a message from buf, JSON or binary, str or bytes.
+    # Raises ValueError if buf is binary and there is no names table.
+    def decode(self, buf):
+        if isinstance(buf, str) or buf[0] == _JSON_START:
+            xmit_data = ujson.loads(buf)
+            cls = _JSON_TYPES.get(xmit_data[2], XmitMsg)
+            return cls.alloc(xmit_data[0], xmit_data[1], xmit_data[3])
+
+        if self.names is None:
+            raise ValueError("no wire names")
+
+        self.buf = buf
+        self.pos = 1
+        cls = None
+        if buf[0] < len(_CLASSES):
+            cls = _CLASSES[buf[0]]
+        if cls is None:
+            raise ValueError("bad msg type")
+        fr = self.get_name()
+        to = self.get_name()
+
+        # payload is decoded later, see XmitMsg.get_msg(),
+        # but a truncated or corrupt one is rejected now
+        pos = self.pos
+        self.check_payload()
+        xmit = cls.alloc(fr, to, None)
+        xmit.raw = bytes(buf[pos:])
+
+        self.buf = None
+        return xmit
+
+    # Raise ValueError if the payload at self.pos, a payload kind and the
+    # payload, is not the rest of self.buf, or has a bad kind or command.
+    # Only skips the strings, see get_payload() to decode it.
+    def check_payload(self):
+        buf = self.buf
+        kind = buf[self.pos]
+        self.pos += 1
+        if kind == PAY_LCD:
+            for _ in range(self.get_varint()):
+                op = buf[self.pos]
+                self.pos += 1
+                if op == OP_MSG:
+                    n = self.get_varint()
+                    self.pos += n
+                elif op == OP_CURSOR:
+                    self.pos += 2
+                elif op == OP_HG:
+                    self.pos += 1
+                elif op == OP_CMD:
+                    if buf[self.pos] >= len(LCD_CMDS):
+                        raise ValueError("bad lcd command")
+                    self.pos += 1
+                elif op != OP_CLEAR:
+                    raise ValueError("bad lcd op")
+        elif kind > PAY_LCD:
+            raise ValueError("bad payload kind")
+        else:
+            n = self.get_varint()
+            self.pos += n
+
+        if self.pos != len(buf):
+            raise ValueError("bad payload length")
+
+    # Return the payload at buf[pos], a payload kind and the payload
+    def get_payload(self, buf, pos):
+        self.buf = buf
+        self.pos = pos + 1
+        kind = buf[pos]
+        if kind == PAY_STR:
+            msg = self.get_str()
+        elif kind == PAY_JSON:
+            msg = ujson.loads(self.get_str())
+        else:
+            msg = self.get_lcd_ops()
+
+        self.buf = None
+        return msg
+
+    def get_varint(self):
+        buf = self.buf
+        n = 0
+        shift = 0
+        while True:
+            b = buf[self.pos]
+            self.pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def get_str(self):
+        n = self.get_varint()
+        pos = self.pos
+        self.pos = pos + n
+        return str(self.buf[pos:pos+n], "utf8")
+
+    def get_name(self):
+        i = self.get_varint()
+        if i == 0:
+            return self.get_str()
+        if i > len(self.names):
+            raise ValueError("bad wire name")
+        return self.names[i-1]
+
+    def get_lcd_ops(self):
+        buf = self.buf
+        ops = []
+        for _ in range(self.get_varint()):
+            op = buf[self.pos]
+            self.pos += 1
+            if op == OP_CLEAR:
+                ops.append(CMD_CLEAR_SCREEN)
+            elif op == OP_CURSOR:
+                ops.append({"cursor":[buf[self.pos], buf[self.pos+1]]})
+                self.pos += 2
+            elif op == OP_MSG:
+                ops.append({"msg":self.get_str()})
+            elif op == OP_HG:
+                ops.append({CMD_DSP_HG:buf[self.pos]})
+                self.pos += 1
+            else:
+                ops.append(LCD_CMDS[buf[self.pos]])
+                self.pos += 1
+        return ops
+
+# for decode_payload(), payloads do not use the names table
+_payloads = Codec()
+set_payload_decoder(decode_payload)
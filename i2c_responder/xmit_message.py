@@ -5,60 +5,223 @@
     Supports definition of to, from and message.
     For simple messages all three values can be specified when the object is created.
     Subclasses implement more complex messages. See xmit_lcd.py for an example.
+    
+    To and from service names are stored as small integer ids. See svc_id().
+    
+    Message Pool
+    
+    Messages can be taken from a free list with XmitMsg.alloc() instead of
+    creating a new object, and given back with release() by the service
+    which uses up the message, such as the log or the I2C service.
+    The pool is off unless controller.py sets its size from the JSON
+    "xmit_pool" parm. With the pool off alloc() creates a new object and
+    release() does nothing.
+    
+    A message must not be used after it is released. Messages to a topic
+    are passed to every subscriber (see router.py), so are never released.
+    
+    Raw Payloads
+    
+    A message received over I2C in the binary wire format keeps its payload
+    as the bytes received, in raw, with msg None. get_msg() decodes it the
+    first time it is called, so a message which is only forwarded to
+    another node is never decoded, and the I2C service sends the same
+    payload bytes on. See xmit_codec.py. Code which reads msg directly,
+    rather than through get_msg(), must call decode_raw() first. A payload
+    which can not be decoded is replaced by empty_msg(), "" or, for an
+    XmitLcd, [].
 """
 
 import ujson
 
+# Service names are interned as small integer ids, in the order first seen.
+# controller.py interns the local service names at startup so they have
+# the lowest ids and the router can use them to index its route table.
+# Names are only needed for logging and for sending messages over I2C.
+FOCUS_ID = 0
+CTL_ID   = 1
+
+_svc_names = ["focus", "controller"]
+_svc_ids   = {"focus":FOCUS_ID, "controller":CTL_ID}
+
+# return the id for a service name, assigning a new id if needed
+def svc_id(name):
+    i = _svc_ids.get(name)
+    if i is None:
+        i = len(_svc_names)
+        _svc_names.append(name)
+        _svc_ids[name] = i
+        
+    return i
+
+# return the service name for an id
+def svc_name(i):
+    return _svc_names[i]
+
+# Messages from these service ids are high priority, see XmitMsg.is_priority().
+# Set by controller.py from the JSON "priority_svc" parm.
+_pri_ids = set()
+
+def set_priority_svc(names):
+    _pri_ids.clear()
+    for name in names:
+        _pri_ids.add(svc_id(name))
+
+# Decodes a raw payload, see "Raw Payloads" above.
+# Set by xmit_codec.py, which makes the messages with raw payloads.
+_decode_payload = None
+
+def set_payload_decoder(func):
+    global _decode_payload
+    _decode_payload = func
+
+# Free lists, see "Message Pool" above.
+_pool_max = 0
+_pools = {}           # class to list of free messages of that class
+_shared_ids = set()   # topic ids, set by the router
+
+# counts of messages from alloc() which were new or taken from a pool
+_new_cnt = 0
+_reuse_cnt = 0
+
+# Keep up to n free messages of each class. 0 turns the pool off.
+def set_pool_size(n):
+    global _pool_max
+    _pool_max = n
+    if n == 0:
+        _pools.clear()
+
+# Messages to id are passed to more than one service, never release them.
+def set_shared(i):
+    _shared_ids.add(i)
+
+def _alloc(cls, fr, to, msg):
+    global _new_cnt, _reuse_cnt
+    pool = _pools.get(cls)
+    if pool:
+        _reuse_cnt += 1
+        xmit = pool.pop()
+        xmit.__init__(fr, to, msg)
+        return xmit
+    _new_cnt += 1
+    return cls(fr, to, msg)
+
+# Give a message which is no longer needed back to the pool.
+def release(xmit):
+    if _pool_max == 0 or (xmit.msg is None and xmit.raw is None) \
+       or xmit.to_id in _shared_ids:
+        return
+    cls = type(xmit)
+    pool = _pools.get(cls)
+    if pool is None:
+        pool = []
+        _pools[cls] = pool
+    if len(pool) < _pool_max:
+        xmit.msg = None   # marks a free message, and drops the payload
+        xmit.raw = None
+        pool.append(xmit)
+
+# Return (new, reused, free): messages created by alloc(),
+# taken from a pool by alloc(), and now in the pools.
+def pool_stats():
+    free = 0
+    for pool in _pools.values():
+        free += len(pool)
+    return (_new_cnt, _reuse_cnt, free)
+
 class XmitMsg:
     
+    # MicroPython ignores __slots__, on CPython it saves the instance dict.
+    # Subclasses must declare __slots__ too, even if empty.
+    __slots__ = ("to_id", "fr_id", "msg", "raw", "link")
+    
+    # message types which are always high priority override this
+    PRIORITY = False
+    
     def __init__(self,fr="",to="",msg=""):
-        self.to = to
-        self.fr = fr
+        # svc_id() inlined, new messages are created for every send
+        to_id = _svc_ids.get(to)
+        self.to_id = to_id if to_id is not None else svc_id(to)
+        fr_id = _svc_ids.get(fr)
+        self.fr_id = fr_id if fr_id is not None else svc_id(fr)
         self.msg = msg
+        self.raw = None   # undecoded payload, see "Raw Payloads" above
+        self.link = None  # I2C link it was received on, see router.Fanout
+        
+    # Same as XmitMsg(fr,to,msg) but reuses a released message if there is one.
+    @classmethod
+    def alloc(cls,fr="",to="",msg=""):
+        return _alloc(cls, fr, to, msg)
         
     def set_to(self,service_to):
-        self.to = service_to
+        self.to_id = svc_id(service_to)
         return self
         
     def set_from(self,service_from):
-        self.fr = service_from
+        self.fr_id = svc_id(service_from)
         return self
         
     def set_msg(self,message):
         self.msg = message
+        self.raw = None
         return self
     
     def get_from(self):
-        return self.fr
+        return _svc_names[self.fr_id]
     
     def get_to(self):
-        return self.to
+        return _svc_names[self.to_id]
     
     def get_msg(self):
+        if self.raw is not None:
+            self.decode_raw()
         return self.msg
     
+    # decode a raw payload into msg, or the empty payload if it is corrupt
+    def decode_raw(self):
+        if self.raw is not None:
+            try:
+                self.msg = _decode_payload(self.raw)
+            except (ValueError, IndexError):
+                self.msg = self.empty_msg()
+            self.raw = None
+
+    # msg of a message with no payload
+    def empty_msg(self):
+        return ""
+    
+    # High priority messages are passed ahead of other messages
+    # by the router and service input queues. These are:
+    # - message types with PRIORITY = True, such as XmitCtl
+    # - messages from a priority service, such as the IR remote
+    # - messages to the controller, such as focus changes
+    def is_priority(self):
+        return (self.PRIORITY
+                or self.to_id == CTL_ID
+                or self.fr_id in _pri_ids)
+    
     # dumps will generate a string version of this object
     def dumps(self):
-        message = [self.fr, self.to, str(type(self)), self.msg]
+        message = [self.get_from(), self.get_to(), str(type(self)), self.get_msg()]
         # message = [self.fr, self.to, self.msg]
         return ujson.dumps(message)
     
     # wrap a message in a new to/from xmit
     def wrapXmit(self, fr=None,to=None):
         if fr == None:
-            fr = self.fr
+            fr = self.get_from()
             
         if to == None:
-            to = self.to
+            to = self.get_to()
             
         new_msg = self.dumps()
-        return XmitMsg(fr=fr,to=to,msg=new_msg)
+        return XmitMsg.alloc(fr,to,new_msg)
     
     # unwrap a previous wrapped message
     def unwrapMsg(self):
-        xmit_data = ujson.loads(self.msg)
-        self.fr = xmit_data[0]
-        self.to = xmit_data[1]
+        xmit_data = ujson.loads(self.get_msg())
+        self.fr_id = svc_id(xmit_data[0])
+        self.to_id = svc_id(xmit_data[1])
         # for now, ignore xmit type
         # they should just be to help build an xmit
         
@@ -76,4 +239,34 @@ class XmitMsg:
         # print("type xmit_data[2]" + str(type(xmit_data[2])))
             
         return self
-    
\ No newline at end of file
+
+
+"""
+    Envelope for a message forwarded to another node over I2C.
+    
+    msg is the forwarded XmitMsg itself, and addr the I2C address of the
+    node. It is only serialized once, by the I2C service, just before it
+    is sent. See svc_i2c_stub.fwd_i2c_msg() and xmit_codec.py.
+"""
+class XmitFwd(XmitMsg):
+    
+    __slots__ = ("addr",)
+    
+    def __init__(self,fr="",to="i2c_svc",msg="",addr=None):
+        super().__init__(fr,to,msg)
+        self.addr = addr
+        
+    def dumps(self):
+        return ujson.dumps([self.get_from(), self.get_to(), str(type(self)),
+                            [self.addr, self.msg.dumps()]])
+
+
+"""
+    Control message sent by the controller, such as gain or lose focus.
+    Always high priority.
+"""
+class XmitCtl(XmitMsg):
+    
+    __slots__ = ()
+    
+    PRIORITY = True
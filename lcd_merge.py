@@ -0,0 +1,225 @@
+"""
+    LCD Merge
+
+    Merges the command lists of several XmitLcd messages into one,
+    dropping text which a later command overwrites, so the LCD service
+    renders a backlog of messages once instead of once per message.
+
+        merge = LcdMerge(col_cnt, row_cnt)
+        for xmit in batch:
+            merge.add(xmit.get_msg())
+        cmds = merge.commands()
+
+    Text is written to a copy of the screen, one character per cell,
+    rather than passed on. commands() then writes each run of changed
+    cells with one cursor and one msg command, and moves the cursor to
+    where the original commands left it. A 'clear' drops all the text
+    and commands before it, as clearing the screen also resets the
+    backlight, the cursor and blinking, except for hourglass commands
+    which start a task.
+
+    Any other command, such as backlight_off or blink_backlight, is passed
+    on in order: text before it is written out first. Text written to
+    a row which is not on the screen is also passed on as it is.
+
+    The cursor position is kept from one commands() to the next, as a
+    message may write text without moving the cursor first. A single
+    message is quicker to display as it is; passed() then keeps the
+    cursor position up to date. The hourglass commands leave the
+    cursor after the bottom right cell, where they draw.
+
+"""
+
+import xmit_lcd
+
+class LcdMerge:
+
+    def __init__(self, col_cnt, row_cnt):
+        self.col_cnt = col_cnt
+        self.row_cnt = row_cnt
+        self.cells = [[None] * col_cnt for _ in range(row_cnt)]
+        self.dirty = 0   # bit y set if row y has text
+        self.out = []
+
+        # cursor after the commands added so far
+        self.x = 0
+        self.y = 0
+
+        # cursor after the commands in out, None if not known
+        self.out_xy = None
+
+        self.msgs = 0      # messages added
+        self.merges = 0    # calls to commands()
+
+    # Add the commands of one XmitLcd message, a list or a single command
+    def add(self, cmds):
+        self.msgs += 1
+        if not isinstance(cmds, list):
+            cmds = [cmds]
+
+        for cmd in cmds:
+            if isinstance(cmd, dict) and len(cmd) == 1:
+                if "msg" in cmd and isinstance(cmd["msg"], str):
+                    self.put_text(cmd["msg"])
+                    continue
+
+                xy = cmd.get("cursor")
+                if isinstance(xy, list) and len(xy) == 2 \
+                   and isinstance(xy[0], int) and isinstance(xy[1], int):
+                    self.x = xy[0]
+                    self.y = xy[1]
+                    continue
+
+            if cmd == xmit_lcd.CMD_CLEAR_SCREEN:
+                self.clear()
+            else:
+                self.pass_on(cmd)
+
+    # Return the merged commands added since the last call
+    def commands(self):
+        self.merges += 1
+        self.flush()
+        if self.out_xy != (self.x, self.y):
+            self.out.append({"cursor":[self.x, self.y]})
+        self.out_xy = (self.x, self.y)
+
+        out = self.out
+        self.out = []
+        return out
+
+    # The commands of one message were displayed as they are, instead
+    # of by add() and commands(). Keep the cursor where they left it.
+    def passed(self, cmds):
+        self.msgs += 1
+        if not isinstance(cmds, list):
+            cmds = [cmds]
+
+        for cmd in cmds:
+            if isinstance(cmd, dict) and len(cmd) == 1:
+                if "msg" in cmd and isinstance(cmd["msg"], str):
+                    self.move(cmd["msg"])
+                    continue
+
+                xy = cmd.get("cursor")
+                if isinstance(xy, list) and len(xy) == 2 \
+                   and isinstance(xy[0], int) and isinstance(xy[1], int):
+                    self.x = xy[0]
+                    self.y = xy[1]
+                    continue
+
+            if cmd == xmit_lcd.CMD_CLEAR_SCREEN:
+                self.x = 0
+                self.y = 0
+            elif self.is_hg(cmd):
+                self.hg_cursor()
+
+        self.out_xy = (self.x, self.y)
+
+    # move the cursor past text, as the LCD does
+    def move(self, text):
+        x = self.x
+        y = self.y
+        for ch in text:
+            if ch == "\n":
+                x = 0
+                y += 1
+            else:
+                x += 1
+        self.x = x
+        self.y = y
+
+    def is_hg(self, cmd):
+        return isinstance(cmd, dict) and xmit_lcd.CMD_DSP_HG in cmd \
+               or cmd == xmit_lcd.CMD_BLK_HG
+
+    # the hourglass is drawn, or blanked, in the bottom right cell
+    def hg_cursor(self):
+        self.x = self.col_cnt
+        self.y = self.row_cnt - 1
+
+    def put_text(self, text):
+        x = self.x
+        y = self.y
+        if not (0 <= x and 0 <= y < self.row_cnt):
+            # off the screen, where the LCD wraps around
+            self.pass_on({"cursor":[x, y]})
+            self.pass_on({"msg":text})
+            self.move(text)
+            self.out_xy = (self.x, self.y)
+            return
+
+        row = self.cells[y]
+        for i in range(len(text)):
+            ch = text[i]
+            if ch == "\n":
+                x = 0
+                y += 1
+                if y == self.row_cnt:
+                    # the rest is off the screen
+                    self.x = x
+                    self.y = y
+                    self.put_text(text[i+1:])
+                    return
+                row = self.cells[y]
+            else:
+                if x < self.col_cnt:   # the LCD ignores text past the end of a row
+                    row[x] = ch
+                    self.dirty |= 1 << y
+                x += 1
+
+        self.x = x
+        self.y = y
+
+    def clear(self):
+        keep = []
+        for cmd in self.out:
+            if isinstance(cmd, dict) and xmit_lcd.CMD_DSP_HG in cmd:
+                keep.append(cmd)
+        keep.append(xmit_lcd.CMD_CLEAR_SCREEN)
+        self.out = keep
+
+        for y in range(self.row_cnt):
+            if self.dirty & (1 << y):
+                row = self.cells[y]
+                for i in range(self.col_cnt):
+                    row[i] = None
+        self.dirty = 0
+
+        self.x = 0
+        self.y = 0
+        self.out_xy = (0, 0)
+
+    def pass_on(self, cmd):
+        self.flush()
+        self.out.append(cmd)
+        if self.is_hg(cmd):
+            # the hourglass moves the cursor
+            self.hg_cursor()
+            self.out_xy = (self.x, self.y)
+
+    # move the text in cells to out
+    def flush(self):
+        if self.dirty == 0:
+            return
+
+        out = self.out
+        for y in range(self.row_cnt):
+            if not self.dirty & (1 << y):
+                continue
+            row = self.cells[y]
+            x = 0
+            while x < self.col_cnt:
+                if row[x] is None:
+                    x += 1
+                    continue
+
+                start = x
+                while x < self.col_cnt and row[x] is not None:
+                    x += 1
+                out.append({"cursor":[start, y]})
+                out.append({"msg":"".join(row[start:x])})
+                for i in range(start, x):
+                    row[i] = None
+                self.out_xy = (x, y)
+
+        self.dirty = 0
@@ -6,7 +6,18 @@
 # Code is based on Paul Sokolovsky's work.
 # This is a temporary solution until uasyncio V3 gets an efficient official version
 
+# Items are kept in a ring buffer allocated when the queue is created,
+# so get and put are O(1) and do not allocate. The original version used
+# a list, where every get was a list.pop(0) which moved every other item.
+
+# Each queue keeps counters, to show which queues are backing up:
+#   puts, gets  - items put and got
+#   hwm         - high water mark, the most items ever in the queue
+#   full_cnt    - number of times a put filled the queue
+#   blocked_us  - total microseconds put() and put_many() waited for room
+
 import uasyncio as asyncio
+import utime
 
 
 # Exception raised by get_nowait().
@@ -18,18 +29,68 @@ class QueueEmpty(Exception):
 class QueueFull(Exception):
     pass
 
+# Size of the ring buffer for an unbounded queue (maxsize <= 0).
+# Doubled each time it fills.
+_UNBOUNDED_SIZE = 16
+
+# Size of the high priority lane. High priority items are rare (IR keys,
+# focus changes) so this is small. If it is full, a high priority item
+# is put at the end of the normal lane instead.
+_HI_SIZE = 8
+
 class Queue:
 
     def __init__(self, maxsize=0):
         self.maxsize = maxsize
-        self._queue = []
+        size = maxsize if maxsize > 0 else _UNBOUNDED_SIZE
+        self._buf = [None] * size  # Ring buffer, _n items starting at _head
+        self._size = size
+        self._head = 0
+        self._n = 0
+        hi_size = size if size < _HI_SIZE else _HI_SIZE
+        self._hbuf = [None] * hi_size  # High priority items, returned before any in _buf
+        self._hsize = hi_size
+        self._hhead = 0
+        self._hn = 0
         self._evput = asyncio.Event()  # Triggered by put, tested by get
         self._evget = asyncio.Event()  # Triggered by get, tested by put
+        self._on_put = None  # Optional callback, see on_put()
+        self._on_get = None  # Optional callback, see on_get()
+
+        self.puts = 0
+        self.gets = 0
+        self.hwm = 0
+        self.full_cnt = 0
+        self.blocked_us = 0
+
+    # Remove and return the next item, high priority first.
+    def _pop(self):
+        if self._hn > 0:
+            buf = self._hbuf
+            i = self._hhead
+            val = buf[i]
+            buf[i] = None  # Do not keep a reference to the item
+            i += 1
+            self._hhead = 0 if i == self._hsize else i
+            self._hn -= 1
+        else:
+            buf = self._buf
+            i = self._head
+            val = buf[i]
+            buf[i] = None
+            i += 1
+            self._head = 0 if i == self._size else i
+            self._n -= 1
+        return val
 
     def _get(self):
         self._evget.set()  # Schedule all tasks waiting on get
         self._evget.clear()
-        return self._queue.pop(0)
+        val = self._pop()
+        self.gets += 1
+        if self._on_get is not None:
+            self._on_get()
+        return val
 
     async def get(self):  #  Usage: item = await queue.get()
         while self.empty():  # May be multiple tasks waiting on get()
@@ -44,30 +105,297 @@ class Queue:
             raise QueueEmpty()
         return self._get()
 
-    def _put(self, val):
+    # Add an item to the end of the hi (or low) priority lane.
+    def _push(self, val, hi):
+        if hi and self._hn < self._hsize:
+            i = self._hhead + self._hn
+            if i >= self._hsize:
+                i -= self._hsize
+            self._hbuf[i] = val
+            self._hn += 1
+        else:
+            n = self._n
+            if n == self._size:
+                self._grow()
+            i = self._head + n
+            if i >= self._size:
+                i -= self._size
+            self._buf[i] = val
+            self._n = n + 1
+
+    def _put(self, val, hi):
         self._evput.set()  # Schedule tasks waiting on put
         self._evput.clear()
-        self._queue.append(val)
+        self._push(val, hi)
+        # as _count_puts(1), inline as this is the busiest path
+        self.puts += 1
+        n = self._n + self._hn
+        if n > self.hwm:
+            self.hwm = n
+        if n == self.maxsize:
+            self.full_cnt += 1
+        if self._on_put is not None:
+            self._on_put(hi)
+
+    # Update the counters after cnt items were put.
+    def _count_puts(self, cnt):
+        self.puts += cnt
+        n = self._n + self._hn
+        if n > self.hwm:
+            self.hwm = n
+        if n == self.maxsize:
+            self.full_cnt += 1
+
+    # Only called for an unbounded queue, a bounded queue is never over full.
+    def _grow(self):
+        buf = self._buf
+        n = len(buf)
+        new_buf = [None] * (n * 2)
+        for i in range(n):
+            j = self._head + i
+            new_buf[i] = buf[j if j < n else j - n]
+        self._buf = new_buf
+        self._size = n * 2
+        self._head = 0
 
-    async def put(self, val):  # Usage: await queue.put(item)
+    # hi=True puts the item in the high priority lane.
+    # get() returns all high priority items before any others.
+    async def put(self, val, hi=False):  # Usage: await queue.put(item)
+        if self.full():
+            await self._wait_room()
+        self._put(val, hi)
+
+    # Wait until the queue is not full, counting the time waited.
+    async def _wait_room(self):
+        t = utime.ticks_us()
         while self.full():
             # Queue full
             await self._evget.wait()
             # Task(s) waiting to get from queue, schedule first Task
-        self._put(val)
+        self.blocked_us += utime.ticks_diff(utime.ticks_us(), t)
 
-    def put_nowait(self, val):  # Put an item into the queue without blocking.
+    def put_nowait(self, val, hi=False):  # Put an item into the queue without blocking.
         if self.full():
             raise QueueFull()
-        self._put(val)
+        self._put(val, hi)
+
+    # Batch operations. Move many items with one wakeup of waiting tasks
+    # and one on_get() or on_put() callback, instead of one per item.
+
+    # Move up to n items into the list out, appending them.
+    # Waits until there is at least one item. Return the number moved.
+    # The caller can reuse out, after out.clear(), so nothing is allocated.
+    async def get_many(self, out, n):
+        while self.empty():
+            await self._evput.wait()
+        return self.get_many_nowait(out, n)
+
+    # As get_many(), but return 0 if the queue is empty.
+    def get_many_nowait(self, out, n):
+        cnt = 0
+        while cnt < n and self._n + self._hn > 0:
+            out.append(self._pop())
+            cnt += 1
+        if cnt > 0:
+            self.gets += cnt
+            self._evget.set()
+            self._evget.clear()
+            if self._on_get is not None:
+                self._on_get()
+        return cnt
+
+    # Put every item in vals, waiting for room if the queue fills.
+    async def put_many(self, vals, hi=False):
+        i = 0
+        while i < len(vals):
+            if self.full():
+                await self._wait_room()
+            i += self._put_many(vals, i, hi)
+
+    # Put as many items from vals as there is room for.
+    # Return the number put.
+    def put_many_nowait(self, vals, hi=False):
+        return self._put_many(vals, 0, hi)
+
+    def _put_many(self, vals, start, hi):
+        cnt = 0
+        i = start
+        while i < len(vals) and not self.full():
+            self._push(vals[i], hi)
+            i += 1
+            cnt += 1
+        if cnt > 0:
+            self._count_puts(cnt)
+            self._evput.set()
+            self._evput.clear()
+            if self._on_put is not None:
+                self._on_put(hi)
+        return cnt
+
+    # Call func(hi) after every put, where hi is the priority of the item.
+    # Lets a consumer of several queues, such as the message router,
+    # wait on one Event instead of polling.
+    # func() must not block or put to this queue.
+    def on_put(self, func):
+        self._on_put = func
+
+    # Call func() after every get.
+    # func() may put_nowait() to this queue, but must not block.
+    def on_get(self, func):
+        self._on_get = func
+
+    # Remove the oldest item to make room in a full queue.
+    # Low priority items are removed before any high priority item.
+    def drop_oldest(self):
+        if self._n > 0:
+            buf = self._buf
+            i = self._head
+            val = buf[i]
+            buf[i] = None
+            i += 1
+            self._head = 0 if i == self._size else i
+            self._n -= 1
+            return val
+        buf = self._hbuf
+        i = self._hhead
+        val = buf[i]
+        buf[i] = None
+        i += 1
+        self._hhead = 0 if i == self._hsize else i
+        self._hn -= 1
+        return val
+
+    # Replace the first item in the hi (or low) priority lane which has the
+    # same key(item) as val. Return the item replaced, or None if there
+    # was no such item.
+    def replace(self, val, key, hi=False):
+        if hi:
+            buf, head, n = self._hbuf, self._hhead, self._hn
+        else:
+            buf, head, n = self._buf, self._head, self._n
+        k = key(val)
+        size = len(buf)
+        for j in range(n):
+            i = head + j
+            if i >= size:
+                i -= size
+            old = buf[i]
+            if key(old) == k:
+                buf[i] = val
+                return old
+        return None
 
     def qsize(self):  # Number of items in the queue.
-        return len(self._queue)
+        return self._n + self._hn
+
+    def hi_qsize(self):  # Number of high priority items in the queue.
+        return self._hn
 
     def empty(self):  # Return True if the queue is empty, False otherwise.
-        return len(self._queue) == 0
+        return self._n + self._hn == 0
 
     def full(self):  # Return True if there are maxsize items in the queue.
         # Note: if the Queue was initialized with maxsize=0 (the default) or
         # any negative number, then full() is never True.
-        return self.maxsize > 0 and self.qsize() >= self.maxsize
\ No newline at end of file
+        return self.maxsize > 0 and self._n + self._hn >= self.maxsize
+
+
+# Stands in for the put Event of a FlagQueue.
+# set() wakes the one task waiting in get(). clear() does nothing, so a
+# put made before the task waits is not lost, the task just finds the
+# queue not empty.
+class _Handoff:
+
+    def __init__(self):
+        self._flag = asyncio.ThreadSafeFlag()
+
+    def set(self):
+        self._flag.set()
+
+    def clear(self):
+        pass
+
+    async def wait(self):
+        await self._flag.wait()
+
+
+class FlagQueue(Queue):
+
+    """
+        Queue with a single consumer task.
+
+        A put wakes just the consumer, through a ThreadSafeFlag, rather
+        than every task waiting on an Event.
+
+        put_isr() may be called from an interrupt handler, such as a
+        machine.Pin or machine.Timer callback. It does not allocate:
+        items go into a preallocated ring of isr_size slots, which the
+        consumer moves into the queue on its next get. Items which do not
+        fit are counted in isr_lost. Use small ints, or objects which
+        already exist, as ISR items so the handler does not allocate.
+    """
+
+    def __init__(self, maxsize=0, isr_size=8):
+        super().__init__(maxsize)
+        self._evput = _Handoff()
+        self._isr_buf = [None] * (isr_size + 1)  # one slot is always empty
+        self._isr_size = isr_size + 1
+        self._isr_head = 0   # only changed by the consumer
+        self._isr_tail = 0   # only changed by put_isr()
+        self.isr_lost = 0
+
+    # Called from an interrupt handler.
+    # Return False if the ISR ring is full and val was dropped.
+    def put_isr(self, val):
+        t = self._isr_tail
+        nxt = t + 1
+        if nxt == self._isr_size:
+            nxt = 0
+        if nxt == self._isr_head:
+            self.isr_lost += 1
+            return False
+        self._isr_buf[t] = val
+        self._isr_tail = nxt
+        self._evput.set()
+        return True
+
+    # Move items put by put_isr() into the queue, while there is room.
+    def _take_isr(self):
+        buf = self._isr_buf
+        h = self._isr_head
+        cnt = 0
+        while h != self._isr_tail and not self.full():
+            self._push(buf[h], False)
+            buf[h] = None
+            h += 1
+            if h == self._isr_size:
+                h = 0
+            cnt += 1
+        self._isr_head = h
+        if cnt > 0:
+            self._count_puts(cnt)
+            if self._on_put is not None:
+                self._on_put(False)
+
+    async def get(self):
+        self._take_isr()
+        while self.empty():
+            await self._evput.wait()
+            self._take_isr()
+        return self._get()
+
+    def get_nowait(self):
+        self._take_isr()
+        return super().get_nowait()
+
+    async def get_many(self, out, n):
+        self._take_isr()
+        while self.empty():
+            await self._evput.wait()
+            self._take_isr()
+        return self.get_many_nowait(out, n)
+
+    def get_many_nowait(self, out, n):
+        self._take_isr()
+        return super().get_many_nowait(out, n)
+
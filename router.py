@@ -0,0 +1,374 @@
+"""
+    Message Router
+
+    Moves messages from service output queues to service input queues.
+
+    Replaces the controller loop which checked every service output queue
+    on every pass. Instead, each service output queue calls back the router
+    when a message is put on it. The service is added to a ready list and
+    the router task is woken. Only services on the ready list are checked,
+    so the router sleeps while no messages are pending.
+
+    Each time a service is taken off the ready list up to batch_size messages
+    are moved from its output queue. If more messages remain the service goes
+    back on the end of the ready list, so one busy service can not starve
+    the others.
+
+    Priority Lanes
+
+    Queues have a high priority lane (see XmitMsg.is_priority()) for IR keys
+    and focus changes. A service with a high priority message in its output
+    queue goes on a separate ready list which is always checked first, and
+    the queue returns high priority messages before any others. The
+    controller route_xmit() puts high priority messages in the high priority
+    lane of the "to" service input queue.
+
+    Started by controller.py:
+
+        router = Router(svc_lookup, controller_svc.route_xmit, batch_size)
+        await router.run()
+
+    where route_xmit(xmit) is a method of the controller service
+    which passes a single xmit to the Delivery for the "to" service.
+
+    Route Table
+
+    router.routes is a list indexed by service id (see xmit_message.svc_id())
+    giving the Delivery for the input queue of each local service, or None.
+    Slot FOCUS_ID holds the Delivery of the service which currently has focus
+    and is swapped by set_focus() when the controller changes focus.
+
+    Full Input Queues
+
+    The router never waits for room in an input queue. Instead, each service
+    has a policy for messages which arrive while its input queue is full,
+    set by the "q_full" parm in the JSON file:
+        "park"     - keep up to "park_size" messages in a side buffer, in order,
+                     and move them to the input queue as it is emptied.
+                     Drop new messages if the side buffer is also full. (default)
+        "drop_new" - drop the new message
+        "drop_old" - drop the oldest low priority message in the input
+                     queue, else the new message, unless it is high priority
+        "coalesce" - replace a queued message of the same type from the same
+                     service, else drop the new message
+    A high priority message to a full queue always drops the oldest low
+    priority message instead, so IR keys and focus changes are not lost.
+    It is never parked behind low priority messages: it goes straight into
+    the queue if there is room, else ahead of any parked low priority ones.
+    Each Delivery counts delivered, full, dropped, coalesced and parked messages.
+    Dropped messages are released to the message pool (see xmit_message.py).
+
+    Topics
+
+    A service publishes a message to a topic with Service.publish(topic, msg).
+    Services subscribe with the "subscribe" parm in the JSON file, a list of
+    topic names. Topic names are interned like service names and must not be
+    the same as any service name. The route table slot for a topic holds
+    a Fanout, which passes the same xmit object to the Delivery of each
+    subscriber, so subscribers must not change a published xmit.
+
+    Remote nodes subscribe through an I2C link: an "svc_i2c_stub" service
+    (with "forward_i2c_addr") on the Controller, or the "i2c_svc" service
+    on a Responder. A Fanout keeps only one link per I2C address, so each
+    remote node is sent one message however many of its services subscribe.
+    The node then fans the message out to its own subscribers. Messages
+    received over a link (see XmitMsg.link) are only passed to local
+    subscribers, never back out over a link, so a message can not bounce
+    between two nodes. A Responder with no local subscribers to a topic
+    forwards messages published to it on the Responder to the Controller,
+    as for any other unknown service, and drops those from the Controller.
+
+    Direct Delivery
+
+    If the JSON parm "direct_delivery" is true, controller.py also calls
+    router.start_direct_delivery(). Every service is then given the route
+    table. Service.put_to_output_q() uses it to put messages straight into
+    the input queue of the "to" service, skipping the output queue and the router.
+
+    Messages to "focus", to "controller" and to services which are not
+    in the route table (remote services on a Responder) still go through
+    the output queue and the controller. Messages which are delivered directly
+    are not logged by "log_xmit". A service sending directly to a full input
+    queue waits for room, the "q_full" policy is only applied by the router.
+
+"""
+
+import uasyncio
+from xmit_message import FOCUS_ID, svc_id, svc_name, set_shared, release
+from idle_wait import IdleWait
+
+POLICY_PARK     = "park"
+POLICY_DROP_NEW = "drop_new"
+POLICY_DROP_OLD = "drop_old"
+POLICY_COALESCE = "coalesce"
+
+# messages with the same key may be coalesced
+def coalesce_key(xmit):
+    return (xmit.fr_id, type(xmit))
+
+class Delivery:
+
+    """
+        Puts messages into the input queue of a service without blocking,
+        applying the service "q_full" policy if the queue is full.
+    """
+
+    def __init__(self, svc):
+        self.q = svc.get_input_queue()
+
+        # I2C address (or other id) of the remote node, for I2C links
+        self.link = svc.get_parm("forward_i2c_addr", None)
+
+        self.policy    = svc.get_parm("q_full", POLICY_PARK)
+        self.park_size = svc.get_parm("park_size", 10)
+        self.park      = []
+
+        if self.policy == POLICY_PARK:
+            self.q.on_get(self.unpark)
+
+        self.delivered = 0
+        self.full      = 0
+        self.dropped   = 0
+        self.coalesced = 0
+        self.parked    = 0
+
+    def put(self, xmit, hi=False):
+        q = self.q
+
+        # parked messages go first, unless this is high priority
+        if (len(self.park) == 0 or hi) and not q.full():
+            q.put_nowait(xmit, hi)
+            self.delivered += 1
+            return
+
+        self.full += 1
+        policy = self.policy
+
+        # high priority messages make room by dropping a low priority one
+        if hi and q.full() and q.qsize() > q.hi_qsize():
+            release(q.drop_oldest())
+            q.put_nowait(xmit, hi)
+            self.delivered += 1
+            self.dropped += 1
+            return
+
+        if policy == POLICY_PARK:
+            park = self.park
+            # high priority makes room by dropping the newest low priority
+            if hi and len(park) >= self.park_size and not park[-1].is_priority():
+                release(park.pop())
+                self.dropped += 1
+
+            if len(park) < self.park_size:
+                # high priority goes ahead of low priority
+                i = len(park)
+                if hi:
+                    i = 0
+                    while i < len(park) and park[i].is_priority():
+                        i += 1
+                park.insert(i, xmit)
+                self.parked += 1
+                # in case the queue was emptied before anything was parked
+                self.unpark()
+                return
+
+        elif policy == POLICY_DROP_OLD:
+            # a low priority message never drops a high priority one,
+            # drop_oldest() takes low priority messages first
+            if hi or q.qsize() > q.hi_qsize():
+                release(q.drop_oldest())
+                q.put_nowait(xmit, hi)
+                self.delivered += 1
+                self.dropped += 1
+                return
+
+        elif policy == POLICY_COALESCE:
+            old = q.replace(xmit, coalesce_key, hi)
+            if old is not None:
+                release(old)
+                self.coalesced += 1
+                return
+
+        self.dropped += 1
+        release(xmit)
+
+    # Used by direct delivery. The sending service waits for room instead
+    # of applying the policy, just as it would wait on its own full output queue.
+    async def put_wait(self, xmit, hi=False):
+        await self.q.put(xmit, hi)
+        self.delivered += 1
+
+    # Called after every get from a "park" input queue.
+    # Move parked messages into the queue while there is room.
+    def unpark(self):
+        park = self.park
+        q = self.q
+        while len(park) > 0 and not q.full():
+            xmit = park.pop(0)
+            q.put_nowait(xmit, xmit.is_priority())
+            self.delivered += 1
+
+class Fanout:
+
+    """
+        Passes a message published to a topic to the Delivery
+        of every subscriber. See "Topics" above.
+    """
+
+    def __init__(self):
+        self.dlvs = []
+        self.published = 0
+
+    # Add a subscriber, keeping only one link to each remote node.
+    def add(self, dlv):
+        if dlv in self.dlvs:
+            return
+
+        if dlv.link is not None:
+            for d in self.dlvs:
+                if d.link == dlv.link:
+                    return
+
+        self.dlvs.append(dlv)
+
+    def put(self, xmit, hi=False):
+        self.published += 1
+
+        # sent on this node? then also send to remote nodes,
+        # never back to the node it was received from
+        local = xmit.link is None
+
+        for d in self.dlvs:
+            if local or d.link is None:
+                d.put(xmit, hi)
+
+    # Used by direct delivery. Publishers never wait for subscribers.
+    async def put_wait(self, xmit, hi=False):
+        self.put(xmit, hi)
+
+class Router:
+
+    def __init__(self, svc_lookup, route_xmit, batch_size=8):
+        self.svc_lookup = svc_lookup
+        self.route_xmit = route_xmit
+        self.batch_size = batch_size
+
+        # services whose output queue may have messages
+        self.ready    = []
+        self.ready_hi = []   # ... high priority messages
+        self.idle = IdleWait("router")
+
+        # service or topic id to Delivery or Fanout
+        self.routes = [None]
+        self.focus_id = FOCUS_ID
+        self.direct = False
+
+        for svc in svc_lookup.values():
+            self.add_svc(svc)
+
+    # Start routing the output queue of a service.
+    # Also used for external services added after startup.
+    def add_svc(self, svc):
+        routes = self.routes
+        while len(routes) <= svc.svc_id:
+            routes.append(None)
+        dlv = Delivery(svc)
+        routes[svc.svc_id] = dlv
+        if svc.svc_id == self.focus_id:
+            routes[FOCUS_ID] = dlv
+
+        for topic in svc.get_parm("subscribe", []):
+            self.subscribe(topic, dlv)
+
+        q_out = svc.get_output_queue()
+        q_out.on_put(lambda hi: self.set_ready(svc, hi))
+
+        # service may have sent messages before the router started
+        if not q_out.empty():
+            self.set_ready(svc, q_out.hi_qsize() > 0)
+
+        if self.direct:
+            svc.direct_routes = routes
+
+    # Pass messages published to topic to dlv
+    def subscribe(self, topic, dlv):
+        topic_id = svc_id(topic)
+        routes = self.routes
+        while len(routes) <= topic_id:
+            routes.append(None)
+
+        fanout = routes[topic_id]
+        if fanout is None:
+            fanout = Fanout()
+            routes[topic_id] = fanout
+            set_shared(topic_id)
+
+        fanout.add(dlv)
+
+    # Allow services to send to local services without going through the router.
+    def start_direct_delivery(self):
+        self.direct = True
+
+        for svc in self.svc_lookup.values():
+            svc.direct_routes = self.routes
+
+    # Make messages sent to "focus" go to the service with id focus_id
+    def set_focus(self, focus_id):
+        self.focus_id = focus_id
+        routes = self.routes
+        if focus_id < len(routes):
+            routes[FOCUS_ID] = routes[focus_id]
+        else:
+            routes[FOCUS_ID] = None
+
+    # Send the counters of each service whose input queue has been full
+    # to the log service via svc.log_msg().
+    async def dump_deliveries(self, svc):
+        routes = self.routes
+        for i in range(FOCUS_ID + 1, len(routes)):
+            d = routes[i]
+            if isinstance(d, Delivery) and d.full > 0:
+                await svc.log_msg("{} {}: {} delivered, {} full, {} dropped, {} coalesced, {} parked".format(
+                    svc_name(i), d.policy, d.delivered, d.full, d.dropped, d.coalesced, d.parked))
+
+    # Called by an output queue after a put
+    def set_ready(self, svc, hi=False):
+        ready = self.ready_hi if hi else self.ready
+        if svc not in ready:
+            ready.append(svc)
+            self.idle.set()
+
+    # Never returns.
+    # Wait until a message is put on any output queue,
+    # then route messages until all output queues are empty.
+    async def run(self):
+        ready      = self.ready
+        ready_hi   = self.ready_hi
+        idle       = self.idle
+        route_xmit = self.route_xmit
+        batch      = []   # reused for every get_many_nowait()
+
+        while True:
+            await idle.wait()
+            idle.count(len(ready_hi) > 0 or len(ready) > 0)
+
+            while len(ready_hi) > 0 or len(ready) > 0:
+                # high priority first
+                if len(ready_hi) > 0:
+                    svc = ready_hi.pop(0)
+                else:
+                    svc = ready.pop(0)
+
+                q_out = svc.get_output_queue()
+
+                q_out.get_many_nowait(batch, self.batch_size)
+                for xmit in batch:
+                    route_xmit(xmit)
+                batch.clear()
+
+                # more messages? go to end of the line
+                if not q_out.empty():
+                    self.set_ready(svc, q_out.hi_qsize() > 0)
+
+                # allow co-routines to execute
+                await uasyncio.sleep_ms(0)
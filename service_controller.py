@@ -17,11 +17,12 @@
 """
 
 from service import Service
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, XmitCtl, svc_id, FOCUS_ID, release, pool_stats
 from svc_i2c_stub import fwd_i2c_msg
 
 import queue
 import uasyncio
+import idle_wait
 import gc
 # import xmit_ir_remote
 
@@ -35,69 +36,62 @@ class ModuleService(Service):
         
         self.ir_remote = self.get_parm("ir_remote",None)
         self.svc_lookup = None
+        self.router = None
+        self.routes = None
+        self.trace = None
+        self.has_focus_id = FOCUS_ID
 
-    # Check output queue for each service.
-    # If there is an output queue record, pass it to the appropriate input queue.
-    # svc_dict is a dictionary containing one entry for each service.
+    # Called by controller.py once all services are created.
+    # svc_lookup is a dictionary containing one entry for each service.
     # Key is the service name, as specified in the .json startup file.
     # Value is the service object.
-    async def poll_output_queues(self, svc_lookup, log_xmit):
-        
-        # below used by self.run() to add external services
-        self.svc_lookup = svc_lookup
-        
-        xmit_passed = False
-        
-        # check each service output queue to see if a message was sent
-        # if it was, pass it to the input queue for the "to" service
-        for svc in self.svc_lookup.values():
-            q_svc_output = svc.get_output_queue()
-            
-            if not q_svc_output.empty():
-                xmit = await q_svc_output.get()
-                
-                # pass message to queue for specified service
-                to = xmit.get_to()
-                fr = xmit.get_from()
-                
-                if to == "focus":
-                    xmit.set_to(self.has_focus_svc)
-                    to = self.has_focus_svc
-                    
-                if to in self.svc_lookup:
-                    q_svc_input = self.svc_lookup [to].get_input_queue()
+    # trace is a TraceRing, or None if messages are not traced.
+    def set_router(self, router, trace):
+        self.router = router
+        self.routes = router.routes
+        self.svc_lookup = router.svc_lookup
+        self.trace = trace
 
-                    # avoid logging my sending a message to log
-                    # if to != "log":
-                    xmit_passed = True
-                        
-                    await q_svc_input.put(xmit)
-                    
-                    # should we log all messages passed from one service to another?
-                    if log_xmit and xmit.to != "log":
-                        await self.log_msg(xmit.dumps())
-                        
-                else:
-                    if log_xmit:
-                        await self.log_msg("ignore: " + xmit.dumps())
+    # Called by the router for each message in a service output queue.
+    # Pass the message to the input queue for the "to" service.
+    # Route table slot FOCUS_ID holds the Delivery of the focus service.
+    # Never blocks, see router.Delivery.
+    def route_xmit(self, xmit):
+        routes = self.routes
+        to_id = xmit.to_id
 
-                # allow co-routines to execute
-                # - not needed if we only process max one message per output queue
-                # await uasyncio.sleep_ms(0)
-                
-            # allow co-routines to execute
-            await uasyncio.sleep_ms(0)
+        dlv = None
+        if to_id < len(routes):
+            dlv = routes[to_id]
+
+        if dlv is not None and to_id == FOCUS_ID:
+            xmit.to_id = self.has_focus_id
+
+        # trace all messages, including those to unknown services,
+        # before a full queue policy may drop and release it
+        if self.trace is not None:
+            self.trace.record(xmit)
             
-        return xmit_passed
-    
-    
+        if dlv is not None:
+            dlv.put(xmit, xmit.is_priority())
+        else:
+            release(xmit)
+
+    # Change the service with focus,
+    # making the router send "focus" messages to it.
+    def set_focus_svc(self, service_name):
+        self.has_focus_svc = service_name
+        self.has_focus_id = svc_id(service_name)
+        self.router.set_focus(self.has_focus_id)
+
+
     async def run(self):
         
         focus_svc = self.get_parm("startup_focus","menu")
         
         await self.log_msg("sending gain focus to " + focus_svc)
         await self.send_gain_focus(focus_svc)
-        self.has_focus_svc = focus_svc
+        self.set_focus_svc(focus_svc)
         
         q_input = self.get_input_queue()
         
@@ -131,6 +125,7 @@ class ModuleService(Service):
             module = __import__(svc_parms['module'])
             svc = module.ModuleService(svc_parms)
             self.svc_lookup[svc_parms['name']] = svc
+            self.router.add_svc(svc)
             uasyncio.create_task(svc.run())
             
             await self.log_msg("started svc {} for responder {}".format(svc_parms['name'],i2c_addr))
@@ -150,14 +145,22 @@ class ModuleService(Service):
             self.focus_queue.append(self.has_focus_svc)
             await self.send_lose_focus(self.has_focus_svc)
             await self.send_gain_focus(fr)
-            self.has_focus_svc = fr
+            self.set_focus_svc(fr)
             
             return True
         
         if msg == self.CTL_XFER_FOCUS_MSG:
             await self.send_lose_focus(self.has_focus_svc)
             await self.send_gain_focus(fr)
-            self.has_focus_svc = fr
+            self.set_focus_svc(fr)
+            return True
+        
+        if msg == self.CTL_DUMP_TRACE_MSG:
+            if self.trace is not None:
+                await self.trace.dump(self)
+            await self.router.dump_deliveries(self)
+            await idle_wait.dump(self)
+            await self.log_msg("xmit pool: {} new, {} reused, {} free".format(*pool_stats()))
             return True
         
         if msg == self.CTL_POP_FOCUS_MSG:
@@ -165,7 +168,7 @@ class ModuleService(Service):
                 return False
             
             await self.send_lose_focus(self.has_focus_svc)
-            self.has_focus_svc = self.focus_queue[-1]
+            self.set_focus_svc(self.focus_queue[-1])
             await self.send_gain_focus(self.has_focus_svc)
             del self.focus_queue[-1]
             return True
@@ -183,11 +186,12 @@ class ModuleService(Service):
             
         return False
             
+    # focus changes are sent as high priority XmitCtl messages
     async def send_gain_focus(self, service_name):
-        await self.send_msg(service_name,self.CTL_GAIN_FOCUS_MSG)
+        await self.put_to_output_q(XmitCtl(self.name,service_name,self.CTL_GAIN_FOCUS_MSG))
         
     async def send_lose_focus(self, service_name):
-        await self.send_msg(service_name,self.CTL_LOSE_FOCUS_MSG)
+        await self.put_to_output_q(XmitCtl(self.name,service_name,self.CTL_LOSE_FOCUS_MSG))
         
         
                             
@@ -3,13 +3,10 @@
     
     Sends and recieves messages from I2C Responders.
     
-    Input queue contains any outgoing messages. The original xmit
-    containing to/from and message, must be "wrapped".
-    See xmit_message.XmitMsg wrapXmit() and unwrapMsg().
-    
-    The message in the wrapped xmit is further enhanced by the I2C stub
-    forwarding the xmit, to contain the I2C address to which the message will be sent.
-    This service then forwards the wrapped message to the I2C address.
+    Input queue contains any outgoing messages, each in an
+    xmit_message.XmitFwd envelope made by the I2C stub forwarding the xmit,
+    which holds the original xmit and the I2C address to send it to.
+    This service encodes the original xmit, once, and sends it to that address.
     
     Also polls the I2C responders to see if they have any input.
     Note that ALL responders must respond, if nothing else with a
@@ -18,14 +15,54 @@
     placed on the output queue. The unwrapped message will specify the
     from, to and message contents.
     
+    Between polls, sleeps until a message is put on the input queue,
+    or the next Responder is due to be polled. See idle_wait.py.
+    
+    Each Responder is polled at its own interval: every "poll_min_ms"
+    parm (default 10) after it sent a message or was sent one, doubled
+    after each poll where it had nothing to send, up to "poll_max_ms"
+    (default "poll_ms" if given, else 100). Polls which find nothing,
+    other than in a burst of messages, may use at most "poll_budget_ms"
+    (default 20, 0 for no limit) of each second. Once that is used up,
+    Responders which are not in a burst are not polled until it is
+    earned back, so idle Responders may be polled less often than
+    "poll_max_ms".
+    
+    A Responder with a data ready line, a GPIO it holds high while it
+    has a message to send, is only read when the line is high, or every
+    "ready_poll_ms" parm (default 1000) in case it does not drive it.
+    The "i2c_ready_pins" parm maps each such Responder address, in
+    decimal, to the GPIO on this Pico the line is connected to:
+        "i2c_ready_pins" : {"65": 15}
+    The lines are checked every "ready_ms" parm (default 10).
+    See i2c_poll.py.
+    
+    Messages are sent as JSON until the Responder agrees to the binary
+    format in xmit_codec.py. The hello is sent to the "responder_i2c_svc"
+    parm service (default "i2c_svc") on each Responder at startup.
+    
+    Blocks are up to the "i2c_max_blk" parm (default 128) bytes, or the
+    block size of the Responder if smaller. See i2c_controller.py.
+    Messages are streamed to and from Responders which offer it, unless
+    the "i2c_stream" parm is false, and checked with CRC-16 rather than
+    the ICMPv6 sum unless the "i2c_crc" parm is false.
+    
 """
 
 from service import Service
 import queue
 import uasyncio
-from xmit_message import XmitMsg
+import utime
+from machine import Pin
+from xmit_message import XmitMsg, release
+from xmit_codec import Codec, is_hello, WIRE_BIN, WIRE_RESET
 from i2c_controller import I2cController
 from svc_i2c_stub import fwd_i2c_msg
+from idle_wait import IdleWait
+from i2c_poll import PollSchedule
+
+# most messages taken from an unbounded queue (maxsize 0) at once
+_BATCH = 16
 
 # All services classes are named ModuleService
 class ModuleService(Service):
@@ -38,7 +75,9 @@ class ModuleService(Service):
         # self.controller = I2cController(scl_pin=scl, sda_pin=sda )
         
         i2c = self.get_i2c()
-        self.controller = I2cController(i2c=i2c )
+        self.controller = I2cController(i2c=i2c, max_blk=self.get_parm("i2c_max_blk",128),
+                                        stream=self.get_parm("i2c_stream",True),
+                                        crc=self.get_parm("i2c_crc",True))
         
         # self.controller = self.get_i2c()
         
@@ -57,6 +96,10 @@ class ModuleService(Service):
         defaults = self.svc_parms["defaults"]
         defaults["i2c_interface"] = self.controller
         
+        # wire format for each responder address, see xmit_codec.py
+        self.codecs = {}
+        self.hello_names = None
+        
         
 
     async def run(self):
@@ -76,50 +119,132 @@ class ModuleService(Service):
         
         await self.log_msg("polling addresses: " + str(poll_addr))
         
+        # offer each responder the binary wire format
+        self.hello_names = list(self.get_parm("svc_lookup", {}).keys())
+        for addr in poll_addr:
+            self.codecs[addr] = Codec()
+            await self.send_hello(addr)
+            await uasyncio.sleep_ms(0)
+            
         # poll responder plug and play service
         for addr in poll_addr:
             xmit = XmitMsg(self.CTL_SERVICE_NAME,"pnp_svc", "ext_svc")
             xmit = fwd_i2c_msg(self.CTL_SERVICE_NAME,xmit,addr)
             await q_in.put(xmit)
         
+        # which responders to read on each pass
+        sched = PollSchedule(min_ms=self.get_parm("poll_min_ms",10),
+                             max_ms=self.get_parm("poll_max_ms",self.get_parm("poll_ms",100)),
+                             ready_ms=self.get_parm("ready_ms",10),
+                             slow_ms=self.get_parm("ready_poll_ms",1000),
+                             budget_ms=self.get_parm("poll_budget_ms",20))
+        ready_pins = self.get_parm("i2c_ready_pins",{})
+        for addr in poll_addr:
+            gpio = ready_pins.get(str(addr))
+            if gpio is not None:
+                sched.add(addr, Pin(gpio, Pin.IN, Pin.PULL_DOWN))
+            else:
+                sched.add(addr)
+        
+        # send queued messages as soon as they arrive
+        idle = IdleWait(self.name, sched.wait_ms(utime.ticks_ms()))
+        idle.watch_put(q_in)
+        
+        # reused for batch gets and puts
+        batch = []
+        due   = []
+        batch_max = q_in.maxsize if q_in.maxsize > 0 else _BATCH
+        
         while True:
+            useful = False
             
             # send any queued xmit
-            while not q_in.empty():
-                xmit = await q_in.get()
-                wrapped_msg = xmit.get_msg()
+            if q_in.get_many_nowait(batch, batch_max) > 0:
+                useful = True
+                
+            for env in batch:
+                xmit = env.msg
                  
                 # try to avoid hangups by send message to non-active bus address
-                i2c_addr = wrapped_msg[0]
-                msg = wrapped_msg[1]
+                i2c_addr = env.addr
                 
                 if i2c_addr in poll_addr:
+                    msg = self.codecs[i2c_addr].encode(xmit)
                     await self.controller.send_msg(i2c_addr,msg)
-                    # await self.log_msg("ctl sent: " + msg + " to " + str(i2c_addr))
+                    sched.sent(i2c_addr, utime.ticks_ms())
                 else:
-                    await self.log_msg("skipped msg: " + msg)
+                    await self.log_msg("skipped msg: " + xmit.dumps())
+                    
+                release(xmit)
+                release(env)
                 
+                # let other tasks run between I2C transfers
                 await uasyncio.sleep_ms(0)
                 
+            batch.clear()
+                
             # poll i2c bus for any input
-            for addr in poll_addr:
-                msg = await self.controller.rcv_msg(addr)
+            sched.due(utime.ticks_ms(), due)
+            for addr in due:
+                codec = self.codecs[addr]
+                t = utime.ticks_us()
+                msg = await self.controller.rcv_msg(addr, True)
+                sched.read(addr, len(msg) > 0, utime.ticks_diff(utime.ticks_us(), t))
                 
                 while len(msg) > 0:
-                    # unwrap the message and place on output queue
-                    xmit = XmitMsg(msg=msg)
-                    xmit.unwrapMsg()
-                    await q_out.put(xmit)
-                    msg = await self.controller.rcv_msg(addr)
+                    useful = True
+                    # unwrap the message, output queue after all received
+                    xmit = await self.unwrap(addr, codec, msg)
+                    if xmit is not None:
+                        batch.append(xmit)
+                    msg = await self.controller.rcv_msg(addr, True)
                     
                     await uasyncio.sleep_ms(0)
                     
+                if len(batch) > 0:
+                    await q_out.put_many(batch)
+                    batch.clear()
+                    
                 await uasyncio.sleep_ms(0)
                 
-            # wait 1/3 second before polling I2C bus again
-            # TODO: base wait on number of ticks since last wait?
-            #  - wait for at least 333 ticks since last polling
-            await uasyncio.sleep_ms(100)
-                            
+            idle.count(useful)
+            
+            # wait until a responder is due to be polled again
+            idle.max_idle_ms = max(1, sched.wait_ms(utime.ticks_ms()))
+            await idle.wait()
+
+    # Decode a message received from the responder at addr.
+    # Return None if it was a hello reply or could not be decoded.
+    async def unwrap(self, addr, codec, msg):
+        try:
+            xmit = codec.decode(msg)
+        except (ValueError, IndexError) as e:
+            await self.log_msg("i2c {} bad msg: {}".format(addr, e))
+            return None
+            
+        if is_hello(xmit):
+            await self.wire_hello(addr, xmit.msg)
+            release(xmit)
+            return None
+            
+        xmit.link = addr   # never sent back, see router.Fanout
+        return xmit
+        
+    # Offer the binary wire format to the responder at addr.
+    # Sent straight away, as JSON, ahead of any queued messages.
+    async def send_hello(self, addr):
+        msg = {"wire":[WIRE_BIN], "names":self.hello_names}
+        xmit = XmitMsg(self.name, self.get_parm("responder_i2c_svc","i2c_svc"), msg)
+        await self.controller.send_msg(addr, xmit.dumps())
+        
+    # reply to a hello, or a reset, from the responder at addr
+    async def wire_hello(self, addr, msg):
+        codec = self.codecs[addr]
+        if msg["wire"] == WIRE_BIN:
+            codec.set_names(self.hello_names + msg["names"])
+            await self.log_msg("i2c {} wire {}".format(addr, WIRE_BIN))
+        elif msg["wire"] == WIRE_RESET:
+            codec.set_names(None)
+            await self.log_msg("i2c {} wire reset".format(addr))
+            await self.send_hello(addr)
 
-    
@@ -2,6 +2,11 @@
     IR Service
     
     Receive IR signals from remote.
+
+    The IR callback puts each key on a FlagQueue with put_isr(),
+    which does not allocate and wakes check_ir_data(). Keys which
+    arrive faster than they are sent queue up instead of replacing
+    each other. "key_q_size" parm sets how many keys can wait.
     
 """
 
@@ -27,7 +32,7 @@ def sensor_callback(data, addr, ctrl):
         #print('Repeat code.')
     else:
         # print('********** Data {:02x} Addr {:04x} Ctrl {:02x}'.format(data, addr, ctrl))
-        ir_obj.data = data
+        ir_obj.keys.put_isr(data)
             
 # All services classes are named ModuleService
 class ModuleService(Service):
@@ -54,7 +59,8 @@ class ModuleService(Service):
         
         # self.ir_sensor.error_function(self.count_err)
          
-        self.data = None
+        key_q_size = self.get_parm("key_q_size", 8)
+        self.keys = queue.FlagQueue(key_q_size, key_q_size)
         self.lcd_on = 1
         ir_obj = self
         
@@ -81,20 +87,12 @@ class ModuleService(Service):
         self.run_check_task = uasyncio.create_task(self.check_ir_data())
         await super().run()
              
-    # check to see if there is any IR data
-    # if so, send the key
+    # wait for keys from the IR callback and send them
     async def check_ir_data(self):
-        ts = utime.ticks_ms()
-        
+        keys = self.keys
         while True:
-
-            if (self.data != None
-            and utime.ticks_diff(utime.ticks_ms(), ts) > 10):
-                ts = utime.ticks_ms()
-                await self.send_key(self.data)
-                self.data = None
-                
-            await uasyncio.sleep_ms(10)
+            key = await keys.get()
+            await self.send_key(key)
 
         
     # send a key to the focus service
@@ -20,7 +20,11 @@
        
        [{'cursor':[6,0]},{'msg':' 69.9'},{'cursor':[10,1]},{'msg':'38'}]
        
-       
+    Messages which are waiting in the input queue, up to "merge_max"
+    (default 8), are merged into one list of commands before they are
+    displayed, so text which a later message overwrites is never written
+    to the LCD. See lcd_merge.py. "merge_max":0 displays each message
+    as it is.
     
 """
 # from lcd1602 import LCD
@@ -33,6 +37,8 @@ from pico_i2c_lcd import I2cLcd
 
 import utf8_char
 import xmit_lcd
+from xmit_message import release
+from lcd_merge import LcdMerge
 
 import queue
 import uasyncio
@@ -75,6 +81,9 @@ class ModuleService(Service):
         
         self.hg_task_cnt    = 0
         
+        self.merge_max = self.get_parm("merge_max", 8)
+        self.merge = LcdMerge(self.lcd_col_cnt, self.lcd_row_cnt)
+        
         # dictionary to execute commands
         self.cmd_lookup = {
             xmit_lcd.CMD_CLEAR_SCREEN : self.clear_screen,
@@ -123,10 +132,43 @@ class ModuleService(Service):
         # It won't do anything until blink_interval is set
         self.blink_task = uasyncio.create_task(self.blink_lcd())
         
+        if self.merge_max > 0:
+            await self.merge_msgs(q)
+        
         while True:
             # if not q.empty():
             msg = await q.get()
             self.process_msg(msg)
+            release(msg)
+
+            # give co-processes a chance to run
+            await uasyncio.sleep_ms(0)
+            
+    # Never returns. Display all the messages in the queue at once.
+    async def merge_msgs(self, q):
+        merge = self.merge
+        batch = []   # reused for every get_many()
+        
+        while True:
+            await q.get_many(batch, self.merge_max)
+            
+            # nothing to merge in a single message
+            if len(batch) == 1:
+                xmit = batch[0]
+                self.process_msg(xmit)
+                merge.passed(xmit.get_msg())
+                release(xmit)
+                batch.clear()
+                await uasyncio.sleep_ms(0)
+                continue
+                
+            for xmit in batch:
+                merge.add(xmit.get_msg())
+                release(xmit)
+            batch.clear()
+            
+            for command in merge.commands():
+                self.process_command(command)
 
             # give co-processes a chance to run
             await uasyncio.sleep_ms(0)
@@ -8,6 +8,7 @@
 from service import Service
 import queue
 import uasyncio
+from xmit_message import release
 
 # All services classes are named ModuleService
 class ModuleService(Service):
@@ -18,37 +19,44 @@ class ModuleService(Service):
         self.last_fr  = None
         self.count    = 0
         self.print_log = self.get_parm("print_log",1)
+        self.batch_size = self.get_parm("batch_size",16)
 
     async def run(self):
         # print("run print")
         q = self.get_input_queue()
+        batch = []
         
         while True:
             # if not q.empty():
-            # wait for input
-            xmit = await q.get()
+            # wait for input, then print everything queued
+            # with one wakeup
+            await q.get_many(batch, self.batch_size)
             
-            if self.print_log:
-                msg = xmit.get_msg()
-                fr = xmit.get_from()
-                if self.last_fr == fr and self.last_msg == msg:
-                    if self.count == 0:
-                        self.count = 1
-                        print("... 1", end="")
-                    else:
-                        self.count = self.count+1
-                        print(" " + str(self.count),end="" )
-                else:
-                    if self.count != 0:
-                        print(" ")  # print newline character
-                        self.count = 0
-                        
-                    self.last_fr = fr
-                    self.last_msg = msg
-                    print(fr + ": " + msg)
+            for xmit in batch:
+                if self.print_log:
+                    self.print_xmit(xmit)
+                release(xmit)
+                    
+            batch.clear()
 
             # give co-processes a chance to run
             # await uasyncio.sleep_ms(0)
-                            
-
-    
+            
+    def print_xmit(self, xmit):
+        msg = xmit.get_msg()
+        fr = xmit.get_from()
+        if self.last_fr == fr and self.last_msg == msg:
+            if self.count == 0:
+                self.count = 1
+                print("... 1", end="")
+            else:
+                self.count = self.count+1
+                print(" " + str(self.count),end="" )
+        else:
+            if self.count != 0:
+                print(" ")  # print newline character
+                self.count = 0
+                
+            self.last_fr = fr
+            self.last_msg = msg
+            print(fr + ": " + str(msg))
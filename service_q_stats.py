@@ -0,0 +1,105 @@
+"""
+    Queue Statistics
+
+    Shows which service queues are backing up.
+
+    While it has focus, the LCD shows the top offenders, the queues whose
+    producers have spent the most time blocked waiting for room, then
+    the queues which have filled most often, then the fullest queues.
+    Updated every "refresh_ms" (default 1000).
+
+        queue    hw% fl   ms
+        lcd   i 100% 12  340
+
+    Each row is the service name, "i" or "o" for its input or output
+    queue, the high water mark as a percent of the queue size, the
+    number of times the queue filled and the milliseconds producers
+    spent blocked in put().
+
+    Any key, other than the menu navigation keys, sends the counters
+    for every queue which has been used to the log service.
+
+    The counters are kept by lib/queue.py. The services are found through
+    the "svc_lookup" default set by controller.py.
+
+"""
+
+from service import Service
+import uasyncio
+
+import xmit_lcd
+
+ROW_CNT = 3   # LCD rows for offenders, below the heading
+
+# All services classes are named ModuleService
+class ModuleService(Service):
+
+    def __init__(self, svc_parms):
+        super().__init__(svc_parms)
+        self.svc_lookup = self.get_parm("svc_lookup", {})
+        self.refresh_ms = self.get_parm("refresh_ms", 1000)
+        self.display_task = None
+
+    async def gain_focus(self):
+        await super().gain_focus()
+        if self.display_task == None:
+            self.display_task = uasyncio.create_task(self.display_stats())
+
+    async def lose_focus(self):
+        if self.display_task != None:
+            self.display_task.cancel()
+            self.display_task = None
+        await super().lose_focus()
+
+    async def process_ir_input(self, xmit):
+        await self.dump_stats()
+
+    # list of (service name, "i" or "o", queue) for every service
+    def queues(self):
+        q_list = []
+        for name, svc in self.svc_lookup.items():
+            q_list.append((name, "i", svc.get_input_queue()))
+            q_list.append((name, "o", svc.get_output_queue()))
+        return q_list
+
+    # high water mark as a percent of the queue size
+    def hwm_pct(self, q):
+        if q.maxsize <= 0:
+            return 0
+        return q.hwm * 100 // q.maxsize
+
+    # worst offenders first
+    def rank(self, entry):
+        q = entry[2]
+        return (q.blocked_us, q.full_cnt, self.hwm_pct(q))
+
+    # runs as a separate task while we have focus
+    async def display_stats(self):
+        xmit = xmit_lcd.XmitLcd(fr=self.name).clear_screen()
+        xmit.set_msg("{:<8}{:>4}{:>3}{:>5}".format("queue", "hw%", "fl", "ms"))
+        await self.put_to_output_q(xmit)
+
+        while True:
+            q_list = self.queues()
+            q_list.sort(key=self.rank, reverse=True)
+
+            xmit = xmit_lcd.XmitLcd(fr=self.name)
+            for row in range(ROW_CNT):
+                line = ""
+                if row < len(q_list):
+                    name, io, q = q_list[row]
+                    line = "{:<6.6}{} {:>3}%{:>3}{:>5}".format(name, io,
+                        self.hwm_pct(q), min(q.full_cnt, 99),
+                        min(q.blocked_us // 1000, 99999))
+                xmit.set_cursor(0, row+1).set_msg("{:<20}".format(line))
+            await self.put_to_output_q(xmit)
+
+            await uasyncio.sleep_ms(self.refresh_ms)
+
+    # send the counters for every queue which has been used to the log
+    async def dump_stats(self):
+        for name, io, q in self.queues():
+            if q.puts > 0:
+                await self.log_msg("q {} {}: {} puts, {} gets, {} now, hwm {}/{}, {} full, {}us blocked".format(
+                    name, io, q.puts, q.gets, q.qsize(), q.hwm, q.maxsize,
+                    q.full_cnt, q.blocked_us))
@@ -1,5 +1,10 @@
 """
     Display MPU6050 Gyro Data.
+    
+    If the "publish" parm is set, also publish every change in
+    the readings to that topic, whether or not this service has focus.
+    Message is a dictionary:
+        {"x":-4, "y":8, "temp":75}
 
 """
 
@@ -24,14 +29,40 @@ class ModuleService(Service):
         
         self.imu = None
         self.adj_x = self.get_parm("adj_x",0)
-
-
-    async def gain_focus(self):
-        await super().gain_focus()
         
+        self.topic = self.get_parm("publish",None)
+        
+        
+    async def run(self):
+        if self.topic != None:
+            uasyncio.create_task(self.publish_data())
+            
+        await super().run()
+        
+
+    def init_imu(self):
         if self.imu == None:       
             dev_addr = self.get_parm("device_addr",0)
             self.imu = MPU6050(self.get_i2c(),device_addr=dev_addr)
+            
+            
+    # return (x, y, temp)
+    def read_imu(self):
+        ax=int(round(self.imu.accel.x*90/4))
+        ay=int(round(self.imu.accel.y*90/4))
+        temp=int(round((self.imu.temperature* 1.8 + 32)))
+                        
+        # try rounding to the nearest 4 degrees
+        ax = ax*4 + self.adj_x
+        ay = ay*4
+        
+        return (ax, ay, temp)
+        
+        
+    async def gain_focus(self):
+        await super().gain_focus()
+        
+        self.init_imu()
         
         if self.display_task == None:
             self.display_task = uasyncio.create_task(self.display_data())
@@ -69,13 +100,7 @@ class ModuleService(Service):
                 
                 ts = utime.ticks_ms()
                 
-                ax=int(round(self.imu.accel.x*90/4))
-                ay=int(round(self.imu.accel.y*90/4))
-                temp=int(round((self.imu.temperature* 1.8 + 32)))
-                                
-                # try rounding to the nearest 4 degrees
-                ax = ax*4 + self.adj_x
-                ay = ay*4
+                ax, ay, temp = self.read_imu()
 
                 axs   = "{:d}".format(ax)
                 ays   = "{:d}".format(ay)
@@ -92,7 +117,19 @@ class ModuleService(Service):
                     await self.put_to_output_q(xmit)
             
             await uasyncio.sleep_ms(0)
-                                
-        
-        
+            
+            
+    # runs as a separate task, publishing readings to self.topic
+    async def publish_data(self):
+        self.init_imu()
+        prev = None
         
+        while True:
+            reading = self.read_imu()
+            
+            if reading != prev:
+                prev = reading
+                ax, ay, temp = reading
+                await self.publish(self.topic, {"x":ax, "y":ay, "temp":temp})
+                
+            await uasyncio.sleep_ms(1000)
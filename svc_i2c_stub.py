@@ -4,29 +4,26 @@
     Used when a service actually exists on another I2C node as
     either a Controller or Responder.
     
-    Any input queue records are "wrapped" in an xmit which
-    is sent to the "i2c_svc" input queue. IF the parms specify a
-    "forward_i2c_addr" parm, the message in the xmit is further wrapped to be
-    inside a dictionary under the name "msg". An additional field, "i2c_addr",
-    is then added to the dictionary and the dictionary is stored in the
-    xmit message field.
+    Any input queue records are put in an XmitFwd envelope, with the
+    "forward_i2c_addr" parm as the I2C address, which is sent to the
+    "i2c_svc" input queue. The record is not serialized until the
+    "i2c_svc" sends it. See xmit_message.XmitFwd.
     
     NOTE: may have problems with focus events? And possibly control key events?
     
 """
 
 from service import Service
+from xmit_message import XmitFwd
 import queue
 import uasyncio
 
 # Create an xmit which will forward an xmit
 # to a given i2c_addr. 
 def fwd_i2c_msg(fr,xmit,i2c_addr):
-    xmit = xmit.wrapXmit(fr=fr, to="i2c_svc")
-    msg = xmit.get_msg()
-    new_msg = [i2c_addr, msg]
-    xmit.msg = new_msg
-    return xmit
+    env = XmitFwd.alloc(fr, "i2c_svc", xmit)
+    env.addr = i2c_addr
+    return env
 
 # All services classes are named ModuleService
 class ModuleService(Service):
@@ -50,12 +47,6 @@ class ModuleService(Service):
             
             # await self.log_msg("stub fwd: " + xmit.dumps())
             
-            """
-            xmit = xmit.wrapXmit(fr=self.name, to="i2c_svc")
-            msg = xmit.get_msg()
-            new_msg = [self.i2c_addr, msg]
-            xmit.msg = new_msg
-            """
             xmit = fwd_i2c_msg(self.name,xmit,self.i2c_addr)
             
             await q_out.put(xmit)
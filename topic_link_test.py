@@ -0,0 +1,116 @@
+"""
+    Test that a message to a topic is never sent back over the I2C link
+    it was received on, see router.py "Topics".
+
+    A Controller and a Responder, each with its own Router, are linked
+    by queues of the bytes which would be sent over I2C. A stub on the
+    Controller subscribes the Responder to a topic which no service on
+    the Responder subscribes to.
+
+    Run on CPython with bench/shim, lib and i2c_responder on the path,
+    after this directory.
+"""
+
+import uasyncio
+import queue
+from service import Service
+from router import Router
+import service_controller
+import service_i2c_controller
+import svc_i2c_stub
+import service_responder
+import svc_i2c_responder
+
+ADDR = 65
+
+class Link:
+
+    """ Both ends of the I2C link, as I2cController and I2CResponder """
+
+    def __init__(self):
+        self.q_in  = queue.Queue(30)   # Responder to Controller
+        self.q_out = queue.Queue(30)   # Controller to Responder
+        self.raw   = False
+
+    def scan(self):
+        return [ADDR]
+
+    async def send_msg(self, addr, msg):
+        await self.q_out.put(msg.encode() if isinstance(msg, str) else bytes(msg))
+        return True
+
+    async def rcv_msg(self, addr, raw=False):
+        if self.q_in.empty():
+            return b""
+        msg = self.q_in.get_nowait()
+        return msg.encode() if isinstance(msg, str) else bytes(msg)
+
+class Sink(Service):
+
+    """ Keeps the messages it is sent """
+
+    async def run(self):
+        self.got = []
+        while True:
+            xmit = await self.input_queue.get()
+            self.got.append(xmit.get_msg())
+
+link = Link()
+service_i2c_controller.I2cController = lambda **kwargs: link
+
+def node(services, log_svc):
+    svc_lookup = {}
+    defaults = {"svc_lookup":svc_lookup, "i2c":link, "log_svc":log_svc,
+                "q_in_size":30, "q_out_size":30, "poll_budget_ms":0}
+    for module, parms in services:
+        parms["defaults"] = defaults
+        svc_lookup[parms["name"]] = module(parms)
+    return svc_lookup
+
+async def start(svc_lookup, ctl_name):
+    ctl = svc_lookup[ctl_name]
+    router = Router(svc_lookup, ctl.route_xmit)
+    ctl.set_router(router, None)
+    for svc in svc_lookup.values():
+        uasyncio.create_task(svc.run())
+    uasyncio.create_task(router.run())
+    return router
+
+async def main():
+    ctl = node([(service_controller.ModuleService, {"name":"controller", "startup_focus":"log"}),
+                (Sink, {"name":"log"}),
+                (service_i2c_controller.ModuleService, {"name":"i2c_svc"}),
+                (svc_i2c_stub.ModuleService, {"name":"0x41_sub", "forward_i2c_addr":ADDR,
+                                              "subscribe":["t1"]}),
+                (Sink, {"name":"sub", "subscribe":["t1"]}),
+                (Sink, {"name":"pub"})], "log")
+    resp = node([(service_responder.ModuleService, {"name":"0x41_ctrl"}),
+                 (Sink, {"name":"0x41_log"}),
+                 (svc_i2c_responder.ModuleService, {"name":"i2c_svc"}),
+                 (Sink, {"name":"0x41_pub"})], "0x41_log")
+
+    ctl_router = await start(ctl, "controller")
+    await start(resp, "0x41_ctrl")
+    await uasyncio.sleep_ms(200)
+    stub_dlv = ctl_router.routes[ctl["0x41_sub"].svc_id]
+
+    # published on the Controller: sent to the Responder once, never back
+    await ctl["pub"].publish("t1", "from controller")
+    await uasyncio.sleep_ms(500)
+    print("controller publish: sub got {}, sent to stub {}".format(
+        ctl["sub"].got, stub_dlv.delivered))
+    assert ctl["sub"].got == ["from controller"]
+    assert stub_dlv.delivered == 1
+
+    # published on the Responder: passed to the Controller's subscriber,
+    # not back to the Responder
+    await resp["0x41_pub"].publish("t1", "from responder")
+    await uasyncio.sleep_ms(500)
+    print("responder publish: sub got {}, sent to stub {}".format(
+        ctl["sub"].got, stub_dlv.delivered))
+    assert ctl["sub"].got == ["from controller", "from responder"]
+    assert stub_dlv.delivered == 1
+
+    print("all ok")
+
+uasyncio.run(main())
@@ -0,0 +1,56 @@
+"""
+    Test decoding of truncated and corrupt binary messages, see xmit_codec.py.
+
+    Run on the Pico, or on CPython with bench/shim on the path for the MicroPython modules.
+"""
+
+from xmit_codec import Codec, PAY_STR, PAY_LCD, OP_MSG
+from xmit_message import XmitMsg
+from xmit_lcd import XmitLcd
+
+codec = Codec(["lcd", "temp_humid"])
+
+def bad(buf, why):
+    try:
+        codec.decode(buf)
+    except (ValueError, IndexError) as e:
+        print("ok, {}: {}".format(why, e))
+        return
+    raise AssertionError("decoded " + why)
+
+lcd = XmitLcd("temp_humid").set_cursor(8, 0).set_msg(" 61.6°F")
+lcd.dsp_hg()
+buf = codec.encode(lcd)
+xmit = codec.decode(buf)
+assert xmit.get_msg() == lcd.msg
+
+# every truncation, and a byte too many, is rejected by decode()
+for n in range(1, len(buf)):
+    bad(buf[:n], "truncated to {} of {}".format(n, len(buf)))
+bad(buf + b"\x00", "trailing byte")
+
+buf = codec.encode(XmitMsg("temp_humid", "lcd", "hello"))
+assert codec.decode(buf).get_msg() == "hello"
+bad(buf[:-1], "short str")
+
+# a bad op or kind
+buf = bytearray(codec.encode(lcd))
+buf[5] = 99    # type, names, kind, count, then the first op
+bad(buf, "lcd op")
+bad(bytes(buf[:3]) + b"\x09\x00", "payload kind")
+
+# well formed, but not UTF-8: get_msg() returns the empty payload
+buf = bytes(codec.encode(XmitMsg("temp_humid", "lcd", "")))[:-2] + bytes((PAY_STR, 1, 0xFF))
+xmit = codec.decode(buf)
+assert xmit.get_msg() == ""
+
+buf = bytes(codec.encode(XmitLcd("temp_humid")))[:-2] + bytes((PAY_LCD, 1, OP_MSG, 1, 0xFF))
+xmit = codec.decode(buf)
+assert xmit.get_msg() == []
+
+# and an LCD message with a raw payload can still be added to
+xmit = codec.decode(codec.encode(lcd))
+xmit.set_msg("56%")
+assert xmit.get_msg() == lcd.msg + [{"msg":"56%"}]
+
+print("all ok")
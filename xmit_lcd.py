@@ -9,7 +9,7 @@
     - set_backlight(on) - turns off backlight if on=0, otherwise sets backlight on
 """
 
-from xmit_message import XmitMsg
+from xmit_message import XmitMsg, _alloc
 
 CMD_CLEAR_SCREEN = 'clear'
 
@@ -33,24 +33,34 @@ CMD_BLK_HG      = 'bg'  # blank out hourglass
 
 class XmitLcd(XmitMsg):
     
+    __slots__ = ()
+    
     def __init__(self,fr="",to="lcd",msg=""):
         
         super().__init__(fr,to,msg)
         
         if self.msg == "":
             self.msg = []
+            
+    # as XmitMsg.alloc(), with the same defaults as XmitLcd()
+    @classmethod
+    def alloc(cls,fr="",to="lcd",msg=""):
+        return _alloc(cls, fr, to, msg)
+        
+    def empty_msg(self):
+        return []
         
     def set_msg(self,message):
-        self.msg.append({"msg":message})
+        self.get_msg().append({"msg":message})
         return self
         
     def clear_screen(self):
-        self.msg.append('clear')
+        self.get_msg().append('clear')
         return self
         
     def set_cursor(self,x,y):
         if (type(x) is int) and (type(y) is int):
-            self.msg.append({'cursor':[x,y]})
+            self.get_msg().append({'cursor':[x,y]})
         else:
             # consider logging error?
             pass
@@ -66,35 +76,35 @@ class XmitLcd(XmitMsg):
         return self
     
     def set_backlight_on(self):
-        self.msg.append(CMD_BACKLIGHT_ON)
+        self.get_msg().append(CMD_BACKLIGHT_ON)
         return self
     
     def set_backlight_off(self):
-        self.msg.append(CMD_BACKLIGHT_OFF)
+        self.get_msg().append(CMD_BACKLIGHT_OFF)
         return self
     
     def set_cursor_on(self):
-        self.msg.append(CMD_CURSOR_ON)
+        self.get_msg().append(CMD_CURSOR_ON)
         return self
     
     def set_cursor_off(self):
-        self.msg.append(CMD_CURSOR_OFF)
+        self.get_msg().append(CMD_CURSOR_OFF)
         return self
     
     def set_blink_cursor_on(self):
-        self.msg.append(CMD_BLINK_CURSOR_ON)
+        self.get_msg().append(CMD_BLINK_CURSOR_ON)
         return self
         
     def set_blink_cursor_off(self):
-        self.msg.append(CMD_BLINK_CURSOR_OFF)
+        self.get_msg().append(CMD_BLINK_CURSOR_OFF)
         return self
         
     def set_display_on(self):
-        self.msg.append(CMD_DISPLAY_ON)
+        self.get_msg().append(CMD_DISPLAY_ON)
         return self
         
     def set_display_off(self):
-        self.msg.append(CMD_DISPLAY_OFF)
+        self.get_msg().append(CMD_DISPLAY_OFF)
         return self
         
     
@@ -102,7 +112,7 @@ class XmitLcd(XmitMsg):
     # set interval to 0 to stop blinking
     def blink_backlight(self,interval):
         x = interval * 1000  # cause exception if we can't multiply interval by 1,000
-        self.msg.append({'blink_backlight':interval})
+        self.get_msg().append({'blink_backlight':interval})
         return self
         
     def blink_slow(self):
@@ -119,11 +129,11 @@ class XmitLcd(XmitMsg):
     
     # display an hourglass for 2 seconds
     def dsp_hg(self):
-        self.msg.append({CMD_DSP_HG:2})
+        self.get_msg().append({CMD_DSP_HG:2})
         
     # blank out the hourglass
     def blk_hg(self):
-        self.msg.append(CMD_BLK_HG)
+        self.get_msg().append(CMD_BLK_HG)
         return self
         
             
@@ -112,6 +112,6 @@ class XmitMsgHandler:
     # retransmit a message to the controller
     async def rexmit(self, xmit, q_out):
         xmit.set_to(CTL_SERVICE_NAME)
-        await q_out.put(xmit)
+        await q_out.put(xmit, xmit.is_priority())
         
         